@@ -1,7 +1,7 @@
 """Configuration loading with config.ini and environment variable overrides."""
 import configparser
 import os
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from pathlib import Path
 
 
@@ -14,10 +14,55 @@ class Config:
     db_path: str = "/data/pyngding.sqlite"
     scan_targets: str = ""
     scan_interval_seconds: int = 60
+    overrun_policy: str = "skip"
     ping_timeout_seconds: float = 1.0
     ping_count: int = 1
+    ping_engine: str = "subprocess"
+    arp_rate_pps: int = 4000
+    arp_timeout_seconds: float = 0.5
     max_workers: int = 32
+    async_scan: bool = False
+    max_in_flight: int = 1024
+    max_in_flight_total: int = 0
+    scan_processes: int = 1
     target_cap: int = 4096
+    max_pps: int = 0
+    randomize_targets: bool = True
+    tcp_fallback: bool = False
+    tcp_fallback_ports: str = "22,80,443,445,62078"
+    tcp_fallback_timeout_seconds: float = 0.5
+    adaptive_scan: bool = False
+    adaptive_min_timeout_seconds: float = 0.2
+    adaptive_recent_seconds: int = 86400
+    adaptive_stale_every: int = 4
+    adaptive_unseen_every: int = 16
+    observation_mode: str = "full"
+    db_commit_max_jobs: int = 256
+    db_commit_max_ms: float = 50.0
+
+    # Simulated probe engine (ping_engine = simulated)
+    sim_seed: int = 0
+    sim_up_ratio: float = 0.3
+    sim_rtt_ms: float = 2.0
+    sim_rtt_sigma: float = 0.5
+    sim_loss_rate: float = 0.01
+    sim_mac_churn: float = 0.0
+    sim_churn: float = 0.001
+
+    # Notification delivery
+    notify_workers: int = 4
+    notify_max_attempts: int = 8
+    notify_backoff_seconds: float = 5.0
+    notify_backoff_max_seconds: float = 600.0
+
+    # Remote agent settings (pyngding agent)
+    agent_server_url: str = ""
+    agent_api_key: str = ""
+    agent_site: str = ""
+    agent_spool_dir: str = "/data/spool"
+    agent_spool_max_batches: int = 10000
+    agent_reverse_dns: bool = True
+    agent_push_timeout_seconds: float = 10.0
 
     # Auth settings
     auth_enabled: bool = False
@@ -25,6 +70,40 @@ class Config:
     auth_password_hash: str = ""
     auth_realm: str = "pyngding"
 
+    # Named scan profiles ([profile:<name>] sections)
+    scan_profiles: list["ScanProfile"] = field(default_factory=list)
+
+
+@dataclass
+class ScanProfile:
+    """A named part of the scope, scanned on its own schedule and worker budget."""
+    name: str
+    scan_targets: str
+    scan_interval_seconds: int
+    ping_timeout_seconds: float
+    max_workers: int
+    max_in_flight: int
+
+
+def get_scan_profiles(config: Config) -> list[ScanProfile]:
+    """Get the scan profiles to run.
+
+    The [pyngding] scan settings form the profile 'default' when
+    scan_targets is set there, followed by the [profile:<name>] sections.
+    """
+    profiles = []
+    if config.scan_targets:
+        profiles.append(ScanProfile(
+            name="default",
+            scan_targets=config.scan_targets,
+            scan_interval_seconds=config.scan_interval_seconds,
+            ping_timeout_seconds=config.ping_timeout_seconds,
+            max_workers=config.max_workers,
+            max_in_flight=config.max_in_flight
+        ))
+    profiles.extend(profile for profile in config.scan_profiles if profile.name != "default" or not profiles)
+    return profiles
+
 
 def load_config(config_path: str | None = None) -> Config:
     """Load configuration from config.ini file with environment variable overrides.
@@ -33,6 +112,7 @@ def load_config(config_path: str | None = None) -> Config:
     Example: PYNGDING_BIND_PORT=9000 overrides bind_port.
     """
     config = Config()
+    profile_sections: dict[str, dict[str, str]] = {}
 
     # Load from file if it exists
     if config_path is None:
@@ -51,10 +131,71 @@ def load_config(config_path: str | None = None) -> Config:
             config.db_path = section.get("db_path", config.db_path)
             config.scan_targets = section.get("scan_targets", config.scan_targets)
             config.scan_interval_seconds = section.getint("scan_interval_seconds", config.scan_interval_seconds)
+            config.overrun_policy = section.get("overrun_policy", config.overrun_policy)
             config.ping_timeout_seconds = section.getfloat("ping_timeout_seconds", config.ping_timeout_seconds)
             config.ping_count = section.getint("ping_count", config.ping_count)
+            config.ping_engine = section.get("ping_engine", config.ping_engine)
+            config.arp_rate_pps = section.getint("arp_rate_pps", config.arp_rate_pps)
+            config.arp_timeout_seconds = section.getfloat("arp_timeout_seconds", config.arp_timeout_seconds)
             config.max_workers = section.getint("max_workers", config.max_workers)
+            config.async_scan = section.getboolean("async_scan", config.async_scan)
+            config.max_in_flight = section.getint("max_in_flight", config.max_in_flight)
+            config.max_in_flight_total = section.getint("max_in_flight_total", config.max_in_flight_total)
+            config.scan_processes = section.getint("scan_processes", config.scan_processes)
             config.target_cap = section.getint("target_cap", config.target_cap)
+            config.max_pps = section.getint("max_pps", config.max_pps)
+            config.randomize_targets = section.getboolean("randomize_targets", config.randomize_targets)
+            config.tcp_fallback = section.getboolean("tcp_fallback", config.tcp_fallback)
+            config.tcp_fallback_ports = section.get("tcp_fallback_ports", config.tcp_fallback_ports)
+            config.tcp_fallback_timeout_seconds = section.getfloat(
+                "tcp_fallback_timeout_seconds", config.tcp_fallback_timeout_seconds)
+            config.adaptive_scan = section.getboolean("adaptive_scan", config.adaptive_scan)
+            config.adaptive_min_timeout_seconds = section.getfloat(
+                "adaptive_min_timeout_seconds", config.adaptive_min_timeout_seconds)
+            config.adaptive_recent_seconds = section.getint("adaptive_recent_seconds", config.adaptive_recent_seconds)
+            config.adaptive_stale_every = section.getint("adaptive_stale_every", config.adaptive_stale_every)
+            config.adaptive_unseen_every = section.getint("adaptive_unseen_every", config.adaptive_unseen_every)
+            config.observation_mode = section.get("observation_mode", config.observation_mode)
+            config.db_commit_max_jobs = section.getint("db_commit_max_jobs", config.db_commit_max_jobs)
+            config.db_commit_max_ms = section.getfloat("db_commit_max_ms", config.db_commit_max_ms)
+
+        # Load [simulation] section
+        if "simulation" in parser:
+            section = parser["simulation"]
+            config.sim_seed = section.getint("seed", config.sim_seed)
+            config.sim_up_ratio = section.getfloat("up_ratio", config.sim_up_ratio)
+            config.sim_rtt_ms = section.getfloat("rtt_ms", config.sim_rtt_ms)
+            config.sim_rtt_sigma = section.getfloat("rtt_sigma", config.sim_rtt_sigma)
+            config.sim_loss_rate = section.getfloat("loss_rate", config.sim_loss_rate)
+            config.sim_mac_churn = section.getfloat("mac_churn", config.sim_mac_churn)
+            config.sim_churn = section.getfloat("churn", config.sim_churn)
+
+        # Load [notifications] section
+        if "notifications" in parser:
+            section = parser["notifications"]
+            config.notify_workers = section.getint("workers", config.notify_workers)
+            config.notify_max_attempts = section.getint("max_attempts", config.notify_max_attempts)
+            config.notify_backoff_seconds = section.getfloat("backoff_seconds", config.notify_backoff_seconds)
+            config.notify_backoff_max_seconds = section.getfloat(
+                "backoff_max_seconds", config.notify_backoff_max_seconds)
+
+        # Load [agent] section
+        if "agent" in parser:
+            section = parser["agent"]
+            config.agent_server_url = section.get("server_url", config.agent_server_url)
+            config.agent_api_key = section.get("api_key", config.agent_api_key)
+            config.agent_site = section.get("site", config.agent_site)
+            config.agent_spool_dir = section.get("spool_dir", config.agent_spool_dir)
+            config.agent_spool_max_batches = section.getint("spool_max_batches", config.agent_spool_max_batches)
+            config.agent_reverse_dns = section.getboolean("reverse_dns", config.agent_reverse_dns)
+            config.agent_push_timeout_seconds = section.getfloat(
+                "push_timeout_seconds", config.agent_push_timeout_seconds)
+
+        # Load [profile:<name>] sections; resolved after the overrides below,
+        # since unset values fall back to the (overridden) [pyngding] ones
+        for section_name in parser.sections():
+            if section_name.startswith("profile:"):
+                profile_sections[section_name[len("profile:"):].strip()] = dict(parser[section_name])
 
         # Load [auth] section
         if "auth" in parser:
@@ -84,14 +225,92 @@ def load_config(config_path: str | None = None) -> Config:
             config.scan_targets = value
         elif config_key == "scan_interval_seconds":
             config.scan_interval_seconds = int(value)
+        elif config_key == "overrun_policy":
+            config.overrun_policy = value
         elif config_key == "ping_timeout_seconds":
             config.ping_timeout_seconds = float(value)
         elif config_key == "ping_count":
             config.ping_count = int(value)
+        elif config_key == "ping_engine":
+            config.ping_engine = value
+        elif config_key == "arp_rate_pps":
+            config.arp_rate_pps = int(value)
+        elif config_key == "arp_timeout_seconds":
+            config.arp_timeout_seconds = float(value)
         elif config_key == "max_workers":
             config.max_workers = int(value)
+        elif config_key == "async_scan":
+            config.async_scan = value.lower() in ("true", "1", "yes", "on")
+        elif config_key == "max_in_flight":
+            config.max_in_flight = int(value)
+        elif config_key == "max_in_flight_total":
+            config.max_in_flight_total = int(value)
+        elif config_key == "scan_processes":
+            config.scan_processes = int(value)
         elif config_key == "target_cap":
             config.target_cap = int(value)
+        elif config_key == "max_pps":
+            config.max_pps = int(value)
+        elif config_key == "randomize_targets":
+            config.randomize_targets = value.lower() in ("true", "1", "yes", "on")
+        elif config_key == "tcp_fallback":
+            config.tcp_fallback = value.lower() in ("true", "1", "yes", "on")
+        elif config_key == "tcp_fallback_ports":
+            config.tcp_fallback_ports = value
+        elif config_key == "tcp_fallback_timeout_seconds":
+            config.tcp_fallback_timeout_seconds = float(value)
+        elif config_key == "adaptive_scan":
+            config.adaptive_scan = value.lower() in ("true", "1", "yes", "on")
+        elif config_key == "adaptive_min_timeout_seconds":
+            config.adaptive_min_timeout_seconds = float(value)
+        elif config_key == "adaptive_recent_seconds":
+            config.adaptive_recent_seconds = int(value)
+        elif config_key == "adaptive_stale_every":
+            config.adaptive_stale_every = int(value)
+        elif config_key == "adaptive_unseen_every":
+            config.adaptive_unseen_every = int(value)
+        elif config_key == "observation_mode":
+            config.observation_mode = value
+        elif config_key == "db_commit_max_jobs":
+            config.db_commit_max_jobs = int(value)
+        elif config_key == "db_commit_max_ms":
+            config.db_commit_max_ms = float(value)
+        elif config_key == "sim_seed":
+            config.sim_seed = int(value)
+        elif config_key == "sim_up_ratio":
+            config.sim_up_ratio = float(value)
+        elif config_key == "sim_rtt_ms":
+            config.sim_rtt_ms = float(value)
+        elif config_key == "sim_rtt_sigma":
+            config.sim_rtt_sigma = float(value)
+        elif config_key == "sim_loss_rate":
+            config.sim_loss_rate = float(value)
+        elif config_key == "sim_mac_churn":
+            config.sim_mac_churn = float(value)
+        elif config_key == "sim_churn":
+            config.sim_churn = float(value)
+        elif config_key == "notify_workers":
+            config.notify_workers = int(value)
+        elif config_key == "notify_max_attempts":
+            config.notify_max_attempts = int(value)
+        elif config_key == "notify_backoff_seconds":
+            config.notify_backoff_seconds = float(value)
+        elif config_key == "notify_backoff_max_seconds":
+            config.notify_backoff_max_seconds = float(value)
+        elif config_key == "agent_server_url":
+            config.agent_server_url = value
+        elif config_key == "agent_api_key":
+            config.agent_api_key = value
+        elif config_key == "agent_site":
+            config.agent_site = value
+        elif config_key == "agent_spool_dir":
+            config.agent_spool_dir = value
+        elif config_key == "agent_spool_max_batches":
+            config.agent_spool_max_batches = int(value)
+        elif config_key == "agent_reverse_dns":
+            config.agent_reverse_dns = value.lower() in ("true", "1", "yes", "on")
+        elif config_key == "agent_push_timeout_seconds":
+            config.agent_push_timeout_seconds = float(value)
         elif config_key == "auth_enabled":
             config.auth_enabled = value.lower() in ("true", "1", "yes", "on")
         elif config_key == "auth_username":
@@ -101,9 +320,80 @@ def load_config(config_path: str | None = None) -> Config:
         elif config_key == "auth_realm":
             config.auth_realm = value
 
+    # Validate scan schedule
+    config.scan_interval_seconds = max(1, config.scan_interval_seconds)
+    config.overrun_policy = config.overrun_policy.strip().lower()
+    if config.overrun_policy not in ("skip", "immediate", "stretch"):
+        config.overrun_policy = "skip"
+
+    # Build scan profiles
+    for name, section in profile_sections.items():
+        targets = section.get("scan_targets", "").strip()
+        if not name or not targets:
+            continue
+        config.scan_profiles.append(ScanProfile(
+            name=name[:64],
+            scan_targets=targets,
+            scan_interval_seconds=max(1, int(section.get("scan_interval_seconds", config.scan_interval_seconds))),
+            ping_timeout_seconds=float(section.get("ping_timeout_seconds", config.ping_timeout_seconds)),
+            max_workers=max(1, min(int(section.get("max_workers", config.max_workers)), 64)),
+            max_in_flight=max(1, min(int(section.get("max_in_flight", config.max_in_flight)), 16384))
+        ))
+
+    # Validate ping engine
+    config.ping_engine = config.ping_engine.strip().lower()
+    if config.ping_engine not in ("subprocess", "icmp", "arp", "simulated"):
+        config.ping_engine = "subprocess"
+
+    config.arp_rate_pps = max(1, config.arp_rate_pps)
+
     # Validate max_workers cap
     if config.max_workers > 64:
         config.max_workers = 64
 
+    # Validate in-flight window (asyncio scan path, no threads involved)
+    config.max_in_flight = max(1, min(config.max_in_flight, 16384))
+
+    # Validate the limit shared by all scan profiles (0 = sum of their budgets)
+    config.max_in_flight_total = max(0, config.max_in_flight_total)
+
+    # Validate sharded scan worker count
+    config.scan_processes = max(1, min(config.scan_processes, 64))
+
+    # Validate probe rate ceiling (0 = unlimited)
+    config.max_pps = max(0, config.max_pps)
+
+    # Validate adaptive probing tiers
+    config.adaptive_stale_every = max(1, config.adaptive_stale_every)
+    config.adaptive_unseen_every = max(1, config.adaptive_unseen_every)
+
+    # Validate observation storage mode
+    config.observation_mode = config.observation_mode.strip().lower()
+    if config.observation_mode not in ("full", "changes"):
+        config.observation_mode = "full"
+
+    # Validate group commit limits of the database writer
+    config.db_commit_max_jobs = max(1, min(config.db_commit_max_jobs, 10000))
+    config.db_commit_max_ms = max(0.0, min(config.db_commit_max_ms, 1000.0))
+
+    # Validate simulation model (ratios and per-cycle rates are probabilities)
+    config.sim_up_ratio = max(0.0, min(config.sim_up_ratio, 1.0))
+    config.sim_loss_rate = max(0.0, min(config.sim_loss_rate, 1.0))
+    config.sim_mac_churn = max(0.0, min(config.sim_mac_churn, 1.0))
+    config.sim_churn = max(0.0, min(config.sim_churn, 1.0))
+    config.sim_rtt_ms = max(0.0, config.sim_rtt_ms)
+    config.sim_rtt_sigma = max(0.0, config.sim_rtt_sigma)
+
+    # Validate notification delivery
+    config.notify_workers = max(1, min(config.notify_workers, 16))
+    config.notify_max_attempts = max(1, config.notify_max_attempts)
+    config.notify_backoff_seconds = max(0.1, config.notify_backoff_seconds)
+    config.notify_backoff_max_seconds = max(config.notify_backoff_seconds, config.notify_backoff_max_seconds)
+
+    # Validate agent settings
+    config.agent_server_url = config.agent_server_url.strip().rstrip("/")
+    config.agent_site = config.agent_site.strip()[:64]
+    config.agent_spool_max_batches = max(1, config.agent_spool_max_batches)
+
     return config
 
@@ -1,10 +1,13 @@
 """SQLite database initialization and core queries."""
+import json
 import sqlite3
 import threading
 import time
 from contextlib import contextmanager
 from pathlib import Path
 
+from pyngding.core.writer import run_write, submit_write
+
 # Thread-local storage for connection caching
 _thread_local = threading.local()
 _CONNECTION_TTL = 60  # seconds before recycling a connection
@@ -63,8 +66,19 @@ def get_db(db_path: str):
     # Note: we don't close the connection here - it's cached for reuse
 
 
+def _add_column(conn: sqlite3.Connection, table: str, column: str, decl: str) -> None:
+    """Add a column to an existing table if it is not there yet (schema migration)."""
+    columns = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+    if column not in columns:
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+
+
 def init_db(db_path: str) -> None:
-    """Initialize database schema with WAL mode and all tables."""
+    """Initialize database schema with WAL mode and all tables.
+
+    Runs on the calling thread's connection, not the database writer:
+    journal_mode cannot change inside a transaction.
+    """
     db_file = Path(db_path)
     db_file.parent.mkdir(parents=True, exist_ok=True)
 
@@ -102,6 +116,35 @@ def init_db(db_path: str) -> None:
             )
         """)
 
+        # Remote agent runs: the agent's site and the batch they were pushed in, added later
+        _add_column(conn, "scan_runs", "site", "TEXT NULL")
+        _add_column(conn, "scan_runs", "batch_id", "TEXT NULL")
+        conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_scan_runs_batch_id ON scan_runs(batch_id)")
+
+        # Run membership: the run's target set, a bitmap of the targets that
+        # were probed (NULL if all were) and one of those that were up, added later
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS target_sets (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                spec TEXT UNIQUE NOT NULL,
+                size INTEGER NOT NULL,
+                created_ts INTEGER NOT NULL
+            )
+        """)
+        _add_column(conn, "scan_runs", "target_set_id", "INTEGER NULL")
+        _add_column(conn, "scan_runs", "probed", "BLOB NULL")
+        _add_column(conn, "scan_runs", "up", "BLOB NULL")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_scan_runs_started_ts ON scan_runs(started_ts)")
+
+        # Cycle timing of local runs: how late the run started against its
+        # fixed-rate slot and how long the whole cycle took, added later
+        _add_column(conn, "scan_runs", "start_lag_ms", "REAL NULL")
+        _add_column(conn, "scan_runs", "duration_ms", "REAL NULL")
+
+        # Scan profile of local runs, added later
+        _add_column(conn, "scan_runs", "profile", "TEXT NULL")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_scan_runs_profile_started_ts ON scan_runs(profile, started_ts)")
+
         # Table 3: observations (raw scan history)
         conn.execute("""
             CREATE TABLE IF NOT EXISTS observations (
@@ -115,8 +158,11 @@ def init_db(db_path: str) -> None:
                 FOREIGN KEY (run_id) REFERENCES scan_runs(id) ON DELETE CASCADE
             )
         """)
+        # Which probe found the host up ('arp', 'icmp', 'tcp:<port>'), added later
+        _add_column(conn, "observations", "probe", "TEXT NULL")
         conn.execute("CREATE INDEX IF NOT EXISTS idx_observations_run_id ON observations(run_id)")
         conn.execute("CREATE INDEX IF NOT EXISTS idx_observations_ip ON observations(ip)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_observations_ip_run_id ON observations(ip, run_id)")
 
         # Table 4: device_profiles (admin inventory metadata)
         conn.execute("""
@@ -153,6 +199,15 @@ def init_db(db_path: str) -> None:
             )
         """)
 
+        # Version counter of ui_settings, bumped by every settings change
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS settings_version (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                version INTEGER NOT NULL
+            )
+        """)
+        conn.execute("INSERT OR IGNORE INTO settings_version (id, version) VALUES (1, 0)")
+
         # Table 7: api_keys
         conn.execute("""
             CREATE TABLE IF NOT EXISTS api_keys (
@@ -207,6 +262,28 @@ def init_db(db_path: str) -> None:
         conn.execute("CREATE INDEX IF NOT EXISTS idx_ipv6_neighbors_ts ON ipv6_neighbors(ts)")
         conn.execute("CREATE INDEX IF NOT EXISTS idx_ipv6_neighbors_ip6 ON ipv6_neighbors(ip6)")
 
+        # Table 11: notification_outbox (one row per event and channel,
+        # delivered by the notification dispatcher)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS notification_outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                channel TEXT NOT NULL,
+                event_type TEXT NOT NULL,
+                ip TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                created_ts REAL NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_ts REAL NOT NULL,
+                last_error TEXT NULL,
+                sent_ts REAL NULL
+            )
+        """)
+        conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_notification_outbox_status_channel
+            ON notification_outbox(status, channel, id)
+        """)
+
 
 # Core query functions
 
@@ -224,7 +301,7 @@ def upsert_host(db_path: str, ip: str, mac: str | None = None, hostname: str | N
     if now_ts is None:
         now_ts = int(time.time())
 
-    with get_db(db_path) as conn:
+    def write(conn):
         existing = conn.execute("SELECT id, first_seen_ts FROM hosts WHERE ip = ?", (ip,)).fetchone()
         if existing:
             # Update existing
@@ -245,27 +322,276 @@ def upsert_host(db_path: str, ip: str, mac: str | None = None, hostname: str | N
                 VALUES (?, ?, ?, ?, ?, ?, ?, ?)
             """, (ip, mac, hostname, vendor, now_ts, now_ts, status, rtt_ms))
 
+    return run_write(db_path, write)
+
 
 def create_scan_run(db_path: str, started_ts: int, finished_ts: int, targets_count: int,
-                   up_count: int, down_count: int) -> int:
-    """Create a scan run and return its ID."""
-    with get_db(db_path) as conn:
+                   up_count: int, down_count: int, site: str | None = None,
+                   batch_id: str | None = None, profile: str | None = None) -> int:
+    """Create a scan run and return its ID.
+
+    site and batch_id are set for runs pushed by remote agents; a batch_id
+    that already exists raises sqlite3.IntegrityError. profile is the scan
+    profile of local runs.
+    """
+    def write(conn):
         cursor = conn.execute("""
-            INSERT INTO scan_runs (started_ts, finished_ts, targets_count, up_count, down_count)
-            VALUES (?, ?, ?, ?, ?)
-        """, (started_ts, finished_ts, targets_count, up_count, down_count))
+            INSERT INTO scan_runs (started_ts, finished_ts, targets_count, up_count, down_count, site, batch_id,
+                                   profile)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, (started_ts, finished_ts, targets_count, up_count, down_count, site, batch_id, profile))
         return cursor.lastrowid
 
+    return run_write(db_path, write)
+
+
+def commit_scan_run(db_path: str, started_ts: int, finished_ts: int, targets_count: int,
+                    results: list[dict], site: str | None = None, batch_id: str | None = None,
+                    previous: dict[str, tuple[str, str | None]] | None = None,
+                    observations: list[dict] | None = None, target_set_id: int | None = None,
+                    probed: bytes | None = None, up: bytes | None = None) -> dict:
+    """Write a complete scan run in a single transaction.
+
+    Inserts the scan_runs row and one observation per result (or the given
+    observations instead, in change-only mode), and upserts every result
+    into hosts (last_seen_ts = finished_ts). Results are dicts with keys
+    ip, status, rtt_ms, mac, hostname, probe and optionally vendor.
+    target_set_id, probed and up record run membership as bitmaps from
+    TargetSet.bitmap() (see get_host_state_at_run() and data.presence). A batch_id that already exists raises
+    sqlite3.IntegrityError and nothing is written.
+
+    previous is the host state before the run (ip -> (last_status, mac), as
+    from get_host_states()); if None it is read inside the transaction.
+
+    Returns the run and its changes against the hosts table as it was
+    before the run, for change notifications:
+        {'run_id': int, 'up_count': int, 'down_count': int,
+         'new': [result, ...],                 # unknown before, now up
+         'gone': [result, ...],                # up before, now down
+         'mac_changed': [(result, old_mac), ...]}
+    """
+    from pyngding.scanning.targets import pack_bitmap
+
+    up_count = sum(1 for r in results if r['status'] == 'up')
+    diff = {
+        'run_id': None,
+        'up_count': up_count,
+        'down_count': len(results) - up_count
+    }
+
+    def write(conn):
+        # Read in the write transaction, so the diff matches what is replaced
+        before = previous if previous is not None else _read_host_states(conn)
+
+        cursor = conn.execute("""
+            INSERT INTO scan_runs (started_ts, finished_ts, targets_count, up_count, down_count, site, batch_id,
+                                   target_set_id, probed, up)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (started_ts, finished_ts, targets_count, up_count, len(results) - up_count, site, batch_id,
+              target_set_id, pack_bitmap(probed) if probed is not None else None,
+              pack_bitmap(up) if up is not None else None))
+        run_id = cursor.lastrowid
+        _write_results(conn, run_id, results, observations, finished_ts)
+        return run_id, before
+
+    diff['run_id'], previous = run_write(db_path, write)
+    diff.update(_diff_results(results, previous))
+    return diff
+
+
+def commit_scan_batch(db_path: str, run_id: int, results: list[dict], seen_ts: int,
+                      previous: dict[str, tuple[str, str | None]] | None = None,
+                      observations: list[dict] | None = None) -> dict:
+    """Write part of an in-progress scan run in a single transaction.
+
+    For runs written while they are scanned: create_scan_run() with
+    finished_ts = 0, a commit_scan_batch() per batch of results, then
+    finish_scan_run(). Writes like commit_scan_run() minus the scan_runs
+    row, with last_seen_ts = seen_ts.
+
+    Returns the batch's changes against previous, as in commit_scan_run():
+        {'new': [...], 'gone': [...], 'mac_changed': [...]}
+    """
+    def write(conn):
+        before = previous if previous is not None else _read_host_states(conn)
+        _write_results(conn, run_id, results, observations, seen_ts)
+        return before
+
+    return _diff_results(results, run_write(db_path, write))
+
+
+def _write_results(conn: sqlite3.Connection, run_id: int, results: list[dict],
+                   observations: list[dict] | None, seen_ts: int) -> None:
+    conn.executemany("""
+        INSERT INTO observations (run_id, ip, status, rtt_ms, mac, hostname, probe)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, ((run_id, r['ip'], r['status'], r.get('rtt_ms'), r.get('mac'), r.get('hostname'), r.get('probe'))
+          for r in (results if observations is None else observations)))
+
+    conn.executemany("""
+        INSERT INTO hosts (ip, mac, hostname, vendor, first_seen_ts, last_seen_ts, last_status, last_rtt_ms)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(ip) DO UPDATE SET
+            mac = COALESCE(excluded.mac, mac),
+            hostname = COALESCE(excluded.hostname, hostname),
+            vendor = COALESCE(excluded.vendor, vendor),
+            last_seen_ts = excluded.last_seen_ts,
+            last_status = excluded.last_status,
+            last_rtt_ms = excluded.last_rtt_ms
+    """, ((r['ip'], r.get('mac'), r.get('hostname'), r.get('vendor'), seen_ts, seen_ts,
+           r['status'], r.get('rtt_ms'))
+          for r in results))
+
+
+def _diff_results(results: list[dict], previous: dict[str, tuple[str, str | None]]) -> dict:
+    diff = {'new': [], 'gone': [], 'mac_changed': []}
+    for result in results:
+        before = previous.get(result['ip'])
+        if before is None:
+            if result['status'] == 'up':
+                diff['new'].append(result)
+        elif before[0] == 'up' and result['status'] == 'down':
+            diff['gone'].append(result)
+        elif result.get('mac') and before[1] and result['mac'] != before[1]:
+            diff['mac_changed'].append((result, before[1]))
+    return diff
+
+
+def _read_host_states(conn: sqlite3.Connection) -> dict[str, tuple[str, str | None]]:
+    return {row[0]: (row[1], row[2]) for row in conn.execute("SELECT ip, last_status, mac FROM hosts")}
+
+
+def rtt_bucket(rtt_ms: float | None) -> int | None:
+    """Power-of-two RTT bucket: 0 for < 1 ms, n for [2^(n-1), 2^n) ms."""
+    return None if rtt_ms is None else int(rtt_ms).bit_length()
+
+
+def get_latest_observations(db_path: str) -> dict[str, tuple[str, str | None, str | None, int | None]]:
+    """Get ip -> (status, mac, hostname, rtt bucket) of each IP's latest observation."""
+    with get_db(db_path) as conn:
+        rows = conn.execute("""
+            SELECT ip, status, mac, hostname, rtt_ms FROM observations
+            WHERE id IN (SELECT MAX(id) FROM observations GROUP BY ip)
+        """).fetchall()
+        return {row[0]: (row[1], row[2], row[3], rtt_bucket(row[4])) for row in rows}
+
+
+def get_target_set_id(db_path: str, spec: str, size: int) -> int:
+    """Get the ID of a target set by its spec (TargetSet.spec), creating it if needed."""
+    def write(conn):
+        conn.execute("""
+            INSERT OR IGNORE INTO target_sets (spec, size, created_ts) VALUES (?, ?, ?)
+        """, (spec, size, int(time.time())))
+        return conn.execute("SELECT id FROM target_sets WHERE spec = ?", (spec,)).fetchone()[0]
+
+    return run_write(db_path, write)
+
+
+def get_host_state_at_run(db_path: str, ip: str, run_id: int) -> dict | None:
+    """Reconstruct the state of ip as of a scan run.
+
+    Works in both observation modes: the state is the latest observation of
+    ip at or before run_id. In change-only mode an address that was probed
+    but has no observation yet was down.
+
+    Returns a dict with keys ip, status, rtt_ms, mac, hostname, probe,
+    since_run_id (the run the state was observed in) and probed (True/False,
+    or None if the run recorded no membership), or None if nothing is known.
+    """
+    from pyngding.scanning.targets import TargetSet, unpack_bitmap
+
+    with get_db(db_path) as conn:
+        run = conn.execute("""
+            SELECT r.probed, t.spec FROM scan_runs r
+            LEFT JOIN target_sets t ON t.id = r.target_set_id
+            WHERE r.id = ?
+        """, (run_id,)).fetchone()
+        if run is None:
+            return None
+        probed = None
+        if run['spec'] is not None:
+            target_set = TargetSet.from_spec(run['spec'])
+            if run['probed'] is not None:
+                probed = target_set.in_bitmap(unpack_bitmap(run['probed']), ip)
+            else:
+                probed = ip in target_set
+
+        row = conn.execute("""
+            SELECT run_id, status, rtt_ms, mac, hostname, probe FROM observations
+            WHERE ip = ? AND run_id <= ?
+            ORDER BY run_id DESC, id DESC
+            LIMIT 1
+        """, (ip, run_id)).fetchone()
+
+    if row is None:
+        if not probed:
+            return None
+        return {'ip': ip, 'status': 'down', 'rtt_ms': None, 'mac': None, 'hostname': None,
+                'probe': None, 'since_run_id': None, 'probed': True}
+    if probed is None and row['run_id'] == run_id:
+        probed = True
+    return {
+        'ip': ip,
+        'status': row['status'],
+        'rtt_ms': row['rtt_ms'],
+        'mac': row['mac'],
+        'hostname': row['hostname'],
+        'probe': row['probe'],
+        'since_run_id': row['run_id'],
+        'probed': probed
+    }
+
+
+def get_host_states(db_path: str) -> dict[str, tuple[str, str | None]]:
+    """Get ip -> (last_status, mac) for all hosts."""
+    with get_db(db_path) as conn:
+        return _read_host_states(conn)
+
+
+def get_scan_run_id_by_batch(db_path: str, batch_id: str) -> int | None:
+    """Get the ID of the scan run an agent batch was ingested as, if any."""
+    with get_db(db_path) as conn:
+        row = conn.execute("SELECT id FROM scan_runs WHERE batch_id = ?", (batch_id,)).fetchone()
+        return row[0] if row else None
+
+
+def finish_scan_run(db_path: str, run_id: int, finished_ts: int, up_count: int,
+                    down_count: int, target_set_id: int | None = None,
+                    probed: bytes | None = None, up: bytes | None = None,
+                    start_lag_ms: float | None = None, duration_ms: float | None = None) -> None:
+    """Record the final counts of a scan run created while it was in progress.
+
+    Runs that are still in progress have finished_ts = 0. target_set_id,
+    probed and up are the run's membership bitmaps, as in commit_scan_run();
+    start_lag_ms and duration_ms its cycle timing.
+    """
+    from pyngding.scanning.targets import pack_bitmap
+
+    def write(conn):
+        conn.execute("""
+            UPDATE scan_runs SET finished_ts = ?, up_count = ?, down_count = ?,
+                                 target_set_id = ?, probed = ?, up = ?,
+                                 start_lag_ms = ?, duration_ms = ?
+            WHERE id = ?
+        """, (finished_ts, up_count, down_count, target_set_id,
+              pack_bitmap(probed) if probed is not None else None,
+              pack_bitmap(up) if up is not None else None,
+              start_lag_ms, duration_ms, run_id))
+
+    return run_write(db_path, write)
+
 
 def insert_observation(db_path: str, run_id: int, ip: str, status: str,
                        rtt_ms: int | None = None, mac: str | None = None,
-                       hostname: str | None = None) -> None:
+                       hostname: str | None = None, probe: str | None = None) -> None:
     """Insert an observation record."""
-    with get_db(db_path) as conn:
+    def write(conn):
         conn.execute("""
-            INSERT INTO observations (run_id, ip, status, rtt_ms, mac, hostname)
-            VALUES (?, ?, ?, ?, ?, ?)
-        """, (run_id, ip, status, rtt_ms, mac, hostname))
+            INSERT INTO observations (run_id, ip, status, rtt_ms, mac, hostname, probe)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, (run_id, ip, status, rtt_ms, mac, hostname, probe))
+
+    return run_write(db_path, write)
 
 
 def insert_observations_batch(db_path: str, observations: list[dict]) -> int:
@@ -274,6 +600,7 @@ def insert_observations_batch(db_path: str, observations: list[dict]) -> int:
     Args:
         db_path: Path to the database
         observations: List of dicts with keys: run_id, ip, status, rtt_ms, mac, hostname
+            and optionally probe
     
     Returns:
         Number of observations inserted.
@@ -281,13 +608,15 @@ def insert_observations_batch(db_path: str, observations: list[dict]) -> int:
     if not observations:
         return 0
     
-    with get_db(db_path) as conn:
+    def write(conn):
         conn.executemany("""
-            INSERT INTO observations (run_id, ip, status, rtt_ms, mac, hostname)
-            VALUES (:run_id, :ip, :status, :rtt_ms, :mac, :hostname)
-        """, observations)
+            INSERT INTO observations (run_id, ip, status, rtt_ms, mac, hostname, probe)
+            VALUES (:run_id, :ip, :status, :rtt_ms, :mac, :hostname, :probe)
+        """, ({'probe': None, **o} for o in observations))
         return len(observations)
 
+    return run_write(db_path, write)
+
 
 def get_all_hosts(db_path: str, status: str | None = None) -> list[dict]:
     """Get all hosts, optionally filtered by status."""
@@ -299,17 +628,66 @@ def get_all_hosts(db_path: str, status: str | None = None) -> list[dict]:
         return [dict(row) for row in rows]
 
 
+def get_last_up_times(db_path: str, changes_only: bool = False) -> dict[str, int]:
+    """Get IP -> start time of the most recent run in which it was up.
+
+    Only covers observations still within the retention window. With
+    changes_only (observation_mode = changes) only transitions are stored,
+    so for a host that went down this is the start of the run in which it
+    was first seen down.
+    """
+    with get_db(db_path) as conn:
+        if changes_only:
+            rows = conn.execute("""
+                SELECT o.ip, MAX(r.started_ts)
+                FROM observations o
+                JOIN scan_runs r ON r.id = o.run_id
+                WHERE o.status = 'up'
+                   OR EXISTS (SELECT 1 FROM observations p
+                              WHERE p.ip = o.ip AND p.id < o.id AND p.status = 'up')
+                GROUP BY o.ip
+            """).fetchall()
+        else:
+            rows = conn.execute("""
+                SELECT o.ip, MAX(r.started_ts)
+                FROM observations o
+                JOIN scan_runs r ON r.id = o.run_id
+                WHERE o.status = 'up'
+                GROUP BY o.ip
+            """).fetchall()
+        return {row[0]: row[1] for row in rows}
+
+
 def get_recent_scan_runs(db_path: str, limit: int = 200) -> list[dict]:
-    """Get recent scan runs for charting."""
+    """Get recent completed scan runs for charting."""
     with get_db(db_path) as conn:
         rows = conn.execute("""
             SELECT * FROM scan_runs
+            WHERE finished_ts > 0
             ORDER BY started_ts DESC
             LIMIT ?
         """, (limit,)).fetchall()
         return [dict(row) for row in rows]
 
 
+def get_scan_timings(db_path: str, limit: int = 100, profile: str | None = None) -> list[dict]:
+    """Get the cycle timing of recent completed local scan runs, newest first.
+
+    Optionally only those of one scan profile. Returns dicts with keys
+    run_id, profile, started_ts, finished_ts, targets_count, start_lag_ms
+    and duration_ms.
+    """
+    with get_db(db_path) as conn:
+        rows = conn.execute("""
+            SELECT id AS run_id, profile, started_ts, finished_ts, targets_count, start_lag_ms, duration_ms
+            FROM scan_runs
+            WHERE finished_ts > 0 AND duration_ms IS NOT NULL AND (? IS NULL OR profile = ?)
+            ORDER BY started_ts DESC, id DESC
+            LIMIT ?
+        """, (profile, profile, limit)).fetchall()
+        return [dict(row) for row in rows]
+
+
 def get_ui_setting(db_path: str, key: str, default: str | None = None) -> str | None:
     """Get a UI setting value."""
     with get_db(db_path) as conn:
@@ -317,13 +695,53 @@ def get_ui_setting(db_path: str, key: str, default: str | None = None) -> str |
         return row[0] if row else default
 
 
-def set_ui_setting(db_path: str, key: str, value: str) -> None:
-    """Set a UI setting value."""
-    with get_db(db_path) as conn:
+def set_ui_setting(db_path: str, key: str, value: str, bump_version: bool = True) -> None:
+    """Set a UI setting value.
+
+    Bumps the settings version so settings snapshots reload; internal state
+    kept in ui_settings (bump_version=False) does not.
+    """
+    def write(conn):
         conn.execute("""
             INSERT OR REPLACE INTO ui_settings (key, value)
             VALUES (?, ?)
         """, (key, value))
+        if bump_version:
+            conn.execute("UPDATE settings_version SET version = version + 1 WHERE id = 1")
+
+    return run_write(db_path, write)
+
+
+def set_ui_settings(db_path: str, settings: dict[str, str]) -> None:
+    """Set several UI settings in one transaction (one version bump)."""
+    if not settings:
+        return
+
+    def write(conn):
+        conn.executemany("""
+            INSERT OR REPLACE INTO ui_settings (key, value)
+            VALUES (?, ?)
+        """, settings.items())
+        conn.execute("UPDATE settings_version SET version = version + 1 WHERE id = 1")
+
+    return run_write(db_path, write)
+
+
+def get_settings_version(db_path: str) -> int:
+    """Get the settings version (changes with every settings write)."""
+    with get_db(db_path) as conn:
+        row = conn.execute("SELECT version FROM settings_version WHERE id = 1").fetchone()
+        return row[0] if row else 0
+
+
+def get_ui_settings(db_path: str) -> tuple[int, dict[str, str]]:
+    """Get the settings version and all UI settings, read together."""
+    with get_db(db_path) as conn:
+        # Version first: a concurrent write can only make the settings newer
+        # than the version they are labelled with (and so reload once more)
+        row = conn.execute("SELECT version FROM settings_version WHERE id = 1").fetchone()
+        settings = {key: value for key, value in conn.execute("SELECT key, value FROM ui_settings")}
+        return (row[0] if row else 0), settings
 
 
 def get_device_profile(db_path: str, mac: str | None = None, ip: str | None = None) -> dict | None:
@@ -346,7 +764,7 @@ def upsert_device_profile(db_path: str, mac: str | None = None, ip: str | None =
     if now_ts is None:
         now_ts = int(time.time())
 
-    with get_db(db_path) as conn:
+    def write(conn):
         # Check if exists
         existing = None
         if mac:
@@ -377,6 +795,8 @@ def upsert_device_profile(db_path: str, mac: str | None = None, ip: str | None =
             """, (mac, ip_key, label, 1 if is_safe else 0, tags, notes, now_ts, now_ts))
             return cursor.lastrowid
 
+    return run_write(db_path, write)
+
 
 def get_all_device_profiles(db_path: str) -> list[dict]:
     """Get all device profiles."""
@@ -387,10 +807,12 @@ def get_all_device_profiles(db_path: str) -> list[dict]:
 
 def delete_device_profile(db_path: str, profile_id: int) -> bool:
     """Delete a device profile by ID."""
-    with get_db(db_path) as conn:
+    def write(conn):
         cursor = conn.execute("DELETE FROM device_profiles WHERE id = ?", (profile_id,))
         return cursor.rowcount > 0
 
+    return run_write(db_path, write)
+
 
 def get_hosts_with_profiles(db_path: str) -> list[dict]:
     """Get all hosts with their device profile information joined."""
@@ -418,13 +840,15 @@ def create_api_key(db_path: str, name: str, key_prefix: str, key_hash: str, now_
     if now_ts is None:
         now_ts = int(time.time())
 
-    with get_db(db_path) as conn:
+    def write(conn):
         cursor = conn.execute("""
             INSERT INTO api_keys (name, key_prefix, key_hash, created_ts, is_enabled)
             VALUES (?, ?, ?, ?, 1)
         """, (name, key_prefix, key_hash, now_ts))
         return cursor.lastrowid
 
+    return run_write(db_path, write)
+
 
 def get_all_api_keys(db_path: str) -> list[dict]:
     """Get all API keys (without hashes, for display)."""
@@ -448,43 +872,54 @@ def get_api_key_by_prefix(db_path: str, key_prefix: str) -> dict | None:
 
 
 def update_api_key_last_used(db_path: str, key_id: int, now_ts: int | None = None) -> None:
-    """Update last_used_ts for an API key."""
+    """Update last_used_ts for an API key.
+
+    Queued without waiting for the commit: requests do not wait on it.
+    """
     if now_ts is None:
         now_ts = int(time.time())
 
-    with get_db(db_path) as conn:
+    def write(conn):
         conn.execute("""
             UPDATE api_keys SET last_used_ts = ? WHERE id = ?
         """, (now_ts, key_id))
 
+    submit_write(db_path, write)
+
 
 def toggle_api_key(db_path: str, key_id: int, is_enabled: bool) -> bool:
     """Enable or disable an API key. Returns True if updated."""
-    with get_db(db_path) as conn:
+    def write(conn):
         cursor = conn.execute("""
             UPDATE api_keys SET is_enabled = ? WHERE id = ?
         """, (1 if is_enabled else 0, key_id))
         return cursor.rowcount > 0
 
+    return run_write(db_path, write)
+
 
 def delete_api_key(db_path: str, key_id: int) -> bool:
     """Delete an API key. Returns True if deleted."""
-    with get_db(db_path) as conn:
+    def write(conn):
         cursor = conn.execute("DELETE FROM api_keys WHERE id = ?", (key_id,))
         return cursor.rowcount > 0
 
+    return run_write(db_path, write)
+
 
 # AdGuard DNS functions
 def insert_dns_event(db_path: str, ts: int, client_ip: str, domain: str,
                     qtype: str | None = None, status: str | None = None,
                     upstream: str | None = None) -> None:
     """Insert a DNS event."""
-    with get_db(db_path) as conn:
+    def write(conn):
         conn.execute("""
             INSERT INTO dns_events (ts, client_ip, domain, qtype, status, upstream)
             VALUES (?, ?, ?, ?, ?, ?)
         """, (ts, client_ip, domain, qtype, status, upstream))
 
+    return run_write(db_path, write)
+
 
 def insert_dns_events_batch(db_path: str, events: list[dict]) -> int:
     """Insert multiple DNS events in a single transaction.
@@ -499,13 +934,15 @@ def insert_dns_events_batch(db_path: str, events: list[dict]) -> int:
     if not events:
         return 0
     
-    with get_db(db_path) as conn:
+    def write(conn):
         conn.executemany("""
             INSERT INTO dns_events (ts, client_ip, domain, qtype, status, upstream)
             VALUES (:ts, :client_ip, :domain, :qtype, :status, :upstream)
         """, events)
         return len(events)
 
+    return run_write(db_path, write)
+
 
 def get_adguard_state(db_path: str) -> dict:
     """Get AdGuard ingestion state (last_seen_ts, last_offset)."""
@@ -520,17 +957,18 @@ def get_adguard_state(db_path: str) -> dict:
 def set_adguard_state(db_path: str, last_seen_ts: int | None = None,
                      last_offset: int | None = None) -> None:
     """Update AdGuard ingestion state."""
+    # Ingestion cursors, not settings: keep settings snapshots valid
     if last_seen_ts is not None:
-        set_ui_setting(db_path, 'adguard_last_seen_ts', str(last_seen_ts))
+        set_ui_setting(db_path, 'adguard_last_seen_ts', str(last_seen_ts), bump_version=False)
     if last_offset is not None:
-        set_ui_setting(db_path, 'adguard_last_offset', str(last_offset))
+        set_ui_setting(db_path, 'adguard_last_offset', str(last_offset), bump_version=False)
 
 
 def update_dns_daily_rollup(db_path: str, day_yyyymmdd: int, client_ip: str,
                            total_queries: int, blocked_queries: int,
                            unique_domains: int) -> None:
     """Update or insert daily DNS rollup for a client."""
-    with get_db(db_path) as conn:
+    def write(conn):
         conn.execute("""
             INSERT INTO dns_daily_client (day_yyyymmdd, client_ip, total_queries, blocked_queries, unique_domains)
             VALUES (?, ?, ?, ?, ?)
@@ -543,6 +981,8 @@ def update_dns_daily_rollup(db_path: str, day_yyyymmdd: int, client_ip: str,
                                  AND ts < (excluded.day_yyyymmdd + 1) * 86400)
         """, (day_yyyymmdd, client_ip, total_queries, blocked_queries, unique_domains))
 
+    return run_write(db_path, write)
+
 
 def get_host_dns_summary(db_path: str, client_ip: str, limit: int = 20) -> dict:
     """Get DNS summary for a host (recent domains, top domains, stats)."""
@@ -613,10 +1053,127 @@ def insert_ipv6_neighbors_batch(db_path: str, neighbors: list[dict], ts: int | N
     # Add timestamp to each record
     records = [{'ts': ts, 'ip6': n['ip6'], 'mac': n.get('mac'), 'state': n.get('state')} for n in neighbors]
     
-    with get_db(db_path) as conn:
+    def write(conn):
         conn.executemany("""
             INSERT INTO ipv6_neighbors (ts, ip6, mac, state)
             VALUES (:ts, :ip6, :mac, :state)
         """, records)
         return len(records)
 
+    return run_write(db_path, write)
+
+
+
+# Notification outbox functions
+def enqueue_notifications(db_path: str, notifications: list[dict], now_ts: float | None = None) -> list[int]:
+    """Add notifications to the outbox in a single transaction.
+
+    Args:
+        db_path: Path to the database
+        notifications: List of dicts with keys: channel, event_type, ip, payload (dict)
+        now_ts: Enqueue time (defaults to current time)
+
+    Returns:
+        Outbox IDs, in order.
+    """
+    if now_ts is None:
+        now_ts = time.time()
+
+    def write(conn):
+        ids = []
+        for n in notifications:
+            cursor = conn.execute("""
+                INSERT INTO notification_outbox (channel, event_type, ip, payload, created_ts, next_attempt_ts)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (n['channel'], n['event_type'], n['ip'], json.dumps(n['payload']), now_ts, now_ts))
+            ids.append(cursor.lastrowid)
+        return ids
+
+    return run_write(db_path, write)
+
+
+def get_outbox_heads(db_path: str) -> list[dict]:
+    """Get the oldest pending notification of each channel.
+
+    Channels deliver in order, so only these are candidates for sending.
+    The payload is decoded.
+    """
+    with get_db(db_path) as conn:
+        rows = conn.execute("""
+            SELECT * FROM notification_outbox
+            WHERE id IN (
+                SELECT MIN(id) FROM notification_outbox WHERE status = 'pending' GROUP BY channel
+            )
+        """).fetchall()
+        return [{**dict(row), 'payload': json.loads(row['payload'])} for row in rows]
+
+
+def get_pending_notifications(db_path: str, channel: str, limit: int = 1000) -> list[dict]:
+    """Get a channel's pending notifications, oldest first, with payloads decoded."""
+    with get_db(db_path) as conn:
+        rows = conn.execute("""
+            SELECT * FROM notification_outbox
+            WHERE status = 'pending' AND channel = ?
+            ORDER BY id
+            LIMIT ?
+        """, (channel, limit)).fetchall()
+        return [{**dict(row), 'payload': json.loads(row['payload'])} for row in rows]
+
+
+def mark_notifications_sent(db_path: str, outbox_ids: list[int], now_ts: float | None = None) -> None:
+    """Record delivered notifications (sent on their own or in one digest)."""
+    if now_ts is None:
+        now_ts = time.time()
+
+    def write(conn):
+        conn.executemany("""
+            UPDATE notification_outbox
+            SET status = 'sent', attempts = attempts + 1, sent_ts = ?, last_error = NULL
+            WHERE id = ?
+        """, ((now_ts, outbox_id) for outbox_id in outbox_ids))
+
+    return run_write(db_path, write)
+
+
+def mark_notifications_failed(db_path: str, outbox_ids: list[int], error: str,
+                              next_attempt_ts: float, max_attempts: int) -> int:
+    """Record a failed delivery attempt of notifications.
+
+    They are retried at next_attempt_ts, except those that have now been
+    tried max_attempts times, which are given up on (status 'failed').
+
+    Returns the number given up on.
+    """
+    def write(conn):
+        conn.executemany("""
+            UPDATE notification_outbox
+            SET attempts = attempts + 1, last_error = ?, next_attempt_ts = ?,
+                status = CASE WHEN attempts + 1 >= ? THEN 'failed' ELSE status END
+            WHERE id = ?
+        """, ((error, next_attempt_ts, max_attempts, outbox_id) for outbox_id in outbox_ids))
+        placeholders = ','.join('?' * len(outbox_ids))
+        return conn.execute(f"""
+            SELECT COUNT(*) FROM notification_outbox WHERE status = 'failed' AND id IN ({placeholders})
+        """, outbox_ids).fetchone()[0] if outbox_ids else 0
+
+    return run_write(db_path, write)
+
+
+def get_outbox_stats(db_path: str) -> dict:
+    """Get outbox depth per channel and the age of the oldest pending notification.
+
+    Returns {'pending': {channel: count}, 'failed': {channel: count},
+    'oldest_pending_ts': float | None}.
+    """
+    stats = {'pending': {}, 'failed': {}, 'oldest_pending_ts': None}
+    with get_db(db_path) as conn:
+        for row in conn.execute("""
+            SELECT channel, status, COUNT(*) FROM notification_outbox
+            WHERE status IN ('pending', 'failed')
+            GROUP BY channel, status
+        """):
+            stats[row[1]][row[0]] = row[2]
+        stats['oldest_pending_ts'] = conn.execute("""
+            SELECT MIN(created_ts) FROM notification_outbox WHERE status = 'pending'
+        """).fetchone()[0]
+    return stats
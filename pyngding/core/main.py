@@ -27,10 +27,67 @@ bind_port = 8080
 db_path = /data/pyngding.sqlite
 scan_targets = 192.168.1.0/24
 scan_interval_seconds = 60
+overrun_policy = skip
 ping_timeout_seconds = 1
 ping_count = 1
+ping_engine = subprocess
+arp_rate_pps = 4000
+arp_timeout_seconds = 0.5
 max_workers = 32
+async_scan = false
+max_in_flight = 1024
+max_in_flight_total = 0
+scan_processes = 1
 target_cap = 4096
+max_pps = 0
+randomize_targets = true
+tcp_fallback = false
+tcp_fallback_ports = 22,80,443,445,62078
+tcp_fallback_timeout_seconds = 0.5
+adaptive_scan = false
+adaptive_min_timeout_seconds = 0.2
+adaptive_recent_seconds = 86400
+adaptive_stale_every = 4
+adaptive_unseen_every = 16
+observation_mode = full
+db_commit_max_jobs = 256
+db_commit_max_ms = 50
+
+[simulation]
+# Only used with ping_engine = simulated
+seed = 0
+up_ratio = 0.3
+rtt_ms = 2
+rtt_sigma = 0.5
+loss_rate = 0.01
+mac_churn = 0
+churn = 0.001
+
+# Scan profiles: parts of the scope scanned on their own schedule, on top
+# of (or instead of) scan_targets above. Unset keys default to [pyngding].
+# [profile:servers]
+# scan_targets = 192.168.1.1-192.168.1.20
+# scan_interval_seconds = 10
+# ping_timeout_seconds = 0.5
+# max_workers = 8
+# max_in_flight = 256
+
+[notifications]
+# Background delivery of notifications (channels are set up in the web UI)
+workers = 4
+max_attempts = 8
+backoff_seconds = 5
+backoff_max_seconds = 600
+
+[agent]
+# Only used by 'pyngding agent'
+server_url =
+api_key =
+site =
+spool_dir = /data/spool
+spool_max_batches = 10000
+reverse_dns = true
+push_timeout_seconds = 10
 
 [auth]
 enabled = false
@@ -78,7 +135,7 @@ def serve(args):
     import logging
     import signal
 
-    from pyngding.core.config import load_config
+    from pyngding.core.config import get_scan_profiles, load_config
     from pyngding.core.db import init_db
     from pyngding.core.logger import configure_logging, get_logger
     from pyngding.scanning.scheduler import ScanScheduler
@@ -104,7 +161,8 @@ def serve(args):
         config = load_config(args.config)
         print(f"Starting pyngding server on {config.bind_host}:{config.bind_port}")
         print(f"Database: {config.db_path}")
-        print(f"Scan targets: {config.scan_targets}")
+        for profile in get_scan_profiles(config):
+            print(f"Scan profile {profile.name}: {profile.scan_targets} every {profile.scan_interval_seconds}s")
         print(f"Auth enabled: {config.auth_enabled}")
 
         # Initialize database
@@ -136,6 +194,44 @@ def serve(args):
         return 1
 
 
+def agent(args):
+    """Run a remote scan agent that pushes results to a pyngding server."""
+    import logging
+    import signal
+
+    from pyngding.core.config import load_config
+    from pyngding.core.logger import configure_logging, get_logger
+    from pyngding.scanning.agent import ScanAgent
+
+    configure_logging(level=logging.INFO)
+    logger = get_logger()
+
+    try:
+        config = load_config(args.config)
+        if not config.agent_server_url or not config.agent_api_key:
+            print("Error: agent.server_url and agent.api_key must be set in config.ini", file=sys.stderr)
+            return 1
+
+        scan_agent = ScanAgent(config)
+        print(f"Starting pyngding agent for site {scan_agent.site}")
+        print(f"Server: {config.agent_server_url}")
+        print(f"Scan targets: {config.scan_targets}")
+        print(f"Spool: {config.agent_spool_dir}")
+
+        def shutdown_handler(signum, frame):
+            print("\nShutting down...")
+            scan_agent.stop()
+
+        signal.signal(signal.SIGINT, shutdown_handler)
+        signal.signal(signal.SIGTERM, shutdown_handler)
+
+        scan_agent.run(once=args.once)
+        return 0
+    except Exception as e:
+        logger.error(f"Error: {e}", exc_info=True)
+        return 1
+
+
 def cli():
     """Main CLI entry point."""
     parser = argparse.ArgumentParser(prog='pyngding', description='Lightweight LAN presence scanner')
@@ -147,6 +243,14 @@ def cli():
                              help='Path to config.ini file (default: config.ini)')
     serve_parser.set_defaults(func=serve)
 
+    # agent command
+    agent_parser = subparsers.add_parser('agent', help='Scan local targets and push results to a pyngding server')
+    agent_parser.add_argument('--config', type=str, default='config.ini',
+                              help='Path to config.ini file (default: config.ini)')
+    agent_parser.add_argument('--once', action='store_true',
+                              help='Run a single scan, push it and exit')
+    agent_parser.set_defaults(func=agent)
+
     # hash-password command
     hash_parser = subparsers.add_parser('hash-password', help='Hash a password for config.ini')
     hash_parser.add_argument('password', type=str, help='Password to hash')
@@ -0,0 +1,258 @@
+"""Single-writer database service with group commit.
+
+Every write to the database goes through one thread per database, which
+owns the only connection that writes. Callers hand it jobs, functions that
+take that connection, and get a Future for each job's return value (e.g. a
+row ID). Reads keep using the per-thread connections of get_db(); in WAL
+mode they never wait for the writer.
+
+Jobs run in queue order. Each one runs in a savepoint, so a job that fails
+only rolls back its own statements. Jobs that are already queued when a
+transaction is open join it, up to max_jobs jobs or max_ms milliseconds per
+transaction. So the writer commits once per batch under load and right away
+when it is idle. A job's Future completes once its transaction is
+committed, so a caller that waits on it sees its write in later reads.
+Since only one connection writes, callers never hit 'database is locked'
+from each other, and a write waits for at most one open transaction.
+"""
+import queue
+import sqlite3
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import Future
+from typing import TypeVar
+
+from pyngding.core.logger import get_logger
+
+logger = get_logger('writer')
+
+T = TypeVar('T')
+
+MAX_JOBS = 256  # jobs committed in one transaction at most
+MAX_MS = 50.0  # longest a transaction stays open collecting queued jobs
+
+_STOP = object()  # queued by stop() to end the writer thread
+
+
+class DatabaseWriter:
+    """Run write jobs for one database on a dedicated thread, committing them in groups."""
+
+    def __init__(self, db_path: str, max_jobs: int = MAX_JOBS, max_ms: float = MAX_MS):
+        self.db_path = db_path
+        self.max_jobs = max(1, max_jobs)
+        self.max_ms = max(0.0, max_ms)
+        self.queue: queue.Queue = queue.Queue()
+        self.thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+        self.stats = {
+            'jobs': 0,
+            'commits': 0,
+            'errors': 0,
+            'max_jobs_per_commit': 0,
+            'latency_seconds_sum': 0.0,  # from submit() to commit, over all jobs
+            'max_latency_seconds': 0.0,
+        }
+
+    def start(self) -> None:
+        """Start the writer thread if it is not running."""
+        with self._lock:
+            if self.thread is not None and self.thread.is_alive():
+                return
+            self.thread = threading.Thread(target=self._run_loop, name='pyngding-writer', daemon=True)
+            self.thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Commit the queued jobs and stop the writer thread.
+
+        submit() starts it again.
+        """
+        with self._lock:
+            thread = self.thread
+        if thread is None or not thread.is_alive():
+            return
+        self.queue.put(_STOP)
+        thread.join(timeout=timeout)
+
+    def submit(self, job: Callable[[sqlite3.Connection], T]) -> Future:
+        """Queue a write job; the Future gets its return value (or exception) once committed."""
+        future: Future = Future()
+        if self.in_writer_thread():
+            # A job that writes more: run it inline, in the current transaction
+            try:
+                future.set_result(job(self._conn))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+        self.start()
+        self.queue.put((job, future, time.monotonic()))
+        return future
+
+    def run(self, job: Callable[[sqlite3.Connection], T]) -> T:
+        """Run a write job and wait for it to be committed. Returns its return value."""
+        return self.submit(job).result()
+
+    def in_writer_thread(self) -> bool:
+        """True when called from a job, on the writer thread."""
+        return threading.current_thread() is self.thread
+
+    def _run_loop(self) -> None:
+        try:
+            # Autocommit mode: transactions are started and committed here
+            self._conn = sqlite3.connect(self.db_path, isolation_level=None, check_same_thread=False)
+            self._conn.row_factory = sqlite3.Row
+            # Safe in WAL mode; commits then do not wait for an fsync
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+        except sqlite3.Error as e:
+            logger.error(f"Error opening the database writer connection: {e}")
+            self._fail_queued(e)
+            return
+        try:
+            while True:
+                item = self.queue.get()
+                if item is _STOP:
+                    break
+                if not self._run_batch(item):
+                    break
+        except Exception as e:
+            # Never leave callers waiting on a writer that is gone; the next
+            # submit() starts a new one
+            logger.error(f"Database writer failed: {e}", exc_info=True)
+            self._fail_queued(e)
+        finally:
+            self._conn.close()
+
+    def _fail_queued(self, error: BaseException) -> None:
+        """Fail the futures of every queued job."""
+        while True:
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                return
+            if item is not _STOP and not item[1].done():
+                item[1].set_exception(error)
+
+    def _run_batch(self, item) -> bool:
+        """Run item and the jobs queued behind it in one transaction. Returns False once stopped."""
+        conn = self._conn
+        done: list[tuple[Future, float, object, BaseException | None]] = []
+        running = True
+        deadline = time.monotonic() + self.max_ms / 1000
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+        except sqlite3.Error as e:
+            # Locked by another process for longer than the busy timeout
+            logger.error(f"Error starting a write transaction: {e}")
+            with self._lock:
+                self.stats['errors'] += 1
+            item[1].set_exception(e)
+            return True
+
+        error = None  # Set when the transaction as a whole cannot be committed
+        try:
+            while True:
+                job, future, submitted = item
+                try:
+                    conn.execute("SAVEPOINT job")
+                    result = job(conn)
+                    conn.execute("RELEASE job")
+                    done.append((future, submitted, result, None))
+                except Exception as e:
+                    done.append((future, submitted, None, e))
+                    try:
+                        conn.execute("ROLLBACK TO job")
+                        conn.execute("RELEASE job")
+                    except sqlite3.Error as rollback_error:
+                        # SQLite already rolled back the whole transaction
+                        # (disk full, I/O error, out of memory)
+                        error = rollback_error
+                        break
+
+                if len(done) >= self.max_jobs or time.monotonic() >= deadline:
+                    break
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    running = False
+                    break
+
+            if error is None:
+                conn.execute("COMMIT")
+        except Exception as e:
+            # Only the current job can be missing from done
+            error = e
+            if item is not _STOP and not any(entry[0] is item[1] for entry in done):
+                done.append((item[1], item[2], None, e))
+
+        if error is not None:
+            logger.error(f"Error committing {len(done)} writes: {error}")
+            if conn.in_transaction:
+                try:
+                    conn.execute("ROLLBACK")
+                except sqlite3.Error:
+                    pass
+
+        now = time.monotonic()
+        with self._lock:
+            stats = self.stats
+            stats['jobs'] += len(done)
+            stats['commits'] += 1
+            stats['max_jobs_per_commit'] = max(stats['max_jobs_per_commit'], len(done))
+            for _, submitted, _, job_error in done:
+                latency = now - submitted
+                stats['latency_seconds_sum'] += latency
+                stats['max_latency_seconds'] = max(stats['max_latency_seconds'], latency)
+                if job_error is not None or error is not None:
+                    stats['errors'] += 1
+        for future, _, result, job_error in done:
+            if job_error is not None or error is not None:
+                future.set_exception(job_error or error)
+            else:
+                future.set_result(result)
+        return running
+
+    def get_stats(self) -> dict:
+        """Get job, commit and latency counters and the queue depth."""
+        with self._lock:
+            stats = dict(self.stats)
+        stats['queue_depth'] = self.queue.qsize()
+        return stats
+
+
+# Module-level writers, one per database
+_writers: dict[str, DatabaseWriter] = {}
+_writers_lock = threading.Lock()
+
+
+def get_writer(db_path: str) -> DatabaseWriter:
+    """Get the DatabaseWriter for db_path.
+
+    Thread-safe lazy initialization; the thread starts on the first job.
+    """
+    writer = _writers.get(db_path)
+    if writer is None:
+        with _writers_lock:
+            writer = _writers.get(db_path)
+            if writer is None:
+                writer = _writers[db_path] = DatabaseWriter(db_path)
+    return writer
+
+
+def configure_writer(db_path: str, max_jobs: int = MAX_JOBS, max_ms: float = MAX_MS) -> DatabaseWriter:
+    """Set the group commit limits of the writer for db_path."""
+    writer = get_writer(db_path)
+    writer.max_jobs = max(1, max_jobs)
+    writer.max_ms = max(0.0, max_ms)
+    return writer
+
+
+def run_write(db_path: str, job: Callable[[sqlite3.Connection], T]) -> T:
+    """Run a write job on the writer of db_path and wait for its commit. Returns its return value."""
+    return get_writer(db_path).run(job)
+
+
+def submit_write(db_path: str, job: Callable[[sqlite3.Connection], T]) -> Future:
+    """Queue a write job on the writer of db_path without waiting for it."""
+    return get_writer(db_path).submit(job)
@@ -0,0 +1,162 @@
+"""In-memory host state and device profile cache.
+
+The scheduler is the only writer of the hosts table (commit_scan_run), so
+it can keep an authoritative copy of each host's last status and MAC and
+detect changes without re-reading the table every cycle. Device profiles
+are resolved on demand and cached until an admin route changes them.
+
+In change-only observation mode it also tracks each IP's last written
+observation, to decide which results are worth a row.
+"""
+import threading
+
+from pyngding.core.db import get_device_profile, get_host_states, get_latest_observations, rtt_bucket
+from pyngding.core.logger import get_logger
+
+logger = get_logger('host_cache')
+
+_MISSING = object()
+
+
+class HostCache:
+    """Host state (ip -> (last_status, mac)) and resolved device profiles.
+
+    Host state is loaded from the database on first use and then updated
+    with every committed run (apply()); callers that commit runs hold
+    `lock` across commit and apply so the two never diverge. Profiles are
+    cached per lookup key, including misses.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.lock = threading.RLock()
+        self._hosts: dict[str, tuple[str, str | None]] | None = None
+        self._observed: dict[str, tuple[str, str | None, str | None, int | None]] | None = None
+        self._profiles: dict[tuple[str, str], dict | None] = {}
+        # Bumped by every invalidation, so a profile read from the database
+        # before one is not cached after it
+        self._profiles_generation = 0
+
+    @property
+    def hosts(self) -> dict[str, tuple[str, str | None]]:
+        """Get the host state map, loading it on first use."""
+        with self.lock:
+            if self._hosts is None:
+                self._hosts = get_host_states(self.db_path)
+                logger.debug(f"Loaded state of {len(self._hosts)} hosts")
+            return self._hosts
+
+    @property
+    def observed(self) -> dict[str, tuple[str, str | None, str | None, int | None]]:
+        """Get ip -> (status, mac, hostname, rtt bucket) of the last written observations."""
+        with self.lock:
+            if self._observed is None:
+                self._observed = get_latest_observations(self.db_path)
+            return self._observed
+
+    def changed_observations(self, results: list[dict]) -> list[dict]:
+        """Get the observation rows change-only mode writes for a run.
+
+        A result gets a row if its status differs from the IP's last row, or,
+        for up hosts, its MAC, hostname or RTT bucket does; MAC and hostname
+        only count when known, and are carried over from the last row when
+        not. Addresses with no row yet that are down get none (the run's
+        probed bitmap records them).
+        """
+        rows = []
+        with self.lock:
+            observed = self.observed
+            for result in results:
+                last = observed.get(result['ip'])
+                if last is None:
+                    if result['status'] == 'up':
+                        rows.append(result)
+                    continue
+                status, mac, hostname, bucket = last
+                if result['status'] != status:
+                    rows.append(result)
+                elif status == 'up' and (
+                        (result.get('mac') and result['mac'] != mac)
+                        or (result.get('hostname') and result['hostname'] != hostname)
+                        or rtt_bucket(result.get('rtt_ms')) != bucket):
+                    rows.append({**result, 'mac': result.get('mac') or mac,
+                                 'hostname': result.get('hostname') or hostname})
+        return rows
+
+    def apply(self, results: list[dict], observations: list[dict] | None = None) -> None:
+        """Update host state with a committed run's results.
+
+        observations are the rows written for the run, if not one per result.
+        """
+        with self.lock:
+            hosts = self.hosts
+            for result in results:
+                previous = hosts.get(result['ip'])
+                # Same rule as the hosts upsert: a result without a MAC keeps the old one
+                mac = result.get('mac') or (previous[1] if previous else None)
+                hosts[result['ip']] = (result['status'], mac)
+
+            if self._observed is not None:
+                for row in results if observations is None else observations:
+                    self._observed[row['ip']] = (row['status'], row.get('mac'), row.get('hostname'),
+                                                 rtt_bucket(row.get('rtt_ms')))
+
+    def get_profile(self, mac: str | None = None, ip: str | None = None) -> dict | None:
+        """Get the device profile for mac (or ip if there is no MAC)."""
+        key = ('mac', mac) if mac else ('ip', ip)
+        with self.lock:
+            profile = self._profiles.get(key, _MISSING)
+            generation = self._profiles_generation
+        if profile is _MISSING:
+            # Read outside the lock, which scan commits hold
+            profile = get_device_profile(self.db_path, mac=mac, ip=ip)
+            with self.lock:
+                if self._profiles_generation == generation:
+                    self._profiles[key] = profile
+        return profile
+
+    def invalidate_profile(self, mac: str | None = None, ip: str | None = None) -> None:
+        """Drop the cached profile of mac and/or ip after it was changed."""
+        with self.lock:
+            self._profiles_generation += 1
+            if mac:
+                self._profiles.pop(('mac', mac), None)
+            if ip:
+                self._profiles.pop(('ip', ip), None)
+
+    def invalidate(self) -> None:
+        """Drop everything; host state is reloaded on next use."""
+        with self.lock:
+            self._hosts = None
+            self._observed = None
+            self._profiles_generation += 1
+            self._profiles.clear()
+
+    def get_stats(self) -> dict:
+        """Get cache sizes."""
+        with self.lock:
+            return {
+                'hosts': len(self._hosts) if self._hosts is not None else 0,
+                'observed': len(self._observed) if self._observed is not None else 0,
+                'profiles': len(self._profiles),
+                'loaded': self._hosts is not None
+            }
+
+
+# Module-level caches, one per database, shared by the scheduler and web routes
+_host_caches: dict[str, HostCache] = {}
+_host_caches_lock = threading.Lock()
+
+
+def get_host_cache(db_path: str) -> HostCache:
+    """Get the HostCache for db_path.
+
+    Thread-safe lazy initialization.
+    """
+    cache = _host_caches.get(db_path)
+    if cache is None:
+        with _host_caches_lock:
+            cache = _host_caches.get(db_path)
+            if cache is None:
+                cache = _host_caches[db_path] = HostCache(db_path)
+    return cache
@@ -0,0 +1,147 @@
+"""Background database maintenance.
+
+Retention, rollups and WAL checkpoints run on their own thread instead of
+at the start of a scan, so a scan never waits for them:
+
+- retention deletes in chunks of consecutive rowids, each one job of the
+  database writer with a pause in between (retention.run_retention), so
+  scan writes queue behind at most one chunk
+- a passive WAL checkpoint runs every CHECKPOINT_INTERVAL seconds; it
+  copies what it can without waiting for readers or blocking writers
+- after each retention pass PRAGMA optimize refreshes the query planner
+  statistics of tables that changed a lot
+"""
+import threading
+import time
+
+from pyngding.core.db import get_db
+from pyngding.core.logger import get_logger
+from pyngding.core.writer import run_write
+from pyngding.data.retention import run_retention, run_rollups
+
+logger = get_logger('maintenance')
+
+RETENTION_INTERVAL = 3600  # seconds between retention and rollup passes
+CHECKPOINT_INTERVAL = 300  # seconds between WAL checkpoints
+
+
+class MaintenanceWorker:
+    """Run retention, rollups and checkpoints periodically in a background thread."""
+
+    def __init__(self, db_path: str, changes_only: bool = False,
+                 retention_interval: float = RETENTION_INTERVAL,
+                 checkpoint_interval: float = CHECKPOINT_INTERVAL):
+        self.db_path = db_path
+        self.changes_only = changes_only
+        self.retention_interval = retention_interval
+        self.checkpoint_interval = checkpoint_interval
+        self.running = False
+        self.thread: threading.Thread | None = None
+        self.stop_event = threading.Event()
+        self._lock = threading.Lock()
+        self.stats = {
+            'phase': 'idle',
+            'table': None,
+            'deleted': {},
+            'last_retention_ts': None,
+            'last_retention_seconds': 0.0,
+            'last_checkpoint_ts': None,
+            'wal_pages': 0,
+            'wal_checkpointed_pages': 0,
+            'rows_deleted_total': 0,
+            'errors': 0,
+        }
+
+    def start(self) -> None:
+        """Start the maintenance thread."""
+        if self.running:
+            return
+        self.running = True
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run_loop, name='pyngding-maintenance', daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        """Stop after the current chunk or step."""
+        self.running = False
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join(timeout=5.0)
+
+    def _run_loop(self) -> None:
+        next_retention = next_checkpoint = time.monotonic()
+        while self.running and not self.stop_event.is_set():
+            now = time.monotonic()
+            if now >= next_retention:
+                next_retention = now + self.retention_interval
+                self._step('retention', self.run_retention)
+            if self.stop_event.is_set():
+                break
+            if time.monotonic() >= next_checkpoint:
+                next_checkpoint = time.monotonic() + self.checkpoint_interval
+                self._step('checkpoint', self.checkpoint)
+            if self.stop_event.wait(max(0.0, min(next_retention, next_checkpoint) - time.monotonic())):
+                break
+
+    def _step(self, phase: str, step) -> None:
+        self._set(phase=phase)
+        try:
+            step()
+        except Exception as e:
+            with self._lock:
+                self.stats['errors'] += 1
+            logger.error(f"Error in {phase}: {e}")
+        finally:
+            self._set(phase='idle', table=None)
+
+    def run_retention(self) -> dict[str, int]:
+        """Run a retention pass, rollups and PRAGMA optimize.
+
+        Returns the counts of deleted records per table.
+        """
+        started = time.monotonic()
+        self._set(deleted={})
+        deleted = run_retention(self.db_path, changes_only=self.changes_only,
+                                stop_event=self.stop_event, progress=self._progress)
+        if self.stop_event.is_set():
+            return deleted
+
+        self._set(phase='rollups', table=None)
+        run_rollups(self.db_path)
+        self._set(phase='optimize')
+        run_write(self.db_path, lambda conn: conn.execute("PRAGMA optimize"))
+
+        elapsed = time.monotonic() - started
+        with self._lock:
+            self.stats['deleted'] = deleted
+            self.stats['last_retention_ts'] = int(time.time())
+            self.stats['last_retention_seconds'] = round(elapsed, 3)
+        if any(deleted.values()):
+            logger.info(f"Retention: Deleted {deleted} in {elapsed:.1f}s")
+        return deleted
+
+    def checkpoint(self) -> None:
+        """Copy committed WAL pages into the database without waiting on readers or writers."""
+        with get_db(self.db_path) as conn:
+            row = conn.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchone()
+        with self._lock:
+            self.stats['last_checkpoint_ts'] = int(time.time())
+            # -1 when the database is not in WAL mode
+            self.stats['wal_pages'] = max(0, row[1])
+            self.stats['wal_checkpointed_pages'] = max(0, row[2])
+
+    def _progress(self, table: str, count: int) -> None:
+        with self._lock:
+            before = self.stats['deleted'].get(table, 0)
+            self.stats['deleted'] = {**self.stats['deleted'], table: count}
+            self.stats['rows_deleted_total'] += count - before
+            self.stats['table'] = table
+
+    def _set(self, **values) -> None:
+        with self._lock:
+            self.stats.update(values)
+
+    def get_stats(self) -> dict:
+        """Get the current phase, retention progress and checkpoint results."""
+        with self._lock:
+            return dict(self.stats)
@@ -0,0 +1,177 @@
+"""Presence queries on per-run bitmaps.
+
+Every local scan run stores which addresses of its target set were up (and,
+if not all of them were, which were probed) as bitmaps indexed by position
+in the target set; target sets are versioned in the target_sets table. These
+queries read one small row per run instead of one observation per target,
+so snapshots, uptime over weeks and run-to-run diffs stay cheap at any
+observation_mode. Runs without bitmaps (agent batches, runs from before
+they were recorded) are skipped. With several scan profiles, the state of
+an address at a time comes from the last run of a profile that targets it.
+"""
+import threading
+
+from pyngding.core.db import get_db
+from pyngding.scanning.targets import TargetSet, packed_bit, unpack_bitmap
+
+SNAPSHOT_MAX_AGE = 86400  # seconds a profile's last run may lag the latest run and still count in a snapshot
+
+# Target sets by (database, ID); rows of target_sets never change
+_target_sets: dict[tuple[str, int], TargetSet] = {}
+_target_sets_lock = threading.Lock()
+
+
+def _get_target_set(db_path: str, conn, target_set_id: int) -> TargetSet:
+    key = (db_path, target_set_id)
+    target_set = _target_sets.get(key)
+    if target_set is None:
+        row = conn.execute("SELECT spec FROM target_sets WHERE id = ?", (target_set_id,)).fetchone()
+        target_set = TargetSet.from_spec(row[0])
+        with _target_sets_lock:
+            _target_sets[key] = target_set
+    return target_set
+
+
+def get_snapshot(db_path: str, ts: int) -> dict | None:
+    """Get the hosts that were up at ts: in the last run of each scan profile started at or before ts.
+
+    Profiles whose last such run started more than SNAPSHOT_MAX_AGE seconds
+    before the latest one (e.g. profiles no longer configured) are left out.
+
+    Returns {'run_id', 'started_ts', 'finished_ts' (of the latest of those
+    runs), 'run_ids': [...], 'up': [ip, ...]}, or None if there is no such run.
+    """
+    runs = []
+    with get_db(db_path) as conn:
+        profiles = [row[0] for row in conn.execute("SELECT DISTINCT profile FROM scan_runs")]
+        for profile in profiles:
+            row = conn.execute("""
+                SELECT id, started_ts, finished_ts, target_set_id, up FROM scan_runs
+                WHERE profile IS ? AND started_ts <= ? AND up IS NOT NULL
+                ORDER BY started_ts DESC, id DESC
+                LIMIT 1
+            """, (profile, ts)).fetchone()
+            if row is not None:
+                runs.append(row)
+        if not runs:
+            return None
+        runs.sort(key=lambda row: (row['started_ts'], row['id']), reverse=True)
+        latest = runs[0]
+        runs = [row for row in runs if row['started_ts'] >= latest['started_ts'] - SNAPSHOT_MAX_AGE]
+
+        up: dict[str, None] = {}
+        for row in runs:
+            target_set = _get_target_set(db_path, conn, row['target_set_id'])
+            up.update(dict.fromkeys(target_set.members(unpack_bitmap(row['up']))))
+    return {
+        'run_id': latest['id'],
+        'started_ts': latest['started_ts'],
+        'finished_ts': latest['finished_ts'],
+        'run_ids': [row['id'] for row in runs],
+        'up': list(up)
+    }
+
+
+def was_up(db_path: str, ip: str, ts: int) -> bool | None:
+    """Check whether ip was up in the last run started at or before ts whose targets include it.
+
+    Returns None if there is no such run or it did not probe ip.
+    """
+    with get_db(db_path) as conn:
+        # Target set versions (of any profile) that include ip
+        target_set_ids = [
+            row[0] for row in conn.execute("SELECT id FROM target_sets")
+            if ip in _get_target_set(db_path, conn, row[0])
+        ]
+        if not target_set_ids:
+            return None
+        row = conn.execute(f"""
+            SELECT target_set_id, probed, up FROM scan_runs
+            WHERE started_ts <= ? AND up IS NOT NULL
+            AND target_set_id IN ({','.join('?' * len(target_set_ids))})
+            ORDER BY started_ts DESC, id DESC
+            LIMIT 1
+        """, (ts, *target_set_ids)).fetchone()
+        if row is None:
+            return None
+        position = _get_target_set(db_path, conn, row['target_set_id']).index(ip)
+    if row['probed'] is not None and not packed_bit(row['probed'], position):
+        return None
+    return packed_bit(row['up'], position)
+
+
+def get_uptime(db_path: str, ip: str, start_ts: int, end_ts: int) -> dict:
+    """Get how often ip was up in the runs started in [start_ts, end_ts).
+
+    Only runs that probed ip count. Returns {'ip', 'runs', 'up_runs',
+    'uptime_pct'} (uptime_pct is None if no run probed ip).
+    """
+    runs = up_runs = 0
+    with get_db(db_path) as conn:
+        rows = conn.execute("""
+            SELECT target_set_id, probed, up FROM scan_runs
+            WHERE started_ts >= ? AND started_ts < ? AND up IS NOT NULL
+        """, (start_ts, end_ts)).fetchall()
+
+        # Bit position of ip per target set version (None if not a target)
+        positions: dict[int, int | None] = {}
+        for target_set_id, probed, up in rows:
+            if target_set_id not in positions:
+                try:
+                    positions[target_set_id] = _get_target_set(db_path, conn, target_set_id).index(ip)
+                except ValueError:
+                    positions[target_set_id] = None
+            position = positions[target_set_id]
+            if position is None or (probed is not None and not packed_bit(probed, position)):
+                continue
+            runs += 1
+            if packed_bit(up, position):
+                up_runs += 1
+
+    return {
+        'ip': ip,
+        'runs': runs,
+        'up_runs': up_runs,
+        'uptime_pct': round(100.0 * up_runs / runs, 2) if runs else None
+    }
+
+
+def diff_runs(db_path: str, from_run_id: int, to_run_id: int) -> dict | None:
+    """Get the hosts that joined (up only in to_run_id) and left (up only in from_run_id).
+
+    Returns {'from_run_id', 'to_run_id', 'joined': [ip, ...], 'left': [ip, ...]},
+    or None if either run has no bitmap.
+    """
+    with get_db(db_path) as conn:
+        rows = {row['id']: row for row in conn.execute("""
+            SELECT id, target_set_id, up FROM scan_runs
+            WHERE id IN (?, ?) AND up IS NOT NULL
+        """, (from_run_id, to_run_id))}
+        if from_run_id not in rows or to_run_id not in rows:
+            return None
+        before, after = rows[from_run_id], rows[to_run_id]
+        before_set = _get_target_set(db_path, conn, before['target_set_id'])
+        after_set = _get_target_set(db_path, conn, after['target_set_id'])
+
+    before_up = unpack_bitmap(before['up'])
+    after_up = unpack_bitmap(after['up'])
+    if before['target_set_id'] == after['target_set_id']:
+        # Same positions: plain bitwise set operations
+        joined = bytes(b & ~a & 0xFF for a, b in zip(before_up, after_up))
+        left = bytes(a & ~b & 0xFF for a, b in zip(before_up, after_up))
+        return {
+            'from_run_id': from_run_id,
+            'to_run_id': to_run_id,
+            'joined': list(after_set.members(joined)),
+            'left': list(before_set.members(left))
+        }
+
+    # Target list changed in between: compare addresses
+    before_ips = set(before_set.members(before_up))
+    after_ips = set(after_set.members(after_up))
+    return {
+        'from_run_id': from_run_id,
+        'to_run_id': to_run_id,
+        'joined': sorted(after_ips - before_ips, key=after_set.index),
+        'left': sorted(before_ips - after_ips, key=before_set.index)
+    }
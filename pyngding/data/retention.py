@@ -1,54 +1,153 @@
 """Data retention and rollup management."""
+import threading
 import time
+from collections.abc import Callable
 
+CHUNK_ROWS = 5000  # rowids covered by one delete job
+CHUNK_PAUSE_SECONDS = 0.05  # pause between chunks, so scan writes are not queued behind a run of them
 
-def run_retention(db_path: str) -> dict[str, int]:
-    """Run retention cleanup and rollups.
+
+def run_retention(db_path: str, changes_only: bool = False,
+                  stop_event: threading.Event | None = None,
+                  progress: Callable[[str, int], None] | None = None) -> dict[str, int]:
+    """Run retention cleanup.
+
+    Rows are deleted in chunks of CHUNK_ROWS consecutive rowids, each a
+    job of the database writer with a pause in between, so other writes
+    never wait on more than one chunk. Setting stop_event ends the run after the
+    current chunk; progress(table, deleted_so_far) is called after each.
+
+    With changes_only (observation_mode = changes) each IP's latest
+    observation before the cutoff is kept, along with its scan run, since
+    later state is only stored as changes against it.
 
     Returns dict with counts of deleted records.
     """
-    from pyngding.core.db import get_db, get_ui_setting
-    from pyngding.web.settings import DEFAULTS
+    from pyngding.web.settings import get_settings
 
     now_ts = int(time.time())
     deleted = {
         'observations': 0,
         'dns_events': 0,
         'scan_runs': 0,
+        'ipv6_neighbors': 0,
+        'notification_outbox': 0,
     }
 
+    def prune(table: str, last_id_sql: str, where: str, params: tuple,
+              keep: set[int] | None = None) -> None:
+        deleted[table] = _delete_in_chunks(
+            db_path, table, last_id_sql, where, params, keep, stop_event,
+            (lambda count: progress(table, count)) if progress else None
+        )
+
+    settings = get_settings(db_path)
+    scan_cutoff_ts = None
+    if settings.scan_run_retention_days > 0:
+        scan_cutoff_ts = now_ts - (settings.scan_run_retention_days * 86400)
+
+    # Prune observations. Those of scan runs about to be pruned go first
+    # too, so deleting the runs cascades to nothing
+    obs_cutoffs = [scan_cutoff_ts] if scan_cutoff_ts is not None else []
+    if settings.raw_observation_retention_days > 0:
+        obs_cutoffs.append(now_ts - (settings.raw_observation_retention_days * 86400))
+    if obs_cutoffs:
+        cutoff_ts = max(obs_cutoffs)
+        old_run = "(SELECT started_ts FROM scan_runs WHERE id = observations.run_id) < ?"
+        keep = None
+        if changes_only:
+            keep = _get_anchor_ids(db_path, cutoff_ts)
+        prune('observations', """
+            SELECT id FROM observations
+            WHERE run_id <= (SELECT MAX(id) FROM scan_runs WHERE started_ts < ?)
+            ORDER BY run_id DESC, id DESC LIMIT 1
+        """, old_run, (cutoff_ts,), keep)
+
+    # Prune DNS events
+    if settings.dns_event_retention_days > 0:
+        cutoff_ts = now_ts - (settings.dns_event_retention_days * 86400)
+        prune('dns_events', "SELECT id FROM dns_events WHERE ts < ? ORDER BY ts DESC LIMIT 1",
+              "ts < ?", (cutoff_ts,))
+
+    # Prune scan runs (but keep stats_daily); runs still holding an IP's
+    # anchor observation (change-only mode) stay
+    if scan_cutoff_ts is not None:
+        prune('scan_runs', "SELECT id FROM scan_runs WHERE started_ts < ? ORDER BY started_ts DESC, id DESC LIMIT 1",
+              "started_ts < ? AND NOT EXISTS (SELECT 1 FROM observations WHERE run_id = scan_runs.id)",
+              (scan_cutoff_ts,))
+
+    # Prune old IPv6 neighbors (keep last 7 days)
+    ipv6_cutoff_ts = now_ts - (7 * 86400)
+    prune('ipv6_neighbors', "SELECT id FROM ipv6_neighbors WHERE ts < ? ORDER BY ts DESC LIMIT 1",
+          "ts < ?", (ipv6_cutoff_ts,))
+
+    # Prune delivered and abandoned notifications (keep last 7 days)
+    outbox_cutoff_ts = now_ts - (7 * 86400)
+    prune('notification_outbox', "SELECT id FROM notification_outbox WHERE created_ts < ? ORDER BY id DESC LIMIT 1",
+          "status != 'pending' AND created_ts < ?", (outbox_cutoff_ts,))
+
+    return deleted
+
+
+def _get_anchor_ids(db_path: str, cutoff_ts: int) -> set[int]:
+    """Get the ID of each IP's latest observation in a scan run started before cutoff_ts."""
+    from pyngding.core.db import get_db
+
     with get_db(db_path) as conn:
-        # Prune observations
-        obs_retention_days = int(get_ui_setting(db_path, 'raw_observation_retention_days', DEFAULTS['raw_observation_retention_days']))
-        if obs_retention_days > 0:
-            cutoff_ts = now_ts - (obs_retention_days * 86400)
-            cursor = conn.execute("""
-                DELETE FROM observations
-                WHERE run_id IN (
-                    SELECT id FROM scan_runs WHERE started_ts < ?
-                )
-            """, (cutoff_ts,))
-            deleted['observations'] = cursor.rowcount
-
-        # Prune DNS events
-        dns_retention_days = int(get_ui_setting(db_path, 'dns_event_retention_days', DEFAULTS['dns_event_retention_days']))
-        if dns_retention_days > 0:
-            cutoff_ts = now_ts - (dns_retention_days * 86400)
-            cursor = conn.execute("DELETE FROM dns_events WHERE ts < ?", (cutoff_ts,))
-            deleted['dns_events'] = cursor.rowcount
-
-        # Prune scan runs (but keep stats_daily)
-        scan_retention_days = int(get_ui_setting(db_path, 'scan_run_retention_days', DEFAULTS['scan_run_retention_days']))
-        if scan_retention_days > 0:
-            cutoff_ts = now_ts - (scan_retention_days * 86400)
-            cursor = conn.execute("DELETE FROM scan_runs WHERE started_ts < ?", (cutoff_ts,))
-            deleted['scan_runs'] = cursor.rowcount
-
-        # Prune old IPv6 neighbors (keep last 7 days)
-        ipv6_cutoff_ts = now_ts - (7 * 86400)
-        cursor = conn.execute("DELETE FROM ipv6_neighbors WHERE ts < ?", (ipv6_cutoff_ts,))
-        deleted['ipv6_neighbors'] = cursor.rowcount
+        rows = conn.execute("""
+            SELECT MAX(o.id) FROM observations o
+            JOIN scan_runs r ON r.id = o.run_id
+            WHERE r.started_ts < ?
+            GROUP BY o.ip
+        """, (cutoff_ts,)).fetchall()
+    return {row[0] for row in rows}
+
+
+def _delete_in_chunks(db_path: str, table: str, last_id_sql: str, where: str, params: tuple,
+                      keep: set[int] | None = None, stop_event: threading.Event | None = None,
+                      progress: Callable[[int], None] | None = None) -> int:
+    """Delete the rows of table matching where, CHUNK_ROWS rowids at a time.
+
+    Covers rowids from the table's first up to the one last_id_sql (run
+    with the same params) returns: the newest row the cutoff applies to.
+    Rows that arrive out of rowid order past it are left for the next run.
+    Rows whose ID is in keep are not deleted.
+
+    Returns the number of rows deleted.
+    """
+    from pyngding.core.db import get_db
+    from pyngding.core.writer import run_write
 
+    with get_db(db_path) as conn:
+        row = conn.execute(last_id_sql, params).fetchone()
+        last_id = row[0] if row else None
+        first_id = conn.execute(f"SELECT MIN(id) FROM {table}").fetchone()[0]
+    if last_id is None or first_id is None:
+        return 0
+
+    def delete_chunk(conn, lo: int, hi: int) -> int:
+        if keep:
+            ids = [(row[0],) for row in conn.execute(
+                f"SELECT id FROM {table} WHERE id BETWEEN ? AND ? AND {where}", (lo, hi, *params)
+            ) if row[0] not in keep]
+            conn.executemany(f"DELETE FROM {table} WHERE id = ?", ids)
+            return len(ids)
+        return conn.execute(
+            f"DELETE FROM {table} WHERE id BETWEEN ? AND ? AND {where}", (lo, hi, *params)
+        ).rowcount
+
+    deleted = 0
+    for lo in range(first_id, last_id + 1, CHUNK_ROWS):
+        hi = min(lo + CHUNK_ROWS - 1, last_id)
+        # One writer job per chunk, queued between the scans' writes
+        deleted += run_write(db_path, lambda conn: delete_chunk(conn, lo, hi))
+        if progress is not None:
+            progress(deleted)
+        if stop_event is not None:
+            if stop_event.wait(CHUNK_PAUSE_SECONDS):
+                break
+        else:
+            time.sleep(CHUNK_PAUSE_SECONDS)
     return deleted
 
 
@@ -59,7 +158,7 @@ def update_daily_stats(db_path: str, day_yyyymmdd: int | None = None) -> None:
     """
     import time
 
-    from pyngding.core.db import get_db
+    from pyngding.core.writer import run_write
 
     if day_yyyymmdd is None:
         day_yyyymmdd = int(time.strftime('%Y%m%d', time.localtime()))
@@ -67,14 +166,14 @@ def update_daily_stats(db_path: str, day_yyyymmdd: int | None = None) -> None:
     day_start_ts = int(time.mktime(time.strptime(str(day_yyyymmdd), '%Y%m%d')))
     day_end_ts = day_start_ts + 86400
 
-    with get_db(db_path) as conn:
+    def write(conn):
         # Get scan runs for this day
         runs = conn.execute("""
             SELECT COUNT(*) as runs,
                    AVG(up_count) as avg_up,
                    MAX(up_count) as max_up
             FROM scan_runs
-            WHERE started_ts >= ? AND started_ts < ?
+            WHERE started_ts >= ? AND started_ts < ? AND finished_ts > 0
         """, (day_start_ts, day_end_ts)).fetchone()
 
         runs_count = runs[0] if runs and runs[0] else 0
@@ -100,6 +199,8 @@ def update_daily_stats(db_path: str, day_yyyymmdd: int | None = None) -> None:
             VALUES (?, ?, ?, ?, ?, ?)
         """, (day_yyyymmdd, runs_count, avg_up, max_up, new_hosts, vanished_hosts))
 
+    run_write(db_path, write)
+
 
 def run_rollups(db_path: str) -> None:
     """Run all rollups (daily stats for recent days)."""
@@ -2,6 +2,7 @@
 import re
 
 from pyngding.core.logger import get_logger
+from pyngding.web.settings import Settings, get_settings
 
 logger = get_logger('vendor')
 
@@ -89,16 +90,17 @@ class OUILookup:
 _oui_lookup: OUILookup | None = None
 
 
-def get_vendor(mac: str, db_path: str) -> str | None:
-    """Get vendor for a MAC address using OUI lookup if enabled."""
-    from pyngding.core.db import get_ui_setting
-    from pyngding.web.settings import DEFAULTS
+def get_vendor_lookup(db_path: str, settings: Settings | None = None) -> OUILookup | None:
+    """Get the OUI lookup if it is enabled and configured, else None.
 
-    oui_enabled = get_ui_setting(db_path, 'oui_lookup_enabled', DEFAULTS['oui_lookup_enabled']).lower() == 'true'
-    if not oui_enabled:
+    Callers resolving many MACs (a whole scan run) get it once rather than
+    per address.
+    """
+    settings = settings or get_settings(db_path)
+    if not settings.oui_lookup_enabled:
         return None
 
-    oui_file = get_ui_setting(db_path, 'oui_file_path', '')
+    oui_file = settings.oui_file_path
     if not oui_file:
         return None
 
@@ -108,5 +110,10 @@ def get_vendor(mac: str, db_path: str) -> str | None:
     if _oui_lookup is None or _oui_lookup.file_path != oui_file:
         _oui_lookup = OUILookup(oui_file)
 
-    return _oui_lookup.lookup(mac)
+    return _oui_lookup
+
 
+def get_vendor(mac: str, db_path: str) -> str | None:
+    """Get vendor for a MAC address using OUI lookup if enabled."""
+    lookup = get_vendor_lookup(db_path)
+    return lookup.lookup(mac) if lookup is not None else None
@@ -0,0 +1,212 @@
+"""Background delivery of queued notifications.
+
+The scan loop only writes notifications to the notification_outbox table
+(notifications.enqueue_notification). The dispatcher delivers them from a
+small thread pool, so a slow or unreachable endpoint never holds up a scan
+and nothing is lost across restarts:
+
+- each channel delivers its notifications in order, one at a time, so a
+  dead channel only blocks itself
+- a failed delivery backs its channel off exponentially (backoff_seconds,
+  doubling up to backoff_max_seconds, with jitter) and is retried
+- a notification that failed max_attempts times is given up on and kept
+  with status 'failed'
+- a channel with a digest window (<channel>_digest_seconds) sends at most
+  once per window: the first event after a quiet window goes out on its
+  own, everything queued during the window is then sent as one digest
+  (counts per event type plus the first notify_digest_max_hosts events)
+"""
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from pyngding.core.db import (
+    get_outbox_heads,
+    get_outbox_stats,
+    get_pending_notifications,
+    mark_notifications_failed,
+    mark_notifications_sent,
+)
+from pyngding.core.logger import get_logger
+from pyngding.integrations.notifications import (
+    create_digest_payload,
+    deliver,
+    get_digest_seconds,
+    get_enabled_channels,
+)
+from pyngding.web.settings import get_settings
+
+logger = get_logger('dispatcher')
+
+POLL_INTERVAL = 1.0  # seconds between outbox checks when nothing wakes the dispatcher
+MAX_DIGEST_EVENTS = 10000  # notifications coalesced into one digest at most
+
+
+class NotificationDispatcher:
+    """Deliver outbox notifications with bounded concurrency and retries."""
+
+    def __init__(self, db_path: str, workers: int = 4, max_attempts: int = 8,
+                 backoff_seconds: float = 5.0, backoff_max_seconds: float = 600.0):
+        self.db_path = db_path
+        self.workers = max(1, workers)
+        self.max_attempts = max(1, max_attempts)
+        self.backoff_seconds = backoff_seconds
+        self.backoff_max_seconds = backoff_max_seconds
+        self.running = False
+        self.thread: threading.Thread | None = None
+        self.stop_event = threading.Event()
+        self._wake = threading.Event()
+        self._executor: ThreadPoolExecutor | None = None
+        self._lock = threading.Lock()
+        self._in_flight: set[str] = set()  # channels with a delivery running
+        self._backoff: dict[str, tuple[int, float]] = {}  # channel -> (consecutive failures, retry at)
+        self._last_sent: dict[str, float] = {}  # channel -> time of its last delivery
+        self.stats = {
+            'delivered': 0,
+            'digests': 0,
+            'failed_attempts': 0,
+            'dropped': 0,
+            'latency_seconds_sum': 0.0,
+            'latency_count': 0,
+        }
+
+    def start(self) -> None:
+        """Start the dispatcher thread."""
+        if self.running:
+            return
+        self.running = True
+        self.stop_event.clear()
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='pyngding-notify')
+        self.thread = threading.Thread(target=self._run_loop, daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        """Stop dispatching; deliveries in progress are not waited for."""
+        self.running = False
+        self.stop_event.set()
+        self._wake.set()
+        if self.thread:
+            self.thread.join(timeout=5.0)
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def wake(self) -> None:
+        """Check the outbox now (call after enqueuing)."""
+        self._wake.set()
+
+    def _run_loop(self) -> None:
+        while self.running and not self.stop_event.is_set():
+            self._wake.clear()
+            try:
+                self.dispatch()
+            except Exception as e:
+                logger.error(f"Error in notification dispatcher: {e}")
+            self._wake.wait(POLL_INTERVAL)
+
+    def dispatch(self) -> int:
+        """Start delivering for each idle channel whose next notification is due.
+
+        Returns the number of deliveries started.
+        """
+        now = time.time()
+        started = 0
+        settings = get_settings(self.db_path)
+        for notification in get_outbox_heads(self.db_path):
+            channel = notification['channel']
+            digest_seconds = get_digest_seconds(self.db_path, channel, settings)
+            with self._lock:
+                if channel in self._in_flight or len(self._in_flight) >= self.workers:
+                    continue
+                if notification['next_attempt_ts'] > now or self._backoff.get(channel, (0, 0.0))[1] > now:
+                    continue
+                if now < self._last_sent.get(channel, 0.0) + digest_seconds:
+                    continue  # Still collecting this window's digest
+                self._in_flight.add(channel)
+            self._executor.submit(self._deliver, channel, notification if not digest_seconds else None)
+            started += 1
+        return started
+
+    def _deliver(self, channel: str, notification: dict | None) -> None:
+        """Deliver notification, or (if None) all of the channel's pending ones as a digest.
+
+        Runs in a worker thread and records the outcome in the outbox.
+        """
+        try:
+            if notification is not None:
+                notifications = [notification]
+            else:
+                notifications = get_pending_notifications(self.db_path, channel, MAX_DIGEST_EVENTS)
+                if not notifications:
+                    return
+            ids = [n['id'] for n in notifications]
+
+            settings = get_settings(self.db_path)
+            if channel not in get_enabled_channels(self.db_path, settings):
+                # Switched off since it was queued: retrying will not help
+                dropped = mark_notifications_failed(self.db_path, ids, 'channel disabled', time.time(), 1)
+                with self._lock:
+                    self.stats['dropped'] += dropped
+                return
+
+            if len(notifications) == 1:
+                payload = notifications[0]['payload']
+            else:
+                payload = create_digest_payload([n['payload'] for n in notifications],
+                                                settings.notify_digest_max_hosts)
+
+            error = None
+            try:
+                ok = deliver(self.db_path, channel, payload, settings)
+            except Exception as e:
+                ok, error = False, str(e)
+
+            now = time.time()
+            if ok:
+                mark_notifications_sent(self.db_path, ids, now)
+                with self._lock:
+                    self._backoff.pop(channel, None)
+                    self._last_sent[channel] = now
+                    self.stats['delivered'] += len(notifications)
+                    if len(notifications) > 1:
+                        self.stats['digests'] += 1
+                    self.stats['latency_seconds_sum'] += sum(now - n['created_ts'] for n in notifications)
+                    self.stats['latency_count'] += len(notifications)
+                return
+
+            with self._lock:
+                failures = self._backoff.get(channel, (0, 0.0))[0] + 1
+                delay = min(self.backoff_max_seconds, self.backoff_seconds * 2 ** (failures - 1))
+                delay *= random.uniform(0.5, 1.0)
+                self._backoff[channel] = (failures, now + delay)
+                self.stats['failed_attempts'] += 1
+
+            error = error or 'delivery failed'
+            dropped = mark_notifications_failed(self.db_path, ids, error, now + delay, self.max_attempts)
+            if dropped:
+                logger.warning(f"Giving up on {dropped} notifications via {channel} "
+                               f"after {self.max_attempts} attempts: {error}")
+                with self._lock:
+                    self.stats['dropped'] += dropped
+        except Exception as e:
+            logger.error(f"Error delivering notifications via {channel}: {e}")
+        finally:
+            with self._lock:
+                self._in_flight.discard(channel)
+            self._wake.set()
+
+    def get_stats(self) -> dict:
+        """Get delivery counters and the current outbox depth."""
+        with self._lock:
+            stats = dict(self.stats)
+            stats['in_flight'] = len(self._in_flight)
+            stats['backing_off'] = sorted(
+                channel for channel, (_, until) in self._backoff.items() if until > time.time()
+            )
+        outbox = get_outbox_stats(self.db_path)
+        stats['pending'] = outbox['pending']
+        stats['failed'] = outbox['failed']
+        oldest = outbox['oldest_pending_ts']
+        stats['oldest_pending_age_seconds'] = max(0.0, time.time() - oldest) if oldest is not None else 0.0
+        return stats
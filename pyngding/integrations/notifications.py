@@ -1,54 +1,77 @@
-"""Notification system: webhook + HA webhook + ntfy."""
+"""Notification system: webhook + HA webhook + ntfy.
+
+Scan events are queued in the notification_outbox table
+(enqueue_notification) and delivered in the background by the
+NotificationDispatcher (integrations.dispatcher).
+"""
 import json
 import threading
 import time
 import urllib.error
 import urllib.parse
 import urllib.request
-from collections import deque
+
+from pyngding.web.settings import Settings, get_settings
 
 
 class NotificationQueue:
-    """Thread-safe queue for notifications with rate limiting and deduplication.
-    
+    """Thread-safe deduplication of notifications.
+
+    An event (event type, IP, channel) seen within the last
+    dedup_window_seconds is a duplicate. Keys live in a dict for O(1)
+    lookups and expire through a timer wheel: one slot per second of the
+    window, each holding the keys that expire in that second, so expiry
+    costs O(1) per key instead of a scan of every recent event.
+
     This class is designed to be used as a singleton to preserve state across
-    multiple send_notification() calls.
+    multiple enqueue_notification() calls.
     """
 
     def __init__(self, dedup_window_seconds: int = 600):
         self.dedup_window = dedup_window_seconds
-        self.recent_events: deque[tuple[str, str, int]] = deque()  # (event_type, ip, timestamp)
-        self.rate_limit: dict[str, int] = {}  # channel -> last_sent_time
+        self._expires: dict[tuple[str, str, str], int] = {}  # key -> expiry second
+        self._wheel: list[list[tuple[str, str, str]]] = [[] for _ in range(dedup_window_seconds + 1)]
+        self._tick = int(time.time())  # last second the wheel was advanced to
         self._lock = threading.Lock()
 
-    def should_send(self, event_type: str, ip: str, channel: str, min_interval: int = 60) -> bool:
-        """Check if event should be sent (deduplication + rate limiting).
-        
+    def _advance(self, now: int) -> None:
+        """Expire the keys of every second up to now."""
+        if now - self._tick >= len(self._wheel):
+            # Idle for a whole window: everything has expired
+            self._expires.clear()
+            for slot in self._wheel:
+                slot.clear()
+            self._tick = now
+            return
+        while self._tick < now:
+            self._tick += 1
+            slot = self._wheel[self._tick % len(self._wheel)]
+            for key in slot:
+                if self._expires.get(key, now + 1) <= self._tick:
+                    del self._expires[key]
+            slot.clear()
+
+    def should_send(self, event_type: str, ip: str, channel: str) -> bool:
+        """Check if event should be sent (not a duplicate) and record it.
+
         Thread-safe: uses internal lock to protect state.
         """
+        key = (event_type, ip, channel)
         with self._lock:
             now = int(time.time())
+            self._advance(now)
+            if key in self._expires:
+                return False  # Duplicate
 
-            # Deduplication: same event type + IP within window
-            cutoff = now - self.dedup_window
-            while self.recent_events and self.recent_events[0][2] < cutoff:
-                self.recent_events.popleft()
-
-            for etype, eip, ets in self.recent_events:
-                if etype == event_type and eip == ip and (now - ets) < self.dedup_window:
-                    return False  # Duplicate
-
-            # Rate limiting per channel
-            last_sent = self.rate_limit.get(channel, 0)
-            if (now - last_sent) < min_interval:
-                return False
-
-            # Record event
-            self.recent_events.append((event_type, ip, now))
-            self.rate_limit[channel] = now
-
+            expires = now + self.dedup_window
+            self._expires[key] = expires
+            self._wheel[expires % len(self._wheel)].append(key)
             return True
 
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._expires)
+
 
 # Module-level singleton instance for notification deduplication
 _notification_queue: NotificationQueue | None = None
@@ -151,81 +174,158 @@ def create_notification_payload(event_type: str, ip: str, mac: str | None = None
     return payload
 
 
+def create_digest_payload(payloads: list[dict], max_hosts: int = 20) -> dict:
+    """Aggregate notification payloads into one digest payload.
+
+    Carries the number of events per event type and the first max_hosts
+    events in full.
+    """
+    counts: dict[str, int] = {}
+    for payload in payloads:
+        counts[payload['event_type']] = counts.get(payload['event_type'], 0) + 1
+    return {
+        'event_type': 'digest',
+        'ts': int(time.time()),
+        'count': len(payloads),
+        'counts': counts,
+        'first_ts': min(payload['ts'] for payload in payloads),
+        'last_ts': max(payload['ts'] for payload in payloads),
+        'events': payloads[:max_hosts],
+        'truncated': max(0, len(payloads) - max_hosts)
+    }
+
+
+def get_digest_seconds(db_path: str, channel: str, settings: Settings | None = None) -> int:
+    """Get the digest window of a channel (0 = send every event on its own)."""
+    settings = settings or get_settings(db_path)
+    return max(0, settings.get(f'{channel}_digest_seconds', 0))
+
+
+def get_enabled_channels(db_path: str, settings: Settings | None = None) -> list[str]:
+    """Get the channels that are enabled and configured."""
+    settings = settings or get_settings(db_path)
+    channels = []
+    if settings.webhook_enabled and settings.webhook_url:
+        channels.append('webhook')
+    if settings.ha_webhook_enabled and settings.ha_webhook_url:
+        channels.append('ha_webhook')
+    if settings.ntfy_enabled and settings.ntfy_topic:
+        channels.append('ntfy')
+    return channels
+
+
+def _describe_event(payload: dict) -> str:
+    """One-line text form of an event payload (ntfy messages)."""
+    message = f"IP: {payload['ip']}"
+    if payload.get('hostname'):
+        message += f" ({payload['hostname']})"
+    if payload.get('label'):
+        message += f" - {payload['label']}"
+    return message
+
+
+def deliver(db_path: str, channel: str, payload: dict, settings: Settings | None = None) -> bool:
+    """Send a payload from create_notification_payload() to one channel.
+
+    Uses the channel's current settings. Returns False if sending failed or
+    the channel is not configured.
+    """
+    settings = settings or get_settings(db_path)
+
+    if channel == 'webhook':
+        return bool(settings.webhook_url) and send_webhook(
+            settings.webhook_url, payload, settings.webhook_secret or None, settings.webhook_timeout_seconds
+        )
+
+    if channel == 'ha_webhook':
+        return bool(settings.ha_webhook_url) and send_ha_webhook(
+            settings.ha_webhook_url, payload, settings.ha_webhook_timeout_seconds
+        )
+
+    if channel == 'ntfy':
+        ntfy_topic = settings.ntfy_topic
+        ntfy_tags = [t.strip() for t in settings.ntfy_tags.split(',') if t.strip()] or None
+        if not ntfy_topic:
+            return False
+
+        if payload['event_type'] == 'digest':
+            title = f"pyngding: {payload['count']} events"
+            lines = [', '.join(f"{event_type.replace('_', ' ')}: {count}"
+                               for event_type, count in sorted(payload['counts'].items()))]
+            lines += [f"{event['event_type'].replace('_', ' ')}: {_describe_event(event)}" for event in payload['events']]
+            if payload['truncated']:
+                lines.append(f"... and {payload['truncated']} more")
+            message = '\n'.join(lines)
+        else:
+            title = f"pyngding: {payload['event_type'].replace('_', ' ').title()}"
+            message = _describe_event(payload)
+
+        return send_ntfy(
+            settings.ntfy_base_url, ntfy_topic, message, title=title,
+            priority=settings.ntfy_priority, tags=ntfy_tags,
+            auth_mode=settings.ntfy_auth_mode, username=settings.ntfy_username or None,
+            password=settings.ntfy_password or None, bearer_token=settings.ntfy_bearer_token or None
+        )
+
+    return False
+
+
+def _event_enabled(settings: Settings, event_type: str) -> bool:
+    """Check the global and per-event notification switches."""
+    if not settings.notify_enabled:
+        return False
+    return settings.get(f"notify_on_{event_type}", True)
+
+
+def enqueue_notification(db_path: str, event_type: str, ip: str, mac: str | None = None,
+                         hostname: str | None = None, vendor: str | None = None,
+                         label: str | None = None, is_safe: bool = False,
+                         tags: str | None = None, extra: dict | None = None,
+                         settings: Settings | None = None) -> list[int]:
+    """Queue a notification for every enabled channel in the outbox.
+
+    Nothing is sent here; the NotificationDispatcher delivers it. Returns
+    the outbox IDs (none if notifications are off or it was a duplicate).
+    Callers queueing many events pass one settings snapshot for all.
+    """
+    from pyngding.core.db import enqueue_notifications
+
+    settings = settings or get_settings(db_path)
+    if not _event_enabled(settings, event_type):
+        return []
+
+    queue = get_notification_queue()
+    payload = create_notification_payload(event_type, ip, mac, hostname, vendor, label, is_safe, tags, extra)
+    notifications = [
+        {'channel': channel, 'event_type': event_type, 'ip': ip, 'payload': payload}
+        for channel in get_enabled_channels(db_path, settings)
+        if queue.should_send(event_type, ip, channel)
+    ]
+    if not notifications:
+        return []
+    return enqueue_notifications(db_path, notifications)
+
+
 def send_notification(db_path: str, event_type: str, ip: str, mac: str | None = None,
                      hostname: str | None = None, vendor: str | None = None,
                      label: str | None = None, is_safe: bool = False,
                      tags: str | None = None, extra: dict | None = None) -> dict[str, bool]:
-    """Send notification to all enabled channels.
+    """Send notification to all enabled channels immediately, bypassing the outbox.
 
-    Returns dict with channel -> success status.
+    Used for test notifications. Returns dict with channel -> success status.
     """
-    from pyngding.core.db import get_ui_setting
-    from pyngding.web.settings import DEFAULTS
-
     results = {}
     queue = get_notification_queue()
+    settings = get_settings(db_path)
 
-    # Check if notifications are enabled
-    notify_enabled = get_ui_setting(db_path, 'notify_enabled', DEFAULTS['notify_enabled']).lower() == 'true'
-    if not notify_enabled:
+    if not _event_enabled(settings, event_type):
         return results
 
-    # Check event-specific settings
-    event_enabled_key = f"notify_on_{event_type}"
-    if event_enabled_key in DEFAULTS:
-        event_enabled = get_ui_setting(db_path, event_enabled_key, DEFAULTS[event_enabled_key]).lower() == 'true'
-        if not event_enabled:
-            return results
-
     # Create payload
     payload = create_notification_payload(event_type, ip, mac, hostname, vendor, label, is_safe, tags, extra)
 
-    # Webhook
-    webhook_enabled = get_ui_setting(db_path, 'webhook_enabled', 'false').lower() == 'true'
-    if webhook_enabled:
-        webhook_url = get_ui_setting(db_path, 'webhook_url', '')
-        webhook_secret = get_ui_setting(db_path, 'webhook_secret', '') or None
-        timeout = int(get_ui_setting(db_path, 'webhook_timeout_seconds', '3'))
-
-        if webhook_url and queue.should_send(event_type, ip, 'webhook'):
-            results['webhook'] = send_webhook(webhook_url, payload, webhook_secret, timeout)
-
-    # HA Webhook
-    ha_webhook_enabled = get_ui_setting(db_path, 'ha_webhook_enabled', 'false').lower() == 'true'
-    if ha_webhook_enabled:
-        ha_webhook_url = get_ui_setting(db_path, 'ha_webhook_url', '')
-        timeout = int(get_ui_setting(db_path, 'ha_webhook_timeout_seconds', '3'))
-
-        if ha_webhook_url and queue.should_send(event_type, ip, 'ha_webhook'):
-            results['ha_webhook'] = send_ha_webhook(ha_webhook_url, payload, timeout)
-
-    # ntfy
-    ntfy_enabled = get_ui_setting(db_path, 'ntfy_enabled', 'false').lower() == 'true'
-    if ntfy_enabled:
-        ntfy_base_url = get_ui_setting(db_path, 'ntfy_base_url', 'https://ntfy.sh')
-        ntfy_topic = get_ui_setting(db_path, 'ntfy_topic', '')
-        ntfy_auth_mode = get_ui_setting(db_path, 'ntfy_auth_mode', 'none')
-        ntfy_username = get_ui_setting(db_path, 'ntfy_username', '') or None
-        ntfy_password = get_ui_setting(db_path, 'ntfy_password', '') or None
-        ntfy_bearer_token = get_ui_setting(db_path, 'ntfy_bearer_token', '') or None
-        ntfy_priority = int(get_ui_setting(db_path, 'ntfy_priority', '3'))
-        ntfy_tags_str = get_ui_setting(db_path, 'ntfy_tags', '')
-        ntfy_tags = [t.strip() for t in ntfy_tags_str.split(',') if t.strip()] if ntfy_tags_str else None
-
-        if ntfy_topic and queue.should_send(event_type, ip, 'ntfy'):
-            title = f"pyngding: {event_type.replace('_', ' ').title()}"
-            message = f"IP: {ip}"
-            if hostname:
-                message += f" ({hostname})"
-            if label:
-                message += f" - {label}"
-
-            results['ntfy'] = send_ntfy(
-                ntfy_base_url, ntfy_topic, message, title=title,
-                priority=ntfy_priority, tags=ntfy_tags,
-                auth_mode=ntfy_auth_mode, username=ntfy_username,
-                password=ntfy_password, bearer_token=ntfy_bearer_token
-            )
+    for channel in get_enabled_channels(db_path, settings):
+        if queue.should_send(event_type, ip, channel):
+            results[channel] = deliver(db_path, channel, payload, settings)
 
     return results
-
@@ -0,0 +1,152 @@
+"""Adaptive per-host probe planning.
+
+Instead of giving every address the same deadline every cycle, the planner
+keeps per-IP state and sorts addresses into tiers:
+
+- live: up at its last probe, or seen up within `recent_seconds`. Probed
+  every cycle with a deadline of srtt + 4 * rttvar (RFC 6298 style EWMA of
+  its RTT), clamped to [min_timeout, base_timeout]. A host that was up and
+  misses is re-probed once with the full base timeout before it is
+  reported down (retry on first loss only).
+  Detection latency: one cycle for both up -> down and down -> up.
+- stale: seen up before, but not within `recent_seconds`. Probed every
+  `stale_every` cycles. Detection latency: at most stale_every cycles.
+- unseen: never seen up. Probed every `unseen_every` cycles. Detection
+  latency: at most unseen_every cycles.
+
+Addresses in the backoff tiers get a fixed phase from their integer value,
+so each cycle probes an even 1/N slice of the tier instead of all of it
+every Nth cycle. Only addresses that have been up are tracked, so memory
+and sweep time follow the number of live hosts, not the size of the scope.
+"""
+import ipaddress
+import time
+from collections.abc import Iterable
+
+from pyngding.core.logger import get_logger
+
+logger = get_logger('adaptive')
+
+TIER_LIVE = 'live'
+TIER_STALE = 'stale'
+TIER_UNSEEN = 'unseen'
+
+
+class HostState:
+    """RTT estimate and liveness of one address that has been seen up."""
+
+    __slots__ = ('srtt', 'rttvar', 'last_up_ts', 'was_up')
+
+    def __init__(self, last_up_ts: float, was_up: bool, rtt_ms: float | None = None):
+        self.srtt: float | None = None
+        self.rttvar: float | None = None
+        self.last_up_ts = last_up_ts
+        self.was_up = was_up
+        if rtt_ms is not None:
+            self.add_sample(rtt_ms)
+
+    def add_sample(self, rtt_ms: float) -> None:
+        """Fold an RTT sample into the EWMA (RFC 6298 gains)."""
+        if self.srtt is None:
+            self.srtt = rtt_ms
+            self.rttvar = rtt_ms / 2
+        else:
+            self.rttvar = 0.75 * self.rttvar + 0.25 * abs(self.srtt - rtt_ms)
+            self.srtt = 0.875 * self.srtt + 0.125 * rtt_ms
+
+
+class AdaptivePlanner:
+    """Decide which targets to probe each cycle and with which deadline."""
+
+    def __init__(self, base_timeout: float = 1.0, min_timeout: float = 0.2,
+                 recent_seconds: int = 86400, stale_every: int = 4, unseen_every: int = 16):
+        self.base_timeout = base_timeout
+        self.min_timeout = min(min_timeout, base_timeout)
+        self.recent_seconds = recent_seconds
+        self.stale_every = max(1, stale_every)
+        self.unseen_every = max(1, unseen_every)
+        self.hosts: dict[str, HostState] = {}
+        self.cycle = 0
+        self.last_plan = {TIER_LIVE: 0, TIER_STALE: 0, TIER_UNSEEN: 0, 'skipped': 0}
+
+    def seed(self, last_up: dict[str, int], up_hosts: dict[str, float | None]) -> None:
+        """Initialise state from history.
+
+        last_up maps ip -> last timestamp it was observed up; up_hosts maps
+        currently-up ips to their last RTT (or None).
+        """
+        for ip, ts in last_up.items():
+            self.hosts[ip] = HostState(ts, was_up=False)
+        now = time.time()
+        for ip, rtt_ms in up_hosts.items():
+            state = self.hosts.setdefault(ip, HostState(now, was_up=True))
+            state.was_up = True
+            if rtt_ms is not None:
+                state.add_sample(float(rtt_ms))
+
+    def tier(self, ip: str, now: float | None = None) -> str:
+        """Get the tier of ip."""
+        state = self.hosts.get(ip)
+        if state is None:
+            return TIER_UNSEEN
+        if now is None:
+            now = time.time()
+        if state.was_up or now - state.last_up_ts <= self.recent_seconds:
+            return TIER_LIVE
+        return TIER_STALE
+
+    def timeout(self, ip: str) -> float:
+        """Get the probe deadline for ip in seconds."""
+        state = self.hosts.get(ip)
+        if state is None or state.srtt is None:
+            return self.base_timeout
+        rto = (state.srtt + 4 * state.rttvar) / 1000.0
+        return max(self.min_timeout, min(rto, self.base_timeout))
+
+    def plan(self, targets: Iterable[str], now: float | None = None) -> tuple[list[str], dict[str, float]]:
+        """Select this cycle's probes.
+
+        Returns (targets to probe, {ip: timeout} for hosts with an RTT
+        estimate). Advances the cycle counter.
+        """
+        if now is None:
+            now = time.time()
+        counts = {TIER_LIVE: 0, TIER_STALE: 0, TIER_UNSEEN: 0, 'skipped': 0}
+        selected = []
+        timeouts = {}
+        for ip in targets:
+            tier = self.tier(ip, now)
+            if tier != TIER_LIVE:
+                every = self.stale_every if tier == TIER_STALE else self.unseen_every
+                if int(ipaddress.IPv4Address(ip)) % every != self.cycle % every:
+                    counts['skipped'] += 1
+                    continue
+            counts[tier] += 1
+            selected.append(ip)
+            if tier == TIER_LIVE:
+                timeouts[ip] = self.timeout(ip)
+
+        self.cycle += 1
+        self.last_plan = counts
+        logger.debug(f"Adaptive plan: {counts}")
+        return selected, timeouts
+
+    def needs_retry(self, ip: str, is_up: bool) -> bool:
+        """True if ip was up at its last probe and just missed (first loss)."""
+        state = self.hosts.get(ip)
+        return not is_up and state is not None and state.was_up
+
+    def record(self, ip: str, is_up: bool, rtt_ms: float | None, now: float | None = None) -> None:
+        """Update per-host state with a final probe result."""
+        state = self.hosts.get(ip)
+        if is_up:
+            if now is None:
+                now = time.time()
+            if state is None:
+                state = self.hosts[ip] = HostState(now, was_up=True)
+            state.last_up_ts = now
+            state.was_up = True
+            if rtt_ms is not None:
+                state.add_sample(float(rtt_ms))
+        elif state is not None:
+            state.was_up = False
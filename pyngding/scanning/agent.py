@@ -0,0 +1,280 @@
+"""Remote scan agent.
+
+`pyngding agent` runs the scanning package on its own, with no database or
+web server, against the targets of the segments it sits on. Each run is
+pushed to a central `pyngding serve` as one gzip-compressed JSON batch:
+
+    {"version": 1, "batch_id": "<uuid>", "site": "branch-1",
+     "started_ts": ..., "finished_ts": ..., "targets_count": ...,
+     "results": [[ip, up, rtt_ms, mac, hostname, probe], ...]}
+
+Results use the record layout of sharded.RECORD_FIELDS. Batches that cannot
+be delivered are spooled to disk and replayed oldest first, so the server
+sees each site's runs in order; the batch_id makes a replay after a lost
+response idempotent.
+"""
+import ipaddress
+import json
+import os
+import socket
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+import zlib
+from pathlib import Path
+
+from pyngding.core.config import Config
+from pyngding.core.logger import get_logger
+from pyngding.scanning.pacing import Pacer
+from pyngding.scanning.sharded import RECORD_FIELDS, to_record
+from pyngding.scanning.sweep import Sweeper
+from pyngding.scanning.targets import ShuffledTargets, load_targets
+
+logger = get_logger('agent')
+
+BATCH_VERSION = 1
+MAX_BATCH_BYTES = 64 * 1024 * 1024  # uncompressed
+
+_SPOOL_SUFFIX = '.batch.gz'
+
+
+class PushRejectedError(Exception):
+    """The server refused a batch; pushing it again will not help."""
+
+
+def encode_batch(batch: dict) -> bytes:
+    """Serialise a batch to gzip-compressed JSON."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+    data = json.dumps(batch, separators=(',', ':')).encode()
+    return compressor.compress(data) + compressor.flush()
+
+
+def decode_batch(data: bytes) -> dict:
+    """Decompress and validate a batch.
+
+    Raises ValueError if it is malformed or larger than MAX_BATCH_BYTES
+    uncompressed.
+    """
+    decompressor = zlib.decompressobj(zlib.MAX_WBITS | 16)
+    try:
+        raw = decompressor.decompress(data, MAX_BATCH_BYTES)
+        if decompressor.unconsumed_tail:
+            raise ValueError(f"batch exceeds {MAX_BATCH_BYTES} bytes uncompressed")
+        if not decompressor.eof:
+            raise ValueError("batch is truncated")
+        batch = json.loads(raw)
+    except zlib.error as e:
+        raise ValueError(f"batch is not gzip data: {e}") from e
+
+    if not isinstance(batch, dict) or batch.get('version') != BATCH_VERSION:
+        raise ValueError("unsupported batch version")
+    for key in ('batch_id', 'site'):
+        value = batch.get(key)
+        if not isinstance(value, str) or not 0 < len(value) <= 64:
+            raise ValueError(f"invalid {key}")
+    for key in ('started_ts', 'finished_ts', 'targets_count'):
+        value = batch.get(key)
+        if not isinstance(value, int) or value < 0:
+            raise ValueError(f"invalid {key}")
+    results = batch.get('results')
+    if not isinstance(results, list):
+        raise ValueError("invalid results")
+    for record in results:
+        if (not isinstance(record, list) or len(record) != len(RECORD_FIELDS)
+                or not isinstance(record[0], str) or not isinstance(record[1], bool)
+                or not (record[2] is None or isinstance(record[2], int | float))
+                or not all(value is None or isinstance(value, str) for value in record[3:])):
+            raise ValueError("invalid result record")
+        ipaddress.IPv4Address(record[0])
+    return batch
+
+
+def push_batch(server_url: str, api_key: str, data: bytes, timeout: float = 10.0) -> None:
+    """POST an encoded batch to the server's ingest endpoint.
+
+    Raises PushRejectedError if the server refused the batch itself, and OSError
+    (including urllib.error.URLError/HTTPError) if it should be retried.
+    """
+    req = urllib.request.Request(
+        f"{server_url}/api/ingest",
+        data=data,
+        method='POST',
+        headers={
+            'Content-Type': 'application/json',
+            'Content-Encoding': 'gzip',
+            'X-API-Key': api_key
+        }
+    )
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as response:
+            response.read()
+    except urllib.error.HTTPError as e:
+        if e.code in (400, 413):
+            raise PushRejectedError(f"HTTP {e.code}: {e.read()[:200].decode(errors='replace')}") from e
+        raise
+
+
+class Spool:
+    """Directory of encoded batches waiting to be pushed, oldest first.
+
+    Files are named by a sequence number and written to a temporary name
+    first, so a crash never leaves a partial batch behind. When more than
+    max_batches are waiting, the oldest are dropped.
+    """
+
+    def __init__(self, directory: str, max_batches: int = 10000):
+        self.directory = Path(directory)
+        self.max_batches = max(1, max_batches)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        pending = self.pending()
+        self._seq = int(pending[-1].name.split('.', 1)[0]) if pending else 0
+
+    def pending(self) -> list[Path]:
+        """Get spooled batch files in push order."""
+        return sorted(
+            path for path in self.directory.glob(f'*{_SPOOL_SUFFIX}')
+            if path.name.split('.', 1)[0].isdigit()
+        )
+
+    def put(self, data: bytes) -> Path:
+        """Append an encoded batch."""
+        self._seq += 1
+        path = self.directory / f'{self._seq:012d}{_SPOOL_SUFFIX}'
+        tmp_path = path.with_name(path.name + '.tmp')
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+
+        pending = self.pending()
+        for old in pending[:len(pending) - self.max_batches]:
+            logger.warning(f"Spool full ({self.max_batches} batches), dropping oldest batch {old.name}")
+            old.unlink(missing_ok=True)
+        return path
+
+
+class ScanAgent:
+    """Scan local targets every scan_interval_seconds and push each run."""
+
+    def __init__(self, config: Config):
+        self.config = config
+        self.site = config.agent_site or socket.gethostname()[:64]
+        self.sweeper = Sweeper(config)
+        self.spool = Spool(config.agent_spool_dir, config.agent_spool_max_batches)
+        self.stop_event = threading.Event()
+
+    def run(self, once: bool = False) -> None:
+        """Scan and push until stop() is called (or after one run with once)."""
+        try:
+            while not self.stop_event.is_set():
+                try:
+                    self.run_once()
+                except Exception as e:
+                    logger.error(f"Error in agent loop: {e}")
+
+                if once or self.stop_event.wait(self.config.scan_interval_seconds):
+                    break
+        finally:
+            self.sweeper.close()
+
+    def stop(self) -> None:
+        """Stop after the current run."""
+        self.stop_event.set()
+
+    def run_once(self) -> None:
+        """Replay spooled batches, then scan and push one run."""
+        self.flush()
+        batch = self.scan()
+        if batch is not None:
+            self.submit(encode_batch(batch))
+
+    def scan(self) -> dict | None:
+        """Run one sweep and return its batch (None if there are no targets)."""
+        started_ts = int(time.time())
+        targets = load_targets(self.config.scan_targets, self.config.target_cap)
+        if not targets:
+            return None
+
+        if self.config.randomize_targets:
+            targets = ShuffledTargets(targets)
+        deadline = None
+        if self.config.max_pps:
+            deadline = time.monotonic() + self.config.scan_interval_seconds
+        pacer = Pacer(self.config.max_pps, deadline=deadline)
+
+        records = []
+        self.sweeper.sweep(targets, self.config.agent_reverse_dns,
+                           lambda result: records.append(to_record(result)),
+                           self.config.ping_count, pacer)
+
+        up_count = sum(1 for record in records if record[1])
+        logger.info(f"Scan completed: {up_count} up, {len(records) - up_count} down, {len(targets)} targets")
+        return {
+            'version': BATCH_VERSION,
+            'batch_id': uuid.uuid4().hex,
+            'site': self.site,
+            'started_ts': started_ts,
+            'finished_ts': int(time.time()),
+            'targets_count': len(targets),
+            'results': records
+        }
+
+    def submit(self, data: bytes) -> None:
+        """Push an encoded batch, spooling it if the server cannot take it now.
+
+        Goes through the spool whenever older batches are waiting, so runs
+        always reach the server in order.
+        """
+        if not self.spool.pending():
+            try:
+                self._push(data)
+                return
+            except PushRejectedError as e:
+                logger.error(f"Server rejected batch, dropping it: {e}")
+                return
+            except OSError as e:
+                logger.warning(f"Server unreachable, spooling batch: {e}")
+                self.spool.put(data)
+                return
+        self.spool.put(data)
+        self.flush()
+
+    def flush(self) -> int:
+        """Push spooled batches oldest first, stopping at the first failure.
+
+        Returns the number of batches delivered.
+        """
+        pending = self.spool.pending()
+        delivered = 0
+        i = 0
+        while i < len(pending) and not self.stop_event.is_set():
+            path = pending[i]
+            try:
+                self._push(path.read_bytes())
+                delivered += 1
+            except PushRejectedError as e:
+                logger.error(f"Server rejected spooled batch {path.name}, dropping it: {e}")
+            except urllib.error.HTTPError as e:
+                if e.code != 429:
+                    logger.warning(f"Push failed, {len(pending) - i} batches spooled: {e}")
+                    break
+                # Ingest is rate limited per API key: wait, then retry this batch
+                try:
+                    retry_after = float(e.headers.get('Retry-After', '1'))
+                except ValueError:
+                    retry_after = 1.0
+                self.stop_event.wait(retry_after)
+                continue
+            except OSError as e:
+                logger.warning(f"Server unreachable, {len(pending) - i} batches spooled: {e}")
+                break
+            path.unlink(missing_ok=True)
+            i += 1
+
+        if delivered:
+            logger.info(f"Replayed {delivered} spooled batches")
+        return delivered
+
+    def _push(self, data: bytes) -> None:
+        push_batch(self.config.agent_server_url, self.config.agent_api_key, data,
+                   timeout=self.config.agent_push_timeout_seconds)
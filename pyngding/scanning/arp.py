@@ -0,0 +1,271 @@
+"""Active ARP sweep engine for directly attached IPv4 subnets.
+
+Hosts that drop ICMP still have to answer ARP to be reachable on the LAN,
+so an ARP who-has sweep finds them and returns their MAC in the same pass.
+Requires an AF_PACKET socket (CAP_NET_RAW).
+
+The engine can be bound to any interface, which makes it testable against a
+veth pair whose peer lives in a network namespace:
+
+    ip netns add t && ip link add veth0 type veth peer name veth1
+    ip link set veth1 netns t
+    ip addr add 10.99.0.1/24 dev veth0 && ip link set veth0 up
+    ip -n t addr add 10.99.0.2/24 dev veth1 && ip -n t link set veth1 up
+
+    ArpSweepEngine('veth0').probe(['10.99.0.2', '10.99.0.3'])
+"""
+import fcntl
+import heapq
+import ipaddress
+import select
+import socket
+import struct
+import time
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+
+from pyngding.core.logger import get_logger
+
+logger = get_logger('arp')
+
+ETH_P_ARP = 0x0806
+ETH_P_IP = 0x0800
+ARP_REQUEST = 1
+ARP_REPLY = 2
+SIOCGIFADDR = 0x8915
+
+PROC_NET_ROUTE = '/proc/net/route'
+RTF_UP = 0x1
+RTF_GATEWAY = 0x2
+
+_BROADCAST = b'\xff' * 6
+_ETH_HEADER = struct.Struct('!6s6sH')
+_ARP_PACKET = struct.Struct('!HHBBH6s4s6s4s')
+
+
+def get_interface_mac(interface: str) -> bytes:
+    """Get the hardware address of an interface from sysfs."""
+    text = Path(f'/sys/class/net/{interface}/address').read_text().strip()
+    return bytes.fromhex(text.replace(':', ''))
+
+
+def get_interface_ipv4(interface: str) -> str:
+    """Get the primary IPv4 address of an interface (SIOCGIFADDR)."""
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        ifreq = struct.pack('256s', interface.encode()[:15])
+        result = fcntl.ioctl(sock.fileno(), SIOCGIFADDR, ifreq)
+    return socket.inet_ntoa(result[20:24])
+
+
+def get_attached_networks(route_path: str = PROC_NET_ROUTE) -> list[tuple[str, ipaddress.IPv4Network]]:
+    """Get directly connected IPv4 networks from the kernel routing table.
+
+    Returns list of (interface, network) for on-link routes (no gateway),
+    excluding loopback and the default route.
+    """
+    networks = []
+    try:
+        with open(route_path, encoding='ascii', errors='ignore') as f:
+            next(f, None)  # Header
+            for line in f:
+                parts = line.split()
+                if len(parts) < 8:
+                    continue
+                interface = parts[0]
+                try:
+                    destination = int(parts[1], 16)
+                    gateway = int(parts[2], 16)
+                    flags = int(parts[3], 16)
+                    mask = int(parts[7], 16)
+                except ValueError:
+                    continue
+                if interface == 'lo' or not flags & RTF_UP or flags & RTF_GATEWAY or gateway or not mask:
+                    continue
+                # /proc/net/route stores addresses in host (little-endian) order
+                dest = socket.inet_ntoa(struct.pack('<I', destination))
+                prefix = bin(mask).count('1')
+                networks.append((interface, ipaddress.IPv4Network(f'{dest}/{prefix}', strict=False)))
+    except OSError:
+        pass
+    return networks
+
+
+def partition_attached(targets: Iterable[str]) -> tuple[dict[str, list[str]], list[str]]:
+    """Split targets into per-interface on-link lists and everything else.
+
+    The host's own interface addresses are never ARP-probed (they do not
+    answer their own requests) and end up in the remainder.
+
+    Returns ({interface: [ip, ...]}, [ip, ...]).
+    """
+    networks = get_attached_networks()
+    own = set()
+    for interface, _ in networks:
+        try:
+            own.add(get_interface_ipv4(interface))
+        except OSError:
+            pass
+
+    attached: dict[str, list[str]] = {}
+    rest = []
+    for ip in targets:
+        address = ipaddress.IPv4Address(ip)
+        for interface, network in networks:
+            if address in network and ip not in own:
+                attached.setdefault(interface, []).append(ip)
+                break
+        else:
+            rest.append(ip)
+    return attached, rest
+
+
+def open_arp_engines(targets: Iterable[str], rate_pps: int = 4000) -> tuple[list[tuple['ArpSweepEngine', list[str]]], list[str]]:
+    """Open one ArpSweepEngine per attached interface that has targets.
+
+    Targets on interfaces where no AF_PACKET socket could be opened (e.g.
+    missing CAP_NET_RAW) are returned with the remainder for another engine.
+
+    Returns ([(engine, [ip, ...]), ...], [ip, ...]).
+    """
+    attached, rest = partition_attached(targets)
+    engines = []
+    for interface, ips in attached.items():
+        try:
+            engines.append((ArpSweepEngine(interface, rate_pps=rate_pps), ips))
+        except OSError as e:
+            logger.warning(f"ARP engine unavailable on {interface} ({e}), falling back to ICMP")
+            rest.extend(ips)
+    return engines, rest
+
+
+def build_arp_request(src_mac: bytes, src_ip: str, target_ip: str) -> bytes:
+    """Build a broadcast Ethernet frame carrying an ARP who-has request."""
+    eth = _ETH_HEADER.pack(_BROADCAST, src_mac, ETH_P_ARP)
+    arp = _ARP_PACKET.pack(1, ETH_P_IP, 6, 4, ARP_REQUEST,
+                           src_mac, socket.inet_aton(src_ip),
+                           b'\x00' * 6, socket.inet_aton(target_ip))
+    return eth + arp
+
+
+def parse_arp_reply(frame: bytes) -> tuple[str, str] | None:
+    """Parse an ARP reply frame. Returns (sender_ip, sender_mac) or None."""
+    if len(frame) < _ETH_HEADER.size + _ARP_PACKET.size:
+        return None
+    _, _, ethertype = _ETH_HEADER.unpack_from(frame)
+    if ethertype != ETH_P_ARP:
+        return None
+    _htype, ptype, hlen, plen, op, sha, spa, _tha, _tpa = _ARP_PACKET.unpack_from(frame, _ETH_HEADER.size)
+    if op != ARP_REPLY or ptype != ETH_P_IP or hlen != 6 or plen != 4:
+        return None
+    return socket.inet_ntoa(spa), ':'.join(f'{b:02x}' for b in sha)
+
+
+class ArpSweepEngine:
+    """Probe on-link IPv4 targets with ARP who-has requests on one interface.
+
+    Requests are paced at rate_pps and all replies are collected on the same
+    AF_PACKET socket. Results are yielded in completion order as
+    (ip, is_up, rtt_ms, mac) tuples.
+    """
+
+    def __init__(self, interface: str, rate_pps: int = 4000):
+        self.interface = interface
+        self.rate_pps = max(1, rate_pps)
+        self.src_mac = get_interface_mac(interface)
+        self.src_ip = get_interface_ipv4(interface)
+        self.sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, socket.htons(ETH_P_ARP))
+        self.sock.bind((interface, ETH_P_ARP))
+        self.sock.setblocking(False)
+
+    def close(self) -> None:
+        """Close the underlying socket."""
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def probe(self, targets: Iterable[str], timeout: float = 0.5,
+              count: int = 1) -> Iterator[tuple[str, bool, float | None, str | None]]:
+        """Probe targets and yield (ip, is_up, rtt_ms, mac) in completion order.
+
+        Each target gets up to `count` requests; a retry is only sent after
+        the previous request went unanswered for `timeout` seconds.
+        """
+        queue = [(ip, 1) for ip in targets]
+        queue.reverse()  # pop() from the end keeps target order
+        interval = 1.0 / self.rate_pps
+        next_send = time.perf_counter()
+
+        sent_at: dict[str, tuple[float, int]] = {}  # ip -> (sent_at, attempt)
+        deadlines: list[tuple[float, str]] = []
+
+        while queue or sent_at:
+            now = time.perf_counter()
+            # Cap catch-up bursts after a stall
+            next_send = max(next_send, now - 16 * interval)
+
+            # Send as many requests as the pacing allows
+            while queue and now >= next_send:
+                ip, attempt = queue.pop()
+                try:
+                    self.sock.send(build_arp_request(self.src_mac, self.src_ip, ip))
+                except BlockingIOError:
+                    queue.append((ip, attempt))
+                    break
+                except OSError as e:
+                    logger.debug(f"ARP send to {ip} failed: {e}")
+                    yield ip, False, None, None
+                    continue
+                sent_at[ip] = (now, attempt)
+                heapq.heappush(deadlines, (now + timeout, ip))
+                next_send += interval
+                now = time.perf_counter()
+
+            # Wait for replies until the next send slot or deadline
+            wake = next_send if queue else float('inf')
+            if deadlines:
+                wake = min(wake, deadlines[0][0])
+            wait = max(0.0, wake - time.perf_counter()) if wake != float('inf') else 0.0
+            readable, _, _ = select.select([self.sock], [], [], wait)
+            if readable:
+                yield from self._drain(sent_at)
+
+            # Expire unanswered requests, re-queueing retries
+            now = time.perf_counter()
+            while deadlines and deadlines[0][0] <= now:
+                _, ip = heapq.heappop(deadlines)
+                entry = sent_at.get(ip)
+                if entry is None or entry[0] + timeout > now:
+                    continue  # Answered, or superseded by a retry
+                del sent_at[ip]
+                if entry[1] < count:
+                    queue.append((ip, entry[1] + 1))
+                else:
+                    yield ip, False, None, None
+
+    def _drain(self, sent_at: dict[str, tuple[float, int]]) -> Iterator[tuple[str, bool, float | None, str | None]]:
+        """Read all queued ARP replies and yield newly answered targets."""
+        while True:
+            try:
+                frame = self.sock.recv(128)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError as e:
+                logger.debug(f"ARP receive error: {e}")
+                return
+            received_at = time.perf_counter()
+
+            parsed = parse_arp_reply(frame)
+            if parsed is None:
+                continue
+            ip, mac = parsed
+            entry = sent_at.pop(ip, None)
+            if entry is None:
+                continue  # Unsolicited, duplicate or late reply
+            yield ip, True, round((received_at - entry[0]) * 1000.0, 3), mac
@@ -0,0 +1,319 @@
+"""Single-socket ICMP echo engine.
+
+Sends echo requests to many targets from one socket and matches replies by
+(source address, identifier, sequence number), instead of spawning one
+`ping` process per target.
+"""
+import asyncio
+import heapq
+import os
+import select
+import socket
+import struct
+import time
+from collections.abc import Iterable, Iterator
+
+from pyngding.core.logger import get_logger
+from pyngding.scanning.pacing import Pacer
+
+logger = get_logger('icmp')
+
+ICMP_ECHO_REPLY = 0
+ICMP_ECHO_REQUEST = 8
+
+_HEADER = struct.Struct('!BBHHH')  # type, code, checksum, identifier, sequence
+_PAYLOAD = b'pyngding'.ljust(24, b'\x00')
+_RCVBUF_BYTES = 1 << 22
+_DRAIN_EVERY = 64  # sends between opportunistic receive drains
+
+
+def icmp_checksum(data: bytes) -> int:
+    """Compute the RFC 1071 Internet checksum of data."""
+    if len(data) % 2:
+        data += b'\x00'
+    total = sum(struct.unpack(f'!{len(data) // 2}H', data))
+    total = (total >> 16) + (total & 0xFFFF)
+    total += total >> 16
+    return ~total & 0xFFFF
+
+
+def build_echo_request(ident: int, seq: int, payload: bytes = _PAYLOAD) -> bytes:
+    """Build an ICMP echo request packet with a valid checksum."""
+    header = _HEADER.pack(ICMP_ECHO_REQUEST, 0, 0, ident, seq)
+    checksum = icmp_checksum(header + payload)
+    return _HEADER.pack(ICMP_ECHO_REQUEST, 0, checksum, ident, seq) + payload
+
+
+def open_icmp_socket() -> tuple[socket.socket, bool]:
+    """Open an ICMP socket.
+
+    Prefers an unprivileged SOCK_DGRAM socket (allowed when the process gid
+    is inside net.ipv4.ping_group_range) and falls back to SOCK_RAW, which
+    needs CAP_NET_RAW.
+
+    Returns (socket, is_raw). Raises OSError if neither can be opened.
+    """
+    try:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_ICMP)
+        return sock, False
+    except OSError as dgram_error:
+        try:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_ICMP)
+            return sock, True
+        except OSError:
+            raise dgram_error from None
+
+
+class IcmpEchoEngine:
+    """Probe many IPv4 targets over a single ICMP socket.
+
+    Targets are consumed lazily, at most `max_in_flight` are awaiting a reply
+    at any time, and results are yielded in completion order as
+    (ip, is_up, rtt_ms) tuples. rtt_ms is a float with microsecond resolution.
+    """
+
+    def __init__(self, max_in_flight: int = 1024):
+        self.max_in_flight = max(1, max_in_flight)
+        self.sock, self.is_raw = open_icmp_socket()
+        self.sock.setblocking(False)
+        try:
+            # Replies to a large window arrive in a burst; give them room
+            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, _RCVBUF_BYTES)
+        except OSError:
+            pass
+        if self.is_raw:
+            self.ident = os.getpid() & 0xFFFF
+        else:
+            # The kernel rewrites the identifier of unprivileged echo sockets
+            # to the socket's local "port"; bind so we know it up front.
+            self.sock.bind(('', 0))
+            self.ident = self.sock.getsockname()[1]
+        self._seq = 0
+
+    def close(self) -> None:
+        """Close the underlying socket."""
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _next_seq(self) -> int:
+        self._seq = (self._seq + 1) & 0xFFFF
+        return self._seq
+
+    def _send(self, ip: str, seq: int) -> bool:
+        """Send one echo request. Returns False if the send failed hard."""
+        packet = build_echo_request(self.ident, seq)
+        while True:
+            try:
+                self.sock.sendto(packet, (ip, 0))
+                return True
+            except BlockingIOError:
+                # Socket buffer is full - wait until it drains
+                select.select([], [self.sock], [], 0.05)
+            except OSError:
+                # Unreachable network, invalid address, etc.
+                return False
+
+    def _parse_reply(self, data: bytes) -> tuple[int, int] | None:
+        """Parse an echo reply. Returns (identifier, sequence) or None."""
+        if self.is_raw:
+            if not data:
+                return None
+            data = data[(data[0] & 0x0F) * 4:]
+        if len(data) < _HEADER.size:
+            return None
+        icmp_type, _code, _checksum, ident, seq = _HEADER.unpack_from(data)
+        if icmp_type != ICMP_ECHO_REPLY:
+            return None
+        if self.is_raw and ident != self.ident:
+            return None
+        return ident, seq
+
+    def probe(self, targets: Iterable[str], timeout: float = 1.0, count: int = 1,
+              timeouts: dict[str, float] | None = None,
+              pacer: Pacer | None = None) -> Iterator[tuple[str, bool, float | None]]:
+        """Probe targets and yield (ip, is_up, rtt_ms) in completion order.
+
+        Each target is sent `count` echo requests back to back and is up if
+        any of them is answered within `timeout` seconds (or timeouts[ip],
+        if given). With a pacer, sends are rate limited and targets left
+        when its deadline passes are dropped without a result.
+        """
+        count = max(1, count)
+        target_iter = iter(targets)
+        exhausted = False
+        if pacer is None:
+            pacer = Pacer()
+
+        # (ip, seq) -> sent_at; ip -> (deadline, outstanding seqs)
+        pending: dict[tuple[str, int], float] = {}
+        outstanding: dict[str, tuple[float, list[int]]] = {}
+        deadlines: list[tuple[float, str]] = []
+        sent = 0
+
+        while True:
+            # Fill the in-flight window, as fast as the pacer allows
+            pace_wait = 0.0
+            while not exhausted and len(outstanding) < self.max_in_flight:
+                pace_wait = pacer.wait_time(count)
+                if pace_wait > 0:
+                    break
+                if pacer.expired():
+                    pacer.drop(count * sum(1 for _ in target_iter))
+                    exhausted = True
+                    break
+                try:
+                    ip = next(target_iter)
+                except StopIteration:
+                    exhausted = True
+                    break
+                if ip in outstanding:
+                    continue
+                seqs = []
+                for _ in range(count):
+                    seq = self._next_seq()
+                    sent_at = time.perf_counter()
+                    if self._send(ip, seq):
+                        pending[(ip, seq)] = sent_at
+                        seqs.append(seq)
+                pacer.consume(count)
+                if not seqs:
+                    yield ip, False, None
+                    continue
+                deadline = time.perf_counter() + (timeouts.get(ip, timeout) if timeouts else timeout)
+                outstanding[ip] = (deadline, seqs)
+                heapq.heappush(deadlines, (deadline, ip))
+
+                sent += 1
+                if sent % _DRAIN_EVERY == 0:
+                    yield from self._drain(pending, outstanding)
+
+            if not outstanding and exhausted:
+                return
+
+            # Wait for replies until the earliest deadline or send slot
+            waits = [pace_wait] if pace_wait > 0 else []
+            if deadlines:
+                waits.append(max(0.0, deadlines[0][0] - time.perf_counter()))
+            if not waits:
+                continue
+            readable, _, _ = select.select([self.sock], [], [], min(waits))
+            if readable:
+                yield from self._drain(pending, outstanding)
+
+            # Expire targets whose deadline has passed
+            now = time.perf_counter()
+            while deadlines and deadlines[0][0] <= now:
+                deadline, ip = heapq.heappop(deadlines)
+                entry = outstanding.get(ip)
+                if entry is None or entry[0] != deadline:
+                    continue  # Already answered
+                del outstanding[ip]
+                for seq in entry[1]:
+                    pending.pop((ip, seq), None)
+                yield ip, False, None
+
+    def _drain(self, pending: dict[tuple[str, int], float],
+               outstanding: dict[str, tuple[float, list[int]]]) -> Iterator[tuple[str, bool, float | None]]:
+        """Read all queued replies and yield newly answered targets."""
+        while True:
+            try:
+                data, addr = self.sock.recvfrom(1024)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError as e:
+                logger.debug(f"ICMP receive error: {e}")
+                return
+            received_at = time.perf_counter()
+
+            parsed = self._parse_reply(data)
+            if parsed is None:
+                continue
+            ip = addr[0]
+            sent_at = pending.get((ip, parsed[1]))
+            if sent_at is None:
+                continue  # Late, duplicate or foreign reply
+
+            _, seqs = outstanding.pop(ip)
+            for seq in seqs:
+                pending.pop((ip, seq), None)
+            rtt_ms = round((received_at - sent_at) * 1000.0, 3)
+            yield ip, True, rtt_ms
+
+
+class AsyncIcmpEchoEngine(IcmpEchoEngine):
+    """asyncio front end for the single-socket ICMP engine.
+
+    One reader callback on the event loop matches replies to per-probe
+    futures, so any number of ping() coroutines can share the socket.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        # (ip, seq) -> (future, sent_at)
+        self._waiters: dict[tuple[str, int], tuple[asyncio.Future, float]] = {}
+
+    def close(self) -> None:
+        """Detach from the event loop and close the socket."""
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.remove_reader(self.sock.fileno())
+        self._loop = None
+        super().close()
+
+    def _on_readable(self) -> None:
+        """Event loop callback: resolve futures for every queued reply."""
+        while True:
+            try:
+                data, addr = self.sock.recvfrom(1024)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError as e:
+                logger.debug(f"ICMP receive error: {e}")
+                return
+            received_at = time.perf_counter()
+
+            parsed = self._parse_reply(data)
+            if parsed is None:
+                continue
+            waiter = self._waiters.pop((addr[0], parsed[1]), None)
+            if waiter is None:
+                continue  # Late, duplicate or foreign reply
+            future, sent_at = waiter
+            if not future.done():
+                future.set_result(round((received_at - sent_at) * 1000.0, 3))
+
+    async def ping(self, ip: str, timeout: float = 1.0, count: int = 1) -> tuple[bool, float | None]:
+        """Send `count` echo requests to ip and return (is_up, rtt_ms)."""
+        if self._loop is None:
+            self._loop = asyncio.get_running_loop()
+            self._loop.add_reader(self.sock.fileno(), self._on_readable)
+
+        future = self._loop.create_future()
+        keys = []
+        for _ in range(max(1, count)):
+            seq = self._next_seq()
+            sent_at = time.perf_counter()
+            if self._send(ip, seq):
+                key = (ip, seq)
+                self._waiters[key] = (future, sent_at)
+                keys.append(key)
+
+        if not keys:
+            return False, None
+
+        try:
+            rtt_ms = await asyncio.wait_for(future, timeout)
+            return True, rtt_ms
+        except TimeoutError:
+            return False, None
+        finally:
+            for key in keys:
+                self._waiters.pop(key, None)
@@ -0,0 +1,123 @@
+"""IPv4 neighbour (ARP) table access without spawning subprocesses."""
+import subprocess
+import threading
+import time
+
+from pyngding.core.logger import get_logger
+
+logger = get_logger('neighbors')
+
+PROC_NET_ARP = '/proc/net/arp'
+
+# Shortest time between two re-reads of the neighbour table in a sweep;
+# without procfs each read runs `ip neigh`
+REFRESH_INTERVAL = 0.5
+
+# /proc/net/arp flags: ATF_COM (0x2) marks a completed entry
+_ATF_COM = 0x2
+_NULL_MAC = '00:00:00:00:00:00'
+
+
+def read_proc_arp(path: str = PROC_NET_ARP) -> dict[str, str]:
+    """Read completed IP -> MAC entries from /proc/net/arp.
+
+    Lines look like:
+    "192.168.1.1  0x1  0x2  aa:bb:cc:dd:ee:ff  *  eth0"
+
+    Raises OSError if the file cannot be read.
+    """
+    mapping = {}
+    with open(path, encoding='ascii', errors='ignore') as f:
+        next(f, None)  # Header
+        for line in f:
+            parts = line.split()
+            if len(parts) < 4:
+                continue
+            try:
+                flags = int(parts[2], 16)
+            except ValueError:
+                continue
+            mac = parts[3].lower()
+            if flags & _ATF_COM and mac != _NULL_MAC:
+                mapping[parts[0]] = mac
+    return mapping
+
+
+def read_ip_neigh() -> dict[str, str]:
+    """Get IP -> MAC mapping from 'ip neigh show' (fallback for non-procfs systems)."""
+    mapping = {}
+    try:
+        result = subprocess.run(
+            ['ip', 'neigh', 'show'],
+            capture_output=True,
+            text=True,
+            timeout=5
+        )
+        if result.returncode == 0:
+            # Parse lines like: "192.168.1.1 dev eth0 lladdr aa:bb:cc:dd:ee:ff REACHABLE"
+            for line in result.stdout.splitlines():
+                parts = line.split()
+                if len(parts) >= 5:
+                    ip = parts[0]
+                    # Find lladdr (MAC address)
+                    for i, part in enumerate(parts):
+                        if part == 'lladdr' and i + 1 < len(parts):
+                            mapping[ip] = parts[i + 1]
+                            break
+    except (subprocess.TimeoutExpired, FileNotFoundError, Exception):
+        # Best effort - if ip command fails, continue without MACs
+        pass
+
+    return mapping
+
+
+def read_neighbor_table() -> dict[str, str]:
+    """Get the current IP -> MAC neighbour table.
+
+    Reads /proc/net/arp in-process and only falls back to `ip neigh show`
+    where procfs is unavailable.
+    """
+    try:
+        return read_proc_arp()
+    except OSError:
+        return read_ip_neigh()
+
+
+class NeighborCache:
+    """IP -> MAC map that is re-sampled on demand during a sweep.
+
+    Probing a host makes the kernel resolve its MAC before the probe even
+    leaves, so a host missing from the table at sweep start is present right
+    after it replies. lookup() re-reads the table when asked for an address
+    it does not know yet, at most once per min_interval seconds, so a sweep
+    with many responding hosts without a MAC (routed hosts) costs a few
+    reads rather than one per host. Entries are merged per IP, so a MAC
+    seen earlier in the sweep is kept even if the kernel expires it before
+    the sweep ends.
+    """
+
+    def __init__(self, min_interval: float = REFRESH_INTERVAL):
+        self.min_interval = min_interval
+        self.mapping: dict[str, str] = {}
+        self.refreshed_at = 0.0
+        self._lock = threading.Lock()
+        self.refresh()
+
+    def refresh(self) -> None:
+        """Re-read the neighbour table and merge it into the cache."""
+        table = read_neighbor_table()
+        with self._lock:
+            self.mapping.update(table)
+            self.refreshed_at = time.monotonic()
+
+    def lookup(self, ip: str, refresh: bool = True) -> str | None:
+        """Get the MAC for ip, re-sampling the table if it is not known yet.
+
+        Re-reads are skipped if the table was read less than min_interval
+        seconds ago.
+        """
+        mac = self.mapping.get(ip)
+        if mac is None and refresh and (time.monotonic() - self.refreshed_at) >= self.min_interval:
+            self.refresh()
+            mac = self.mapping.get(ip)
+        return mac
@@ -0,0 +1,141 @@
+"""Probe rate limiting and probe counters.
+
+A Pacer is a token bucket shared by everything one sweep sends: it caps the
+echo request rate at `rate_pps` (bursts of up to `burst` packets) so large
+sweeps stay under the gateway's ICMP rate limit and do not churn the
+neighbour table. Probes that could not be sent before the sweep deadline
+are dropped instead of being reported down, and counted as such.
+
+An InFlightLimiter caps how many probes the sweeps of all scan profiles
+keep in flight together.
+"""
+import asyncio
+import threading
+import time
+
+_stats_lock = threading.Lock()
+_stats = {
+    'sent': 0,
+    'received': 0,
+    'dropped': 0,
+}
+
+
+def record_probe_stats(sent: int = 0, received: int = 0, dropped: int = 0) -> None:
+    """Add to the process-wide probe counters."""
+    with _stats_lock:
+        _stats['sent'] += sent
+        _stats['received'] += received
+        _stats['dropped'] += dropped
+
+
+def get_probe_stats() -> dict:
+    """Get a snapshot of the probe counters (sent, received, dropped)."""
+    with _stats_lock:
+        return dict(_stats)
+
+
+class Pacer:
+    """Token bucket pacing probe sends, with an optional sweep deadline.
+
+    rate_pps <= 0 disables pacing; probes are then only counted.
+    deadline is a time.monotonic() value after which no more probes are sent.
+    """
+
+    def __init__(self, rate_pps: int = 0, burst: int | None = None, deadline: float | None = None):
+        self.rate = max(0, rate_pps)
+        # Default burst: 50 ms worth of packets
+        self.burst = max(1, burst if burst is not None else self.rate // 20)
+        self.deadline = deadline
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(float(self.burst), self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, n: int = 1) -> float:
+        """Seconds until n tokens are available (0.0 if they are now)."""
+        if not self.rate:
+            return 0.0
+        self._refill(time.monotonic())
+        missing = min(n, self.burst) - self.tokens
+        return missing / self.rate if missing > 0 else 0.0
+
+    def expired(self, delay: float = 0.0) -> bool:
+        """True if a probe sent `delay` seconds from now would miss the deadline."""
+        return self.deadline is not None and time.monotonic() + delay >= self.deadline
+
+    def consume(self, n: int = 1) -> None:
+        """Take n tokens for probes that are being sent now."""
+        if self.rate:
+            self._refill(time.monotonic())
+            self.tokens -= n
+        record_probe_stats(sent=n)
+
+    def drop(self, n: int = 1) -> None:
+        """Count n probes that were not sent because of the deadline."""
+        record_probe_stats(dropped=n)
+
+    def acquire(self, n: int = 1) -> bool:
+        """Block until n probes may be sent. Returns False if they are dropped."""
+        wait = self.wait_time(n)
+        if self.expired(wait):
+            self.drop(n)
+            return False
+        if wait > 0:
+            time.sleep(wait)
+        self.consume(n)
+        return True
+
+    async def acquire_async(self, n: int = 1) -> bool:
+        """Like acquire(), but waits on the event loop."""
+        wait = self.wait_time(n)
+        while wait > 0:
+            if self.expired(wait):
+                self.drop(n)
+                return False
+            await asyncio.sleep(wait)
+            # Other coroutines may have taken the tokens meanwhile
+            wait = self.wait_time(n)
+        if self.expired():
+            self.drop(n)
+            return False
+        self.consume(n)
+        return True
+
+
+class InFlightLimiter:
+    """Probe concurrency shared by the sweeps of all scan profiles.
+
+    A sweep takes up to its profile's worker budget from `limit` slots and
+    scans with as many as it got; it only waits when every slot is taken,
+    so concurrent profiles never exceed `limit` probes in flight together.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = max(1, limit)
+        self.in_use = 0
+        self._cond = threading.Condition()
+
+    def acquire(self, n: int, stop_event: threading.Event | None = None) -> int:
+        """Take up to n slots, waiting for at least one. Returns the number taken (0 if stopped)."""
+        with self._cond:
+            while self.in_use >= self.limit:
+                if stop_event is not None and stop_event.is_set():
+                    return 0
+                self._cond.wait(0.5)
+            taken = max(1, min(n, self.limit - self.in_use))
+            self.in_use += taken
+            return taken
+
+    def release(self, n: int) -> None:
+        """Give back slots taken with acquire()."""
+        with self._cond:
+            self.in_use = max(0, self.in_use - n)
+            self._cond.notify_all()
+
+    def get_stats(self) -> dict:
+        """Get the slot limit and how many are in use."""
+        with self._cond:
+            return {'limit': self.limit, 'in_use': self.in_use}
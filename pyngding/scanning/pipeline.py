@@ -0,0 +1,260 @@
+"""Streaming write path of a local scan run.
+
+Results flow from the probes through three stages, each on its own thread
+and fed by a bounded queue of result chunks (up to CHUNK_SIZE results, or
+what arrived within CHUNK_SECONDS, so hand-offs stay cheap at high probe
+rates):
+
+- enrich: adds the vendor of each result's MAC (OUI lookup)
+- persist: writes the run; hands results to the database writer in
+  batches of up to BATCH_SIZE (or whatever arrived within BATCH_SECONDS),
+  one job each, and updates the host cache with each
+- notify: queues the changes of each committed batch in the outbox
+
+So the run is written while it is still being scanned, and when the sweep
+ends only the last batch and the run's totals are left. A full queue
+blocks the stage feeding it, down to the probes, so a slow disk slows the
+scan instead of buffering results without bound. Reverse DNS stays in the
+probe stage, where the scan paths already batch it.
+"""
+import queue
+import threading
+import time
+from collections.abc import Callable
+
+from pyngding.core.db import commit_scan_batch, create_scan_run, finish_scan_run
+from pyngding.core.logger import get_logger
+from pyngding.data.host_cache import HostCache
+from pyngding.data.vendor import OUILookup
+from pyngding.scanning.targets import TargetSet
+
+logger = get_logger('pipeline')
+
+CHUNK_SIZE = 256  # results handed from one stage to the next at once
+CHUNK_SECONDS = 0.5  # longest a result waits for its chunk to fill
+QUEUE_SIZE = 32  # chunks each stage can have waiting
+BATCH_SIZE = 2048  # results written in one database writer job at most
+BATCH_SECONDS = 1.0  # longest a result waits for its batch to fill
+
+_DONE = object()  # end of the run, passed down the stages
+
+
+class _Stage:
+    """Queue and counters of one stage (depths count queue entries)."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.queue: queue.Queue = queue.Queue(maxsize=QUEUE_SIZE)
+        self.items = 0
+        self.max_depth = 0
+        self.busy_seconds = 0.0
+        self.errors = 0
+
+    def put(self, item) -> None:
+        self.queue.put(item)
+        depth = self.queue.qsize()
+        if depth > self.max_depth:
+            self.max_depth = depth
+
+    def get_stats(self) -> dict:
+        return {
+            'depth': self.queue.qsize(),
+            'max_depth': self.max_depth,
+            'items': self.items,
+            'busy_seconds': round(self.busy_seconds, 3),
+            'errors': self.errors
+        }
+
+
+class ScanPipeline:
+    """Enrich, persist and notify the results of one scan run as they arrive.
+
+    Creates the run (in progress, finished_ts = 0) on construction; feed it
+    results with submit() from the probe callback, then call close() once
+    the sweep is done. In change-only observation mode (changes_only) only
+    results that differ from their IP's last observation get a row.
+    start_lag_ms and cycle_started (time.monotonic() when the cycle began)
+    are recorded with the run's totals as its cycle timing; the run is
+    tagged with its scan profile.
+    """
+
+    def __init__(self, db_path: str, host_cache: HostCache, started_ts: int, targets_count: int,
+                 target_set: TargetSet, target_set_id: int, changes_only: bool = False,
+                 vendor_lookup: OUILookup | None = None,
+                 notify: Callable[[dict], None] | None = None,
+                 start_lag_ms: float | None = None, cycle_started: float | None = None,
+                 profile: str | None = None):
+        self.db_path = db_path
+        self.host_cache = host_cache
+        self.target_set = target_set
+        self.target_set_id = target_set_id
+        self.changes_only = changes_only
+        self.vendor_lookup = vendor_lookup
+        self.notify = notify
+        self.start_lag_ms = start_lag_ms
+        self.cycle_started = cycle_started if cycle_started is not None else time.monotonic()
+
+        self.run_id = create_scan_run(db_path, started_ts, 0, targets_count, 0, 0, profile=profile)
+        self.up_count = 0
+        self.down_count = 0
+        self.batches = 0
+        self.commit_seconds = 0.0
+        self._up: list[str] = []
+        self._probed: list[str] = []
+        self._chunk: list[dict] = []
+        self._chunk_deadline = 0.0
+
+        self.enrich = _Stage('enrich')
+        self.persist = _Stage('persist')
+        self.notifier = _Stage('notify')
+        self.threads = [
+            threading.Thread(target=self._enrich_loop, name='pyngding-enrich', daemon=True),
+            threading.Thread(target=self._persist_loop, name='pyngding-persist', daemon=True),
+            threading.Thread(target=self._notify_loop, name='pyngding-notify', daemon=True)
+        ]
+        for thread in self.threads:
+            thread.start()
+
+    def submit(self, result: dict) -> None:
+        """Add a probe result; blocks while the enrich queue is full.
+
+        Call from one thread at a time (the sweep's result callback).
+        """
+        if not self._chunk:
+            self._chunk_deadline = time.monotonic() + CHUNK_SECONDS
+        self._chunk.append(result)
+        if len(self._chunk) >= CHUNK_SIZE or time.monotonic() >= self._chunk_deadline:
+            self.enrich.put(self._chunk)
+            self._chunk = []
+
+    def close(self) -> dict:
+        """Wait for every submitted result to be written and finish the run.
+
+        Returns {'run_id', 'up_count', 'down_count'}.
+        """
+        if self._chunk:
+            self.enrich.put(self._chunk)
+            self._chunk = []
+        self.enrich.put(_DONE)
+        for thread in self.threads:
+            thread.join()
+        return {'run_id': self.run_id, 'up_count': self.up_count, 'down_count': self.down_count}
+
+    def _enrich_loop(self) -> None:
+        stage = self.enrich
+        lookup = self.vendor_lookup
+        while True:
+            chunk = stage.queue.get()
+            if chunk is _DONE:
+                break
+            started = time.perf_counter()
+            if lookup is not None:
+                for result in chunk:
+                    try:
+                        if result.get('mac'):
+                            result['vendor'] = lookup.lookup(result['mac'])
+                    except Exception as e:
+                        stage.errors += 1
+                        logger.error(f"Error enriching {result['ip']}: {e}")
+            stage.items += len(chunk)
+            stage.busy_seconds += time.perf_counter() - started
+            self.persist.put(chunk)
+        self.persist.put(_DONE)
+
+    def _persist_loop(self) -> None:
+        stage = self.persist
+        batch: list[dict] = []
+        deadline = 0.0
+        done = False
+        while not done:
+            try:
+                chunk = stage.queue.get(timeout=max(0.0, deadline - time.monotonic()) if batch else None)
+            except queue.Empty:
+                chunk = None
+            if chunk is _DONE:
+                done = True
+            elif chunk is not None:
+                if not batch:
+                    deadline = time.monotonic() + BATCH_SECONDS
+                batch.extend(chunk)
+                if len(batch) < BATCH_SIZE:
+                    continue
+            if batch:
+                self._commit(batch)
+                batch = []
+
+        try:
+            self._finish()
+        except Exception as e:
+            stage.errors += 1
+            logger.error(f"Error finishing scan run {self.run_id}: {e}")
+        self.notifier.put(_DONE)
+
+    def _commit(self, batch: list[dict]) -> None:
+        """Write a batch and hand its changes to the notify stage."""
+        stage = self.persist
+        started = time.perf_counter()
+        try:
+            # Agent ingests commit from other threads; the cache lock keeps
+            # each diff consistent with the state it replaces
+            with self.host_cache.lock:
+                observations = self.host_cache.changed_observations(batch) if self.changes_only else None
+                diff = commit_scan_batch(self.db_path, self.run_id, batch, int(time.time()),
+                                         previous=self.host_cache.hosts, observations=observations)
+                self.host_cache.apply(batch, observations)
+        except Exception as e:
+            stage.errors += 1
+            logger.error(f"Error writing {len(batch)} results of scan run {self.run_id}: {e}")
+            return
+        finally:
+            elapsed = time.perf_counter() - started
+            stage.busy_seconds += elapsed
+            self.commit_seconds += elapsed
+
+        stage.items += len(batch)
+        self.batches += 1
+        for result in batch:
+            self._probed.append(result['ip'])
+            if result['status'] == 'up':
+                self.up_count += 1
+                self._up.append(result['ip'])
+            else:
+                self.down_count += 1
+        if self.notify is not None and (diff['new'] or diff['gone'] or diff['mac_changed']):
+            self.notifier.put(diff)
+
+    def _finish(self) -> None:
+        """Record the run's totals, membership bitmaps and cycle timing."""
+        up = self.target_set.bitmap(self._up)
+        probed = None
+        if len(self._probed) < len(self.target_set):
+            # Adaptive or paced runs skip targets; NULL means all were probed
+            probed = self.target_set.bitmap(self._probed)
+        finish_scan_run(self.db_path, self.run_id, int(time.time()), self.up_count, self.down_count,
+                        target_set_id=self.target_set_id, probed=probed, up=up,
+                        start_lag_ms=self.start_lag_ms,
+                        duration_ms=round((time.monotonic() - self.cycle_started) * 1000, 1))
+
+    def _notify_loop(self) -> None:
+        stage = self.notifier
+        while True:
+            diff = stage.queue.get()
+            if diff is _DONE:
+                break
+            started = time.perf_counter()
+            try:
+                self.notify(diff)
+            except Exception as e:
+                stage.errors += 1
+                logger.error(f"Error queueing change notifications: {e}")
+            stage.items += 1
+            stage.busy_seconds += time.perf_counter() - started
+
+    def get_stats(self) -> dict:
+        """Get queue depths and counters of each stage."""
+        return {
+            'run_id': self.run_id,
+            'stages': {stage.name: stage.get_stats() for stage in (self.enrich, self.persist, self.notifier)},
+            'batches': self.batches,
+            'commit_seconds': round(self.commit_seconds, 3)
+        }
@@ -0,0 +1,444 @@
+"""Batched reverse DNS (PTR) resolver with a positive/negative TTL cache.
+
+Queries for a whole batch of addresses are sent over one UDP socket to the
+system nameservers (from /etc/resolv.conf) and answers are collected as they
+arrive, instead of one blocking gethostbyaddr() per host. Answers are cached
+for their DNS TTL and failures (NXDOMAIN / no PTR) for a negative TTL, so
+stable hosts are not re-resolved on every scan cycle. /etc/hosts is consulted
+first, like the libc resolver does.
+"""
+import asyncio
+import ipaddress
+import os
+import secrets
+import select
+import socket
+import struct
+import threading
+import time
+from collections.abc import Iterable
+
+from pyngding.core.logger import get_logger
+
+logger = get_logger('rdns')
+
+RESOLV_CONF = '/etc/resolv.conf'
+HOSTS_FILE = '/etc/hosts'
+
+DNS_PORT = 53
+QTYPE_PTR = 12
+QTYPE_SOA = 6
+QCLASS_IN = 1
+RCODE_NOERROR = 0
+RCODE_NXDOMAIN = 3
+
+MIN_TTL = 60  # seconds; floor for positive answers
+MAX_TTL = 86400  # seconds; cap for positive answers
+NEGATIVE_TTL = 900  # seconds; cache time for NXDOMAIN / empty answers
+MAX_CACHE_ENTRIES = 65536
+
+_HEADER = struct.Struct('!HHHHHH')  # id, flags, qdcount, ancount, nscount, arcount
+_RR = struct.Struct('!HHIH')  # type, class, ttl, rdlength
+
+
+def get_nameservers(path: str = RESOLV_CONF) -> list[str]:
+    """Get nameserver addresses from resolv.conf (defaults to 127.0.0.1)."""
+    servers = []
+    try:
+        with open(path, encoding='utf-8', errors='ignore') as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 2 and parts[0] == 'nameserver':
+                    address = parts[1].split('%', 1)[0]
+                    try:
+                        ipaddress.ip_address(address)
+                        servers.append(address)
+                    except ValueError:
+                        continue
+    except OSError:
+        pass
+    return servers or ['127.0.0.1']
+
+
+def read_hosts_file(path: str = HOSTS_FILE) -> dict[str, str]:
+    """Get IP -> first hostname mapping from /etc/hosts."""
+    mapping: dict[str, str] = {}
+    try:
+        with open(path, encoding='utf-8', errors='ignore') as f:
+            for line in f:
+                parts = line.split('#', 1)[0].split()
+                if len(parts) >= 2:
+                    mapping.setdefault(parts[0], parts[1])
+    except OSError:
+        pass
+    return mapping
+
+
+def reverse_name(ip: str) -> str:
+    """Get the in-addr.arpa / ip6.arpa name for an address."""
+    return ipaddress.ip_address(ip).reverse_pointer
+
+
+def build_ptr_query(txid: int, name: str) -> bytes:
+    """Build a recursive DNS PTR query for name."""
+    header = _HEADER.pack(txid, 0x0100, 1, 0, 0, 0)  # RD set
+    qname = b''.join(bytes([len(label)]) + label.encode('ascii') for label in name.split('.') if label)
+    return header + qname + b'\x00' + struct.pack('!HH', QTYPE_PTR, QCLASS_IN)
+
+
+def _read_name(data: bytes, offset: int) -> tuple[str, int]:
+    """Read a (possibly compressed) domain name. Returns (name, next_offset)."""
+    labels = []
+    end = None
+    for _ in range(128):  # Guard against pointer loops
+        length = data[offset]
+        if length & 0xC0 == 0xC0:
+            if end is None:
+                end = offset + 2
+            offset = ((length & 0x3F) << 8) | data[offset + 1]
+            continue
+        if length == 0:
+            offset += 1
+            break
+        labels.append(data[offset + 1:offset + 1 + length].decode('ascii', errors='replace'))
+        offset += 1 + length
+    else:
+        raise ValueError("DNS name too long")
+    return '.'.join(labels), end if end is not None else offset
+
+
+def parse_ptr_response(data: bytes) -> tuple[int, str, str | None, int | None]:
+    """Parse a PTR response.
+
+    Returns (txid, question_name, hostname, ttl). hostname is None for a
+    negative answer; ttl is then the negative TTL from the SOA record (or
+    None if there is none). Raises ValueError for malformed or failed
+    (SERVFAIL, REFUSED, ...) responses.
+    """
+    if len(data) < _HEADER.size:
+        raise ValueError("short DNS response")
+    txid, flags, qdcount, ancount, nscount, _arcount = _HEADER.unpack_from(data)
+    if not flags & 0x8000 or qdcount != 1:
+        raise ValueError("not a DNS response")
+    rcode = flags & 0x000F
+    if rcode not in (RCODE_NOERROR, RCODE_NXDOMAIN):
+        raise ValueError(f"DNS error rcode {rcode}")
+
+    qname, offset = _read_name(data, _HEADER.size)
+    offset += 4  # qtype, qclass
+
+    for _ in range(ancount):
+        _, offset = _read_name(data, offset)
+        rtype, _rclass, ttl, rdlength = _RR.unpack_from(data, offset)
+        offset += _RR.size
+        if rtype == QTYPE_PTR:
+            hostname, _ = _read_name(data, offset)
+            return txid, qname, hostname.rstrip('.') or None, ttl
+        offset += rdlength
+
+    # Negative answer: TTL is min(SOA TTL, SOA minimum) per RFC 2308
+    for _ in range(nscount):
+        _, offset = _read_name(data, offset)
+        rtype, _rclass, ttl, rdlength = _RR.unpack_from(data, offset)
+        offset += _RR.size
+        if rtype == QTYPE_SOA:
+            _, rdata = _read_name(data, offset)
+            _, rdata = _read_name(data, rdata)
+            minimum = struct.unpack_from('!IIIII', data, rdata)[4]
+            return txid, qname, None, min(ttl, minimum)
+        offset += rdlength
+
+    return txid, qname, None, None
+
+
+def _is_address(host: str, expected: ipaddress.IPv4Address | ipaddress.IPv6Address) -> bool:
+    """True if host (as returned by recvfrom(), maybe with a %scope) is expected."""
+    try:
+        return ipaddress.ip_address(host.split('%', 1)[0]) == expected
+    except ValueError:
+        return False
+
+
+class PtrResolver:
+    """Thread-safe batched PTR resolver with TTL cache and metrics."""
+
+    def __init__(self, nameservers: list[str] | None = None, negative_ttl: int = NEGATIVE_TTL):
+        self.nameservers = nameservers or get_nameservers()
+        self.negative_ttl = negative_ttl
+        self.cache: dict[str, tuple[str | None, float]] = {}  # ip -> (hostname, expires_at)
+        self._hosts: dict[str, str] = {}
+        self._hosts_mtime: float | None = None
+        self._lock = threading.Lock()
+        self.stats = {
+            'cache_hits': 0,
+            'cache_misses': 0,
+            'queries_sent': 0,
+            'answers': 0,
+            'negative_answers': 0,
+            'timeouts': 0,
+            'errors': 0,
+            'latency_seconds_sum': 0.0,
+            'latency_count': 0,
+        }
+
+    def _hosts_lookup(self, ip: str) -> str | None:
+        """Look ip up in /etc/hosts, re-reading the file when it changes."""
+        try:
+            mtime = os.stat(HOSTS_FILE).st_mtime
+        except OSError:
+            mtime = None
+        if mtime != self._hosts_mtime:
+            self._hosts = read_hosts_file()
+            self._hosts_mtime = mtime
+        return self._hosts.get(ip)
+
+    def cached(self, ip: str) -> tuple[bool, str | None]:
+        """Look ip up in the cache. Returns (hit, hostname)."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self.cache.get(ip)
+            if entry is not None and entry[1] > now:
+                self.stats['cache_hits'] += 1
+                return True, entry[0]
+            self.stats['cache_misses'] += 1
+        return False, None
+
+    def _store(self, ip: str, hostname: str | None, ttl: int | None) -> None:
+        if hostname is None:
+            ttl = min(ttl, self.negative_ttl) if ttl is not None else self.negative_ttl
+        else:
+            ttl = max(MIN_TTL, min(ttl or MIN_TTL, MAX_TTL))
+        now = time.monotonic()
+        with self._lock:
+            if len(self.cache) >= MAX_CACHE_ENTRIES:
+                self.cache = {k: v for k, v in self.cache.items() if v[1] > now}
+            self.cache[ip] = (hostname, now + ttl)
+
+    def resolve(self, ip: str, timeout: float = 0.5) -> str | None:
+        """Resolve a single address. Returns hostname or None."""
+        return self.resolve_many([ip], timeout).get(ip)
+
+    def resolve_many(self, ips: Iterable[str], timeout: float = 0.5) -> dict[str, str | None]:
+        """Resolve a batch of addresses.
+
+        Cache hits and /etc/hosts entries are answered immediately. All
+        misses are queried at once and answers collected until `timeout`;
+        unanswered queries are retried against the next nameserver halfway
+        through. Addresses that time out map to None and are not cached.
+        """
+        results: dict[str, str | None] = {}
+        misses = []
+        for ip in dict.fromkeys(ips):
+            hit, hostname = self.cached(ip)
+            if hit:
+                results[ip] = hostname
+            else:
+                misses.append(ip)
+
+        results.update(self.resolve_uncached(misses, timeout))
+        return results
+
+    def resolve_uncached(self, ips: list[str], timeout: float = 0.5) -> dict[str, str | None]:
+        """Resolve addresses already known to miss the cache."""
+        results: dict[str, str | None] = {}
+        misses = []
+        for ip in ips:
+            hostname = self._hosts_lookup(ip)
+            if hostname is not None:
+                self._store(ip, hostname, MAX_TTL)
+                results[ip] = hostname
+            else:
+                misses.append(ip)
+
+        if misses:
+            results.update(self._query(misses, timeout))
+        return results
+
+    def _query(self, ips: list[str], timeout: float) -> dict[str, str | None]:
+        """Send PTR queries for ips and collect answers until timeout."""
+        results: dict[str, str | None] = {ip: None for ip in ips}
+        sockets: dict[int, socket.socket] = {}
+
+        def sock_for(server: str) -> socket.socket:
+            family = socket.AF_INET6 if ':' in server else socket.AF_INET
+            if family not in sockets:
+                sock = socket.socket(family, socket.SOCK_DGRAM)
+                sock.setblocking(False)
+                sockets[family] = sock
+            return sockets[family]
+
+        # txid -> (ip, query name, sent_at, nameserver address)
+        pending: dict[int, tuple[str, str, float, ipaddress.IPv4Address | ipaddress.IPv6Address]] = {}
+        used_ids: set[int] = set()
+
+        def send(ip: str, server: str) -> None:
+            # Unpredictable IDs, so an off-path host cannot guess them
+            txid = secrets.randbelow(0x10000)
+            while txid in used_ids:
+                txid = secrets.randbelow(0x10000)
+            used_ids.add(txid)
+            name = reverse_name(ip)
+            try:
+                sock_for(server).sendto(build_ptr_query(txid, name), (server, DNS_PORT))
+            except OSError as e:
+                logger.debug(f"PTR query for {ip} to {server} failed: {e}")
+                return
+            pending[txid] = (ip, name, time.monotonic(), ipaddress.ip_address(server))
+            with self._lock:
+                self.stats['queries_sent'] += 1
+
+        try:
+            for ip in ips:
+                send(ip, self.nameservers[0])
+
+            started = time.monotonic()
+            deadline = started + timeout
+            retried = len(self.nameservers) < 2
+            while pending:
+                now = time.monotonic()
+                if now >= deadline:
+                    break
+                if not retried and now >= started + timeout / 2:
+                    # Retry stragglers against the next nameserver
+                    retried = True
+                    for ip in {entry[0] for entry in pending.values()}:
+                        send(ip, self.nameservers[1])
+                    continue
+                wait_until = deadline if retried else min(deadline, started + timeout / 2)
+                readable, _, _ = select.select(list(sockets.values()), [], [], max(0.0, wait_until - now))
+                for sock in readable:
+                    self._drain(sock, pending, results)
+        finally:
+            for sock in sockets.values():
+                sock.close()
+
+        timed_out = {entry[0] for entry in pending.values()}
+        with self._lock:
+            self.stats['timeouts'] += len(timed_out)
+        return results
+
+    def _drain(self, sock: socket.socket,
+               pending: dict[int, tuple[str, str, float, ipaddress.IPv4Address | ipaddress.IPv6Address]],
+               results: dict[str, str | None]) -> None:
+        """Read all queued responses on sock and record answers.
+
+        A response only counts when it comes from port 53 of the nameserver
+        its query was sent to and matches the query's ID and name.
+        """
+        while True:
+            try:
+                data, addr = sock.recvfrom(4096)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError:
+                return
+            received_at = time.monotonic()
+            try:
+                txid, qname, hostname, ttl = parse_ptr_response(data)
+            except (ValueError, IndexError, struct.error):
+                with self._lock:
+                    self.stats['errors'] += 1
+                continue
+
+            entry = pending.get(txid)
+            if entry is None or entry[1].lower() != qname.lower():
+                continue  # Unknown or spoofed response
+            if addr[1] != DNS_PORT or not _is_address(addr[0], entry[3]):
+                logger.debug(f"Dropped PTR response for {entry[0]} from unexpected source {addr[0]}:{addr[1]}")
+                continue
+            ip = entry[0]
+            # Drop every outstanding query for this ip (original and retry)
+            for other in [k for k, v in pending.items() if v[0] == ip]:
+                del pending[other]
+
+            results[ip] = hostname
+            self._store(ip, hostname, ttl)
+            with self._lock:
+                self.stats['answers'] += 1
+                if hostname is None:
+                    self.stats['negative_answers'] += 1
+                self.stats['latency_seconds_sum'] += received_at - entry[2]
+                self.stats['latency_count'] += 1
+
+    def get_stats(self) -> dict:
+        """Get a snapshot of resolver metrics including cache size and hit rate."""
+        with self._lock:
+            stats = dict(self.stats)
+            stats['cache_entries'] = len(self.cache)
+        lookups = stats['cache_hits'] + stats['cache_misses']
+        stats['cache_hit_rate'] = stats['cache_hits'] / lookups if lookups else 0.0
+        return stats
+
+
+class AsyncPtrBatcher:
+    """Collect PTR lookups from many coroutines into batched resolver calls.
+
+    A batch is flushed once it reaches max_batch addresses or max_delay
+    seconds after its first lookup; the blocking resolve runs in a worker
+    thread so the event loop keeps serving probes.
+    """
+
+    def __init__(self, resolver: 'PtrResolver', timeout: float = 0.5,
+                 max_batch: int = 256, max_delay: float = 0.05):
+        self.resolver = resolver
+        self.timeout = timeout
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._batch: dict[str, list[asyncio.Future]] = {}
+        self._flush_handle: asyncio.TimerHandle | None = None
+        self._tasks: set[asyncio.Task] = set()
+
+    async def lookup(self, ip: str) -> str | None:
+        """Resolve ip as part of the current batch."""
+        hit, hostname = self.resolver.cached(ip)
+        if hit:
+            return hostname
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._batch.setdefault(ip, []).append(future)
+        if len(self._batch) >= self.max_batch:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.max_delay, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._batch = self._batch, {}
+        if batch:
+            task = asyncio.ensure_future(self._resolve(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _resolve(self, batch: dict[str, list[asyncio.Future]]) -> None:
+        try:
+            answers = await asyncio.to_thread(self.resolver.resolve_uncached, list(batch), self.timeout)
+        except Exception as e:
+            logger.debug(f"PTR batch failed: {e}")
+            answers = {}
+        for ip, futures in batch.items():
+            for future in futures:
+                if not future.done():
+                    future.set_result(answers.get(ip))
+
+
+# Module-level singleton so the cache survives across scan cycles
+_ptr_resolver: PtrResolver | None = None
+_resolver_lock = threading.Lock()
+
+
+def get_ptr_resolver() -> PtrResolver:
+    """Get the singleton PtrResolver instance.
+
+    Thread-safe lazy initialization.
+    """
+    global _ptr_resolver
+    if _ptr_resolver is None:
+        with _resolver_lock:
+            # Double-check locking pattern
+            if _ptr_resolver is None:
+                _ptr_resolver = PtrResolver()
+    return _ptr_resolver
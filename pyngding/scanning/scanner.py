@@ -1,10 +1,41 @@
 """IPv4 scanner: ping reachability + MAC enrichment + reverse DNS."""
-import ipaddress
+import asyncio
+import errno
 import re
-import socket
+import resource
 import subprocess
-from concurrent.futures import ThreadPoolExecutor
-from concurrent.futures import TimeoutError as FutureTimeoutError
+import time
+from collections.abc import Awaitable, Callable, Iterable, Iterator, Sequence
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, as_completed, wait
+from itertools import chain
+
+from pyngding.core.logger import get_logger
+from pyngding.scanning.neighbors import REFRESH_INTERVAL, NeighborCache, read_neighbor_table
+from pyngding.scanning.pacing import Pacer, record_probe_stats
+from pyngding.scanning.rdns import AsyncPtrBatcher, get_ptr_resolver
+from pyngding.scanning.simulated import SimulatedNetwork
+from pyngding.scanning.targets import load_targets
+from pyngding.scanning.tcp import TcpConnectProbe, tcp_ping
+
+logger = get_logger('scanner')
+
+# Probe engines selectable via the ping_engine setting
+PING_ENGINES = ('subprocess', 'icmp', 'arp', 'simulated')
+
+# Reverse DNS: PTR queries for up hosts are sent in batches of up to this
+# many addresses, or whatever has accumulated after RDNS_BATCH_DELAY seconds
+RDNS_BATCH_SIZE = 64
+RDNS_BATCH_DELAY = 0.05
+RDNS_TIMEOUT = 0.5
+
+# Ping subprocesses of the asyncio scan path: each holds descriptors (pipes,
+# /dev/null, the child watcher's pidfd) while it runs, so how many run at
+# once is capped by the fd limit, not by max_in_flight
+_PING_FDS = 4
+_FD_HEADROOM = 128  # descriptors left for the DB, web server, etc.
+_SPAWN_RETRIES = 5
+_SPAWN_BACKOFF = 0.05  # seconds, doubled on each retry
+_SPAWN_TRANSIENT = (errno.EMFILE, errno.ENFILE, errno.EAGAIN, errno.ENOMEM)
 
 
 def parse_targets(targets_str: str, target_cap: int = 4096) -> list[str]:
@@ -14,80 +45,29 @@ def parse_targets(targets_str: str, target_cap: int = 4096) -> list[str]:
     - CIDR notation: 192.168.1.0/24
     - Ranges: 192.168.1.1-192.168.1.50
     - Comma-separated list
+    - Exclusions prefixed with '!': !192.168.1.1, !192.168.1.0/28
 
-    Returns list of IP addresses as strings.
+    Returns list of IP addresses as strings, in numeric order. See
+    load_targets() for the lazy, memoised TargetSet this is built from.
     """
-    ip_set: set[str] = set()
-    parts = [p.strip() for p in targets_str.split(',') if p.strip()]
+    return list(load_targets(targets_str, target_cap))
 
-    for part in parts:
-        # Try CIDR notation
-        if '/' in part:
-            try:
-                network = ipaddress.ip_network(part, strict=False)
-                for ip in network.hosts():  # Excludes network/broadcast
-                    ip_set.add(str(ip))
-            except ValueError:
-                continue
-
-        # Try range notation: a.b.c.d-a.b.c.z
-        elif '-' in part:
-            try:
-                start_str, end_str = part.split('-', 1)
-                start_ip = ipaddress.ip_address(start_str.strip())
-                end_ip = ipaddress.ip_address(end_str.strip())
-
-                # Only support ranges within same /24 for safety
-                if start_ip.version == 4 and end_ip.version == 4:
-                    start_int = int(start_ip)
-                    end_int = int(end_ip)
-                    if 0 <= (end_int - start_int) <= 255:  # Limit to 256 IPs
-                        for ip_int in range(start_int, end_int + 1):
-                            ip_set.add(str(ipaddress.ip_address(ip_int)))
-            except (ValueError, AttributeError):
-                continue
-
-        # Try single IP
-        else:
-            try:
-                ip = ipaddress.ip_address(part)
-                if ip.version == 4:
-                    ip_set.add(str(ip))
-            except ValueError:
-                continue
 
-    # Apply cap
-    ip_list = sorted(list(ip_set))[:target_cap]
-    return ip_list
+def get_mac_mapping() -> dict[str, str]:
+    """Get IP -> MAC mapping from the kernel neighbour table."""
+    return read_neighbor_table()
 
 
-def get_mac_mapping() -> dict[str, str]:
-    """Get IP -> MAC mapping from 'ip neigh show'."""
-    mapping = {}
-    try:
-        result = subprocess.run(
-            ['ip', 'neigh', 'show'],
-            capture_output=True,
-            text=True,
-            timeout=5
-        )
-        if result.returncode == 0:
-            # Parse lines like: "192.168.1.1 dev eth0 lladdr aa:bb:cc:dd:ee:ff REACHABLE"
-            for line in result.stdout.splitlines():
-                parts = line.split()
-                if len(parts) >= 5:
-                    ip = parts[0]
-                    # Find lladdr (MAC address)
-                    for i, part in enumerate(parts):
-                        if part == 'lladdr' and i + 1 < len(parts):
-                            mac = parts[i + 1]
-                            mapping[ip] = mac
-                            break
-    except (subprocess.TimeoutExpired, FileNotFoundError, Exception):
-        # Best effort - if ip command fails, continue without MACs
-        pass
-
-    return mapping
+def _parse_ping_rtt(output: str) -> int | None:
+    """Parse RTT in ms from ping output (best effort)."""
+    # Look for pattern like "time=1.23 ms" or "time=1.23ms"
+    match = re.search(r'time[=<](\d+\.?\d*)\s*ms', output)
+    if match:
+        try:
+            return int(float(match.group(1)))
+        except (ValueError, AttributeError):
+            pass
+    return None
 
 
 def ping_host(ip: str, timeout: float = 1.0, count: int = 1) -> tuple[bool, int | None]:
@@ -105,17 +85,7 @@ def ping_host(ip: str, timeout: float = 1.0, count: int = 1) -> tuple[bool, int
         )
 
         is_up = result.returncode == 0
-
-        # Try to parse RTT from output (best effort)
-        rtt_ms = None
-        if is_up:
-            # Look for pattern like "time=1.23 ms" or "time=1.23ms"
-            match = re.search(r'time[=<](\d+\.?\d*)\s*ms', result.stdout)
-            if match:
-                try:
-                    rtt_ms = int(float(match.group(1)))
-                except (ValueError, AttributeError):
-                    pass
+        rtt_ms = _parse_ping_rtt(result.stdout) if is_up else None
 
         return is_up, rtt_ms
 
@@ -125,79 +95,495 @@ def ping_host(ip: str, timeout: float = 1.0, count: int = 1) -> tuple[bool, int
         return False, None
 
 
-def reverse_dns_lookup(ip: str, timeout: float = 0.5) -> str | None:
-    """Perform reverse DNS lookup for an IP address.
+def max_ping_processes() -> int:
+    """Get how many ping subprocesses may run at once under the fd limit."""
+    soft_limit, _ = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft_limit == resource.RLIM_INFINITY:
+        return 4096
+    return max(1, (soft_limit - _FD_HEADROOM) // _PING_FDS)
 
-    Returns hostname or None if lookup fails or times out.
+
+async def _spawn_ping(ip: str, timeout: float, count: int) -> asyncio.subprocess.Process:
+    """Start a ping child process, retrying while descriptors or processes run out.
+
+    Raises OSError if it still cannot be started after _SPAWN_RETRIES retries.
+    """
+    delay = _SPAWN_BACKOFF
+    for attempt in range(_SPAWN_RETRIES + 1):
+        try:
+            return await asyncio.create_subprocess_exec(
+                'ping', '-c', str(count), '-W', str(int(timeout)), ip,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.DEVNULL
+            )
+        except OSError as e:
+            if e.errno not in _SPAWN_TRANSIENT or attempt == _SPAWN_RETRIES:
+                raise
+        await asyncio.sleep(delay)
+        delay *= 2
+
+
+async def ping_host_async(ip: str, timeout: float = 1.0, count: int = 1,
+                          spawn_limit: asyncio.Semaphore | None = None) -> tuple[bool, int | None]:
+    """Ping a host without blocking the event loop and return (is_up, rtt_ms).
+
+    Same command and deadline as ping_host(), but the child process is awaited
+    by the event loop instead of a worker thread. spawn_limit caps how many
+    ping processes run at once (see max_ping_processes()).
+
+    Raises OSError if ping could not be started: that is a probe error, not
+    the host being down.
     """
+    if spawn_limit is not None:
+        async with spawn_limit:
+            return await ping_host_async(ip, timeout, count)
+
+    proc = await _spawn_ping(ip, timeout, count)
     try:
-        # Use socket with timeout
-        socket.setdefaulttimeout(timeout)
-        hostname, _, _ = socket.gethostbyaddr(ip)
-        return hostname
-    except (TimeoutError, socket.herror, socket.gaierror, OSError):
-        return None
+        stdout, _ = await asyncio.wait_for(proc.communicate(), timeout + 1.0)
+    except Exception:
+        return False, None
     finally:
-        socket.setdefaulttimeout(None)
+        if proc.returncode is None:
+            try:
+                proc.kill()
+            except ProcessLookupError:
+                pass
+            await proc.wait()
 
+    is_up = proc.returncode == 0
+    rtt_ms = _parse_ping_rtt(stdout.decode(errors='ignore')) if is_up else None
+    return is_up, rtt_ms
 
-def scan_targets(targets: list[str], ping_timeout: float = 1.0, ping_count: int = 1,
-                 max_workers: int = 32, reverse_dns: bool = False) -> list[dict]:
-    """Scan a list of IP targets and return results.
 
-    Returns list of dicts with keys: ip, status, rtt_ms, mac, hostname
+def open_icmp_engine(max_in_flight: int = 1024):
+    """Open the single-socket ICMP engine, with at most max_in_flight probes awaiting a reply.
+
+    Returns an IcmpEchoEngine, or None if no ICMP socket could be opened
+    (neither unprivileged SOCK_DGRAM nor SOCK_RAW with NET_RAW).
     """
-    # Get MAC mapping once
-    mac_mapping = get_mac_mapping()
+    from pyngding.scanning.icmp import IcmpEchoEngine
 
-    results = []
+    try:
+        return IcmpEchoEngine(max_in_flight)
+    except OSError as e:
+        logger.warning(f"ICMP engine unavailable ({e}), falling back to ping subprocesses")
+        return None
 
-    def scan_one(ip: str) -> dict:
-        """Scan a single IP."""
-        is_up, rtt_ms = ping_host(ip, timeout=ping_timeout, count=ping_count)
-        status = "up" if is_up else "down"
 
-        mac = mac_mapping.get(ip)
-        hostname = None
+def reverse_dns_lookup(ip: str, timeout: float = 0.5) -> str | None:
+    """Perform reverse DNS lookup for an IP address.
+
+    Goes through the shared PTR resolver and its cache; unlike
+    socket.gethostbyaddr() this does not touch the process-wide socket
+    default timeout.
+
+    Returns hostname or None if lookup fails or times out.
+    """
+    return get_ptr_resolver().resolve(ip, timeout)
+
+
+def probe_targets(targets: Iterable[str], timeout: float = 1.0, count: int = 1,
+                  engine: str = 'subprocess', max_workers: int = 32,
+                  arp_rate_pps: int = 4000, arp_timeout: float = 0.5,
+                  timeouts: dict[str, float] | None = None,
+                  pacer: Pacer | None = None,
+                  simulation: SimulatedNetwork | None = None,
+                  max_in_flight: int = 1024) -> Iterator[tuple[str, bool, float | None, str | None, str]]:
+    """Probe targets with the selected engine, yielding in completion order.
+
+    engine is one of PING_ENGINES:
+    - 'subprocess': one `ping` process per target, max_workers at a time
+    - 'icmp': all targets over a single ICMP socket, max_in_flight awaiting
+      a reply at a time
+    - 'arp': ARP who-has sweep for targets on directly attached subnets,
+      ICMP for everything else
+    - 'simulated': results generated by `simulation` (a default
+      SimulatedNetwork if None), no packets sent
+
+    timeouts optionally overrides `timeout` per IP. It is honoured by the
+    ICMP engine only; ARP uses arp_timeout and `ping -W` has whole-second
+    resolution.
+
+    pacer rate limits ICMP and `ping` probes and drops those it cannot send
+    before its deadline; dropped targets yield no result. ARP sweeps are
+    paced by arp_rate_pps instead.
+
+    Yields (ip, is_up, rtt_ms, mac, probe) tuples; mac is only known for ARP
+    and simulated replies and probe is the probe type used ('arp', 'icmp'
+    or 'simulated').
+    """
+    if pacer is None:
+        pacer = Pacer()
+
+    if engine == 'simulated':
+        if simulation is None:
+            simulation = SimulatedNetwork()
+        for ip, is_up, rtt_ms, mac in simulation.probe(targets, timeout=timeout, count=count,
+                                                       timeouts=timeouts, pacer=pacer):
+            if is_up:
+                record_probe_stats(received=1)
+            yield ip, is_up, rtt_ms, mac, 'simulated'
+        return
+
+    if engine == 'arp':
+        from pyngding.scanning.arp import open_arp_engines
+
+        arp_engines, targets = open_arp_engines(targets, rate_pps=arp_rate_pps)
+        for arp, ips in arp_engines:
+            with arp:
+                for ip, is_up, rtt_ms, mac in arp.probe(ips, timeout=arp_timeout, count=count):
+                    yield ip, is_up, rtt_ms, mac, 'arp'
+        engine = 'icmp'
+
+    if engine == 'icmp':
+        icmp = open_icmp_engine(max_in_flight)
+        if icmp is not None:
+            with icmp:
+                for ip, is_up, rtt_ms in icmp.probe(targets, timeout=timeout, count=count,
+                                                      timeouts=timeouts, pacer=pacer):
+                    if is_up:
+                        record_probe_stats(received=1)
+                    yield ip, is_up, rtt_ms, None, 'icmp'
+            return
+
+    # One ping subprocess per target, with a bounded submission window
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures: dict[Future, str] = {}
+        window = max_workers * 2
+        target_iter = iter(targets)
+        exhausted = False
+        while True:
+            while not exhausted and len(futures) < window:
+                ip = next(target_iter, None)
+                if ip is None:
+                    exhausted = True
+                    break
+                if not pacer.acquire(count):
+                    continue
+                futures[executor.submit(ping_host, ip, timeout, count)] = ip
+
+            if not futures:
+                return
+
+            done, _ = wait(list(futures), return_when=FIRST_COMPLETED)
+            for future in done:
+                ip = futures.pop(future)
+                try:
+                    is_up, rtt_ms = future.result()
+                except Exception:
+                    is_up, rtt_ms = False, None
+                if is_up:
+                    record_probe_stats(received=1)
+                yield ip, is_up, rtt_ms, None, 'icmp'
+
+
+def iter_scan_targets(targets: Iterable[str], ping_timeout: float = 1.0, ping_count: int = 1,
+                      max_workers: int = 32, reverse_dns: bool = False,
+                      engine: str = 'subprocess', arp_rate_pps: int = 4000,
+                      arp_timeout: float = 0.5, timeouts: dict[str, float] | None = None,
+                      pacer: Pacer | None = None, tcp_ports: Iterable[int] = (),
+                      tcp_timeout: float = 0.5,
+                      simulation: SimulatedNetwork | None = None,
+                      max_in_flight: int = 1024) -> Iterator[dict]:
+    """Scan IP targets and yield each result as soon as it completes.
+
+    See probe_targets() for the available engines. max_in_flight is the
+    window of the ICMP engine and of the TCP fallback. Targets are consumed
+    lazily and only a bounded window of probes is outstanding, so neither the
+    time to first result nor the memory held depends on the size of the sweep.
+
+    If tcp_ports is given, targets that did not answer ICMP are re-probed
+    with TCP connects to those ports once the sweep is done (see
+    TcpConnectProbe); ARP non-responders are not, as they are not on the link.
+
+    Yields dicts with keys: ip, status, rtt_ms, mac, hostname, probe
+    (probe is 'arp', 'icmp', 'simulated' or 'tcp:<port>' for up hosts, None
+    for down ones)
+    """
+    if engine == 'simulated':
+        reverse_dns = False  # Simulated addresses have no PTR records
+    tcp_ports = tuple(tcp_ports)
 
-        # Only do reverse DNS for hosts that are up (to avoid slowing down scans)
+    # Neighbour table, re-sampled when a host that just replied has no MAC yet
+    neighbors = NeighborCache(min_interval=REFRESH_INTERVAL)
+
+    def make_result(ip: str, is_up: bool, rtt_ms: float | None, mac: str | None = None,
+                    probe: str | None = None, hostname: str | None = None) -> dict:
+        return {
+            'ip': ip,
+            'status': 'up' if is_up else 'down',
+            'rtt_ms': rtt_ms,
+            'mac': mac or neighbors.lookup(ip, refresh=is_up),
+            'hostname': hostname,
+            'probe': probe if is_up else None
+        }
+
+    # ICMP non-responders, re-probed over TCP after the main sweep
+    fallback: list[str] = []
+
+    def tcp_fallback() -> Iterator[tuple[str, bool, float | None, str | None, str]]:
+        if not fallback:
+            return
+        # The probe's window counts sockets, one per port of each target
+        prober = TcpConnectProbe(tcp_ports, max_in_flight * len(tcp_ports))
+        for ip, is_up, rtt_ms, port in prober.probe(fallback, timeout=tcp_timeout, pacer=pacer):
+            if is_up:
+                record_probe_stats(received=1)
+            yield ip, is_up, rtt_ms, None, f'tcp:{port}'
+
+    resolver = get_ptr_resolver()
+
+    # Up hosts missing from the PTR cache are resolved in batches off-thread
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        futures: dict[Future, list[tuple[str, float | None, str | None, str]]] = {}
+        batch: list[tuple[str, float | None, str | None, str]] = []
+        batch_started = 0.0
+
+        def flush() -> None:
+            nonlocal batch
+            if batch:
+                ips = [entry[0] for entry in batch]
+                futures[executor.submit(resolver.resolve_uncached, ips, RDNS_TIMEOUT)] = batch
+                batch = []
+
+        def harvest(done) -> Iterator[dict]:
+            for future in done:
+                entries = futures.pop(future)
+                try:
+                    hostnames = future.result()
+                except Exception:
+                    hostnames = {}
+                for ip, rtt_ms, mac, probe in entries:
+                    yield make_result(ip, True, rtt_ms, mac, probe, hostnames.get(ip))
+
+        probes = probe_targets(
+            targets,
+            timeout=ping_timeout,
+            count=ping_count,
+            engine=engine,
+            max_workers=max_workers,
+            arp_rate_pps=arp_rate_pps,
+            arp_timeout=arp_timeout,
+            timeouts=timeouts,
+            pacer=pacer,
+            simulation=simulation,
+            max_in_flight=max_in_flight
+        )
+        # tcp_fallback() only starts once the main probes are exhausted
+        for ip, is_up, rtt_ms, mac, probe in chain(probes, tcp_fallback()):
+            if not is_up and tcp_ports and probe == 'icmp':
+                fallback.append(ip)
+                continue
+            # Only do reverse DNS for hosts that are up (to avoid slowing down scans)
+            if is_up and reverse_dns:
+                hit, hostname = resolver.cached(ip)
+                if hit:
+                    yield make_result(ip, True, rtt_ms, mac, probe, hostname)
+                else:
+                    if not batch:
+                        batch_started = time.monotonic()
+                    batch.append((ip, rtt_ms, mac, probe))
+            else:
+                yield make_result(ip, is_up, rtt_ms, mac, probe)
+
+            if len(batch) >= RDNS_BATCH_SIZE or (batch and time.monotonic() - batch_started >= RDNS_BATCH_DELAY):
+                flush()
+            yield from harvest([f for f in futures if f.done()])
+
+        flush()
+        yield from harvest(as_completed(list(futures)))
+
+
+def scan_targets(targets: list[str], ping_timeout: float = 1.0, ping_count: int = 1,
+                 max_workers: int = 32, reverse_dns: bool = False,
+                 engine: str = 'subprocess', arp_rate_pps: int = 4000,
+                 arp_timeout: float = 0.5, timeouts: dict[str, float] | None = None,
+                 pacer: Pacer | None = None, tcp_ports: Iterable[int] = (),
+                 tcp_timeout: float = 0.5,
+                 simulation: SimulatedNetwork | None = None) -> list[dict]:
+    """Scan a list of IP targets and return results in completion order.
+
+    Returns list of dicts with keys: ip, status, rtt_ms, mac, hostname, probe
+    """
+    return list(iter_scan_targets(
+        targets,
+        ping_timeout=ping_timeout,
+        ping_count=ping_count,
+        max_workers=max_workers,
+        reverse_dns=reverse_dns,
+        engine=engine,
+        arp_rate_pps=arp_rate_pps,
+        arp_timeout=arp_timeout,
+        timeouts=timeouts,
+        pacer=pacer,
+        tcp_ports=tcp_ports,
+        tcp_timeout=tcp_timeout,
+        simulation=simulation
+    ))
+
+
+async def scan_targets_async(targets: Sequence[str], ping_timeout: float = 1.0, ping_count: int = 1,
+                             max_in_flight: int = 1024, reverse_dns: bool = False,
+                             engine: str = 'subprocess',
+                             on_result: Callable[[dict], Awaitable[None] | None] | None = None,
+                             arp_rate_pps: int = 4000, arp_timeout: float = 0.5,
+                             timeouts: dict[str, float] | None = None,
+                             pacer: Pacer | None = None, tcp_ports: Iterable[int] = (),
+                             tcp_timeout: float = 0.5,
+                             simulation: SimulatedNetwork | None = None) -> list[dict]:
+    """Scan a list of IP targets from a single thread using asyncio.
+
+    At most max_in_flight probes are outstanding at any time. Every probe has
+    its own deadline, so a slow target never holds up the others. With the
+    'arp' engine, the ARP sweep of attached subnets runs in a worker thread
+    alongside the ICMP probes for everything else.
+
+    timeouts optionally overrides ping_timeout per IP (ICMP and simulated
+    engines only).
+    pacer rate limits probes; targets it drops are left out of the results,
+    as are targets whose ping subprocess could not be started. Ping
+    subprocesses (no ICMP socket) are further capped by the fd limit.
+    If tcp_ports is given, ICMP non-responders are re-probed with TCP
+    connects to those ports.
+
+    If on_result is given it is called (and awaited, if it returns an
+    awaitable) with each result as soon as that result completes.
+
+    Returns list of dicts with keys: ip, status, rtt_ms, mac, hostname, probe,
+    in the same order as targets (ARP-swept targets last).
+    """
+    if engine == 'simulated':
+        reverse_dns = False  # Simulated addresses have no PTR records
+        if simulation is None:
+            simulation = SimulatedNetwork()
+
+    # Neighbour table, re-sampled when a host that just replied has no MAC yet
+    neighbors = NeighborCache(min_interval=REFRESH_INTERVAL)
+
+    arp_engines = []
+    if engine == 'arp':
+        from pyngding.scanning.arp import open_arp_engines
+        arp_engines, targets = open_arp_engines(targets, rate_pps=arp_rate_pps)
+        engine = 'icmp'
+
+    icmp = None
+    if engine == 'icmp':
+        from pyngding.scanning.icmp import AsyncIcmpEchoEngine
+        try:
+            icmp = AsyncIcmpEchoEngine()
+        except OSError as e:
+            logger.warning(f"ICMP engine unavailable ({e}), falling back to ping subprocesses")
+    spawn_limit = asyncio.Semaphore(max_ping_processes())
+    spawn_errors = 0
+
+    results: list[dict | None] = [None] * len(targets)
+    arp_results: list[dict] = []
+    positions = iter(range(len(targets)))
+    ptr_batcher = AsyncPtrBatcher(get_ptr_resolver(), timeout=RDNS_TIMEOUT,
+                                  max_batch=RDNS_BATCH_SIZE, max_delay=RDNS_BATCH_DELAY)
+
+    async def make_result(ip: str, is_up: bool, rtt_ms: float | None, mac: str | None = None,
+                          probe: str | None = None) -> dict:
+        hostname = None
         if is_up and reverse_dns:
-            hostname = reverse_dns_lookup(ip, timeout=0.5)
+            hostname = await ptr_batcher.lookup(ip)
 
         return {
             'ip': ip,
-            'status': status,
+            'status': 'up' if is_up else 'down',
             'rtt_ms': rtt_ms,
-            'mac': mac,
-            'hostname': hostname
+            'mac': mac or neighbors.lookup(ip, refresh=is_up),
+            'hostname': hostname,
+            'probe': probe if is_up else None
         }
 
-    # Scan with bounded concurrency
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        futures = {executor.submit(scan_one, ip): ip for ip in targets}
+    async def deliver(result: dict) -> None:
+        if on_result is not None:
+            pending = on_result(result)
+            if pending is not None:
+                await pending
+
+    if pacer is None:
+        pacer = Pacer()
+
+    async def scan_one(ip: str) -> dict | None:
+        """Scan a single IP. Returns None if the pacer dropped the probe."""
+        if not await pacer.acquire_async(ping_count):
+            return None
+        if engine == 'simulated':
+            timeout = timeouts.get(ip, ping_timeout) if timeouts else ping_timeout
+            is_up, rtt_ms, mac = simulation.ping(ip, timeout=timeout, count=ping_count)
+            if is_up:
+                record_probe_stats(received=1)
+            return await make_result(ip, is_up, rtt_ms, mac, 'simulated')
+        if icmp is not None:
+            timeout = timeouts.get(ip, ping_timeout) if timeouts else ping_timeout
+            is_up, rtt_ms = await icmp.ping(ip, timeout=timeout, count=ping_count)
+        else:
+            try:
+                is_up, rtt_ms = await ping_host_async(ip, timeout=ping_timeout, count=ping_count,
+                                                      spawn_limit=spawn_limit)
+            except OSError as e:
+                # Not probed: left out of the results, like pacer drops
+                nonlocal spawn_errors
+                spawn_errors += 1
+                if spawn_errors == 1:
+                    logger.warning(f"Could not start ping for {ip}: {e}")
+                record_probe_stats(dropped=ping_count)
+                return None
+        probe = 'icmp'
+        if not is_up and tcp_ports and await pacer.acquire_async(len(tcp_ports)):
+            is_up, rtt_ms, port = await tcp_ping(ip, tcp_ports, timeout=tcp_timeout)
+            probe = f'tcp:{port}'
+        if is_up:
+            record_probe_stats(received=1)
+        return await make_result(ip, is_up, rtt_ms, probe=probe)
 
-        for future in futures:
+    async def worker():
+        """Pull targets off the shared iterator until it is exhausted."""
+        for i in positions:
+            ip = targets[i]
             try:
-                result = future.result(timeout=ping_timeout + 2.0)
-                results.append(result)
-            except FutureTimeoutError:
-                ip = futures[future]
-                results.append({
-                    'ip': ip,
-                    'status': 'down',
-                    'rtt_ms': None,
-                    'mac': None,
-                    'hostname': None
-                })
+                results[i] = await scan_one(ip)
             except Exception:
-                ip = futures[future]
-                results.append({
+                results[i] = {
                     'ip': ip,
                     'status': 'down',
                     'rtt_ms': None,
                     'mac': None,
-                    'hostname': None
-                })
-
-    return results
+                    'hostname': None,
+                    'probe': None
+                }
+            if results[i] is not None:
+                await deliver(results[i])
+
+    def sweep_attached() -> list[tuple[str, bool, float | None, str | None]]:
+        replies = []
+        for arp, ips in arp_engines:
+            with arp:
+                replies.extend(arp.probe(ips, timeout=arp_timeout, count=ping_count))
+        return replies
+
+    async def arp_worker():
+        """Run the blocking ARP sweep off the loop, then deliver its results."""
+        for ip, is_up, rtt_ms, mac in await asyncio.to_thread(sweep_attached):
+            result = await make_result(ip, is_up, rtt_ms, mac, 'arp')
+            arp_results.append(result)
+            await deliver(result)
+
+    tcp_ports = tuple(tcp_ports)
+
+    # The number of workers is the in-flight window
+    workers = [worker() for _ in range(min(max(1, max_in_flight), len(targets)))]
+    if arp_engines:
+        workers.append(arp_worker())
+    try:
+        await asyncio.gather(*workers)
+    finally:
+        if icmp is not None:
+            icmp.close()
+    if spawn_errors:
+        logger.warning(f"{spawn_errors} targets not probed: ping could not be started")
 
+    return [r for r in results if r is not None] + arp_results
@@ -1,36 +1,56 @@
 """Background scan scheduler."""
+import sqlite3
 import threading
 import time
+from dataclasses import replace
 
-from pyngding.core.config import Config
+from pyngding.core.config import Config, ScanProfile, get_scan_profiles
 from pyngding.core.db import (
-    create_scan_run,
+    commit_scan_run,
     get_adguard_state,
     get_all_hosts,
-    get_ui_setting,
+    get_last_up_times,
+    get_scan_run_id_by_batch,
+    get_target_set_id,
     insert_dns_event,
-    insert_observation,
     set_adguard_state,
     update_dns_daily_rollup,
-    upsert_host,
 )
 from pyngding.core.logger import get_logger
+from pyngding.core.writer import configure_writer
+from pyngding.data.host_cache import get_host_cache
+from pyngding.data.maintenance import MaintenanceWorker
+from pyngding.data.vendor import get_vendor_lookup
 from pyngding.integrations.adguard import fetch_adguard_api, read_adguard_file
-from pyngding.scanning.scanner import parse_targets, scan_targets
+from pyngding.integrations.dispatcher import NotificationDispatcher
+from pyngding.integrations.notifications import enqueue_notification, get_enabled_channels
+from pyngding.scanning.adaptive import AdaptivePlanner
+from pyngding.scanning.pacing import InFlightLimiter, Pacer
+from pyngding.scanning.pipeline import ScanPipeline
+from pyngding.scanning.sharded import from_record
+from pyngding.scanning.sweep import Sweeper
+from pyngding.scanning.targets import ShuffledTargets, TargetSet, load_targets
+from pyngding.web.settings import Settings, get_settings
 
 logger = get_logger('scheduler')
 
 
 class ScanScheduler:
-    """Manages periodic scanning in a background thread."""
+    """Manages periodic scanning in background threads, one per scan profile."""
 
     def __init__(self, config: Config, db_path: str):
         self.config = config
         self.db_path = db_path
         self.running = False
-        self.thread: threading.Thread | None = None
         self.stop_event = threading.Event()
 
+        # One scan loop per profile, each with its own targets and schedule
+        self.profiles = [ProfileScanner(self, profile) for profile in get_scan_profiles(config)]
+
+        # Probes in flight across all profiles' sweeps: by default the sum of
+        # their budgets, so a profile never waits for another one's sweep
+        self.limiter = InFlightLimiter(config.max_in_flight_total or sum(p.budget for p in self.profiles))
+
         # AdGuard scheduler
         self.adguard_running = False
         self.adguard_thread: threading.Thread | None = None
@@ -39,28 +59,44 @@ class ScanScheduler:
         self.ipv6_running = False
         self.ipv6_thread: threading.Thread | None = None
 
-        # Retention tracking
-        self.last_retention_run = 0
-        self.retention_interval = 3600  # Run retention every hour
+        # Notification delivery, fed through the outbox by _notify_changes()
+        self.dispatcher = NotificationDispatcher(
+            db_path,
+            workers=config.notify_workers,
+            max_attempts=config.notify_max_attempts,
+            backoff_seconds=config.notify_backoff_seconds,
+            backoff_max_seconds=config.notify_backoff_max_seconds
+        )
+
+        # Host state and device profiles, shared with the admin routes that invalidate them
+        self.host_cache = get_host_cache(db_path)
+
+        # Target set IDs of run membership bitmaps, by target set
+        self.target_set_ids: dict[TargetSet, int] = {}
+
+        # Retention, rollups and checkpoints, on their own thread so scans never wait on them
+        self.maintenance = MaintenanceWorker(db_path, changes_only=config.observation_mode == 'changes')
+
+        # The one thread that writes to the database, committing jobs in groups
+        self.writer = configure_writer(db_path, config.db_commit_max_jobs, config.db_commit_max_ms)
 
     def start(self):
-        """Start the scan scheduler thread and AdGuard ingestion if enabled."""
+        """Start the profiles' scan threads and AdGuard ingestion if enabled."""
         if self.running:
             return
 
         self.running = True
         self.stop_event.clear()
-        self.thread = threading.Thread(target=self._run_loop, daemon=True)
-        self.thread.start()
-
-        # Start AdGuard ingestion if enabled
-        adguard_enabled = get_ui_setting(self.db_path, 'adguard_enabled', 'false').lower() == 'true'
-        if adguard_enabled:
+        for profile in self.profiles:
+            profile.start()
+        self.dispatcher.start()
+        self.maintenance.start()
+
+        # Start AdGuard ingestion and IPv6 collection if enabled
+        settings = get_settings(self.db_path)
+        if settings.adguard_enabled:
             self.start_adguard()
-
-        # Start IPv6 collection if enabled
-        ipv6_enabled = get_ui_setting(self.db_path, 'ipv6_passive_enabled', 'true').lower() == 'true'
-        if ipv6_enabled:
+        if settings.ipv6_passive_enabled:
             self.start_ipv6_collection()
 
     def start_adguard(self):
@@ -82,11 +118,13 @@ class ScanScheduler:
         self.ipv6_thread.start()
 
     def stop(self):
-        """Stop the scan scheduler thread and AdGuard ingestion."""
+        """Stop the scan threads and AdGuard ingestion."""
         self.running = False
         self.stop_event.set()
-        if self.thread:
-            self.thread.join(timeout=5.0)
+        for profile in self.profiles:
+            profile.join(timeout=5.0)
+        self.dispatcher.stop()
+        self.maintenance.stop()
 
         self.adguard_running = False
         if self.adguard_thread:
@@ -96,144 +134,119 @@ class ScanScheduler:
         if self.ipv6_thread:
             self.ipv6_thread.join(timeout=5.0)
 
-    def _run_loop(self):
-        """Main scan loop."""
-        while self.running and not self.stop_event.is_set():
-            try:
-                self._run_scan()
-            except Exception as e:
-                logger.error(f"Error in scan loop: {e}")
-
-            # Wait for next interval (or stop if event is set)
-            if not self.stop_event.wait(self.config.scan_interval_seconds):
-                continue
-            else:
-                break
-
-    def _run_scan(self):
-        """Run a single scan."""
-        started_ts = int(time.time())
-
-        # Run retention periodically
-        if (started_ts - self.last_retention_run) >= self.retention_interval:
-            try:
-                from pyngding.data.retention import run_retention, run_rollups
-                deleted = run_retention(self.db_path)
-                run_rollups(self.db_path)
-                if any(deleted.values()):
-                    logger.info(f"Retention: Deleted {deleted}")
-                self.last_retention_run = started_ts
-            except Exception as e:
-                logger.error(f"Error in retention: {e}")
-
-        # Parse targets
-        targets = parse_targets(self.config.scan_targets, self.config.target_cap)
-        if not targets:
-            return
-
-        # Get reverse_dns setting (default True)
-        reverse_dns = get_ui_setting(self.db_path, 'reverse_dns', 'true').lower() == 'true'
-
-        # Run scan
-        results = scan_targets(
-            targets=targets,
-            ping_timeout=self.config.ping_timeout_seconds,
-            ping_count=self.config.ping_count,
-            max_workers=self.config.max_workers,
-            reverse_dns=reverse_dns
-        )
-
-        finished_ts = int(time.time())
-
-        # Count up/down
-        up_count = sum(1 for r in results if r['status'] == 'up')
-        down_count = len(results) - up_count
-
-        # Create scan run
-        run_id = create_scan_run(
-            self.db_path,
-            started_ts=started_ts,
-            finished_ts=finished_ts,
-            targets_count=len(targets),
-            up_count=up_count,
-            down_count=down_count
-        )
-
-        # Get existing hosts for comparison
-        existing_hosts = {h['ip']: h for h in get_all_hosts(self.db_path)}
-
-        # Write observations and update hosts
-        for result in results:
-            ip = result['ip']
-            existing = existing_hosts.get(ip)
-
-            # Insert observation
-            insert_observation(
-                self.db_path,
-                run_id=run_id,
-                ip=ip,
-                status=result['status'],
-                rtt_ms=result.get('rtt_ms'),
-                mac=result.get('mac'),
-                hostname=result.get('hostname')
+        # Last, once nothing queues writes anymore
+        self.writer.stop()
+
+    def get_cycle_stats(self) -> dict:
+        """Get scan cycle timing counters by profile."""
+        return {profile.name: profile.get_cycle_stats() for profile in self.profiles}
+
+    def ingest_batch(self, batch: dict) -> dict:
+        """Persist a result batch pushed by a remote agent.
+
+        The batch is written through the same path as a local scan and its
+        run is tagged with the agent's site. A batch that was already
+        ingested (same batch_id, e.g. replayed after a lost response) is
+        acknowledged without being written again.
+
+        Returns {'run_id': int, 'duplicate': bool}.
+        """
+        run_id = get_scan_run_id_by_batch(self.db_path, batch['batch_id'])
+        if run_id is not None:
+            return {'run_id': run_id, 'duplicate': True}
+        try:
+            diff = self._commit_results(
+                batch['started_ts'],
+                batch['finished_ts'],
+                batch['targets_count'],
+                [from_record(record) for record in batch['results']],
+                site=batch['site'],
+                batch_id=batch['batch_id']
             )
-
-            # Check for changes
-            is_new = existing is None
-            is_gone = existing and existing['last_status'] == 'up' and result['status'] == 'down'
-            ip_mac_change = False
-            if existing and result.get('mac') and existing.get('mac'):
-                if result['mac'] != existing['mac']:
-                    ip_mac_change = True
-
-            # Get vendor from OUI lookup
-            vendor = None
-            if result.get('mac'):
-                from pyngding.data.vendor import get_vendor
-                vendor = get_vendor(result['mac'], self.db_path)
-
-            # Update host record
-            upsert_host(
+        except sqlite3.IntegrityError:
+            # Same batch pushed concurrently
+            return {'run_id': get_scan_run_id_by_batch(self.db_path, batch['batch_id']), 'duplicate': True}
+
+        logger.info(f"Ingested batch from site {batch['site']}: {diff['up_count']} up, {diff['down_count']} down")
+        return {'run_id': diff['run_id'], 'duplicate': False}
+
+    def _commit_results(self, started_ts: int, finished_ts: int, targets_count: int,
+                        results: list[dict], site: str | None = None,
+                        batch_id: str | None = None) -> dict:
+        """Persist a complete run (an agent batch) in one transaction and queue change notifications.
+
+        Local runs are written as they are scanned, by a ScanPipeline. In
+        change-only observation mode only results that differ from the last
+        observation of their IP are written.
+
+        Returns the diff from commit_scan_run().
+        """
+        settings = get_settings(self.db_path)
+
+        # Vendor from OUI lookup, resolved once per run
+        lookup = get_vendor_lookup(self.db_path, settings)
+        if lookup is not None:
+            for result in results:
+                if result.get('mac'):
+                    result['vendor'] = lookup.lookup(result['mac'])
+
+        # Local scans and agent ingests commit from different threads; the
+        # cache lock keeps each diff consistent with the state it replaces
+        with self.host_cache.lock:
+            observations = None
+            if self.config.observation_mode == 'changes':
+                observations = self.host_cache.changed_observations(results)
+            diff = commit_scan_run(
                 self.db_path,
-                ip=ip,
-                mac=result.get('mac'),
-                hostname=result.get('hostname'),
-                vendor=vendor,
-                status=result['status'],
-                rtt_ms=result.get('rtt_ms'),
-                now_ts=finished_ts
+                started_ts=started_ts,
+                finished_ts=finished_ts,
+                targets_count=targets_count,
+                results=results,
+                site=site,
+                batch_id=batch_id,
+                previous=self.host_cache.hosts,
+                observations=observations
             )
-
-            # Send notifications
-            from pyngding.core.db import get_device_profile
-            from pyngding.integrations.notifications import send_notification
-
-            profile = get_device_profile(self.db_path, mac=result.get('mac'), ip=ip)
+            self.host_cache.apply(results, observations)
+        try:
+            self._notify_changes(diff, settings)
+        except Exception as e:
+            logger.error(f"Error queueing change notifications: {e}")
+        return diff
+
+    def _get_target_set_id(self, target_set: TargetSet) -> int:
+        """Get the database ID of a target set, registering it on first use."""
+        target_set_id = self.target_set_ids.get(target_set)
+        if target_set_id is None:
+            target_set_id = get_target_set_id(self.db_path, target_set.spec, len(target_set))
+            self.target_set_ids[target_set] = target_set_id
+        return target_set_id
+
+    def _notify_changes(self, diff: dict, settings: Settings) -> None:
+        """Queue notifications for new, gone and MAC-changed hosts in the outbox."""
+        if not settings.notify_enabled or not get_enabled_channels(self.db_path, settings):
+            return  # Nothing would be queued: skip the profile lookups
+
+        events = [('new_host', result, None) for result in diff['new']]
+        events += [('host_gone', result, None) for result in diff['gone']]
+        events += [('ip_mac_change', result, {'old_mac': old_mac, 'new_mac': result['mac']})
+                   for result, old_mac in diff['mac_changed']]
+
+        queued = 0
+        for event_type, result, extra in events:
+            ip = result['ip']
+            profile = self.host_cache.get_profile(mac=result.get('mac'), ip=ip)
             label = profile['label'] if profile else None
             is_safe = bool(profile['is_safe']) if profile else False
             tags = profile['tags'] if profile else None
-
-            if is_new and result['status'] == 'up':
-                send_notification(
-                    self.db_path, 'new_host', ip,
-                    mac=result.get('mac'), hostname=result.get('hostname'),
-                    vendor=None, label=label, is_safe=is_safe, tags=tags
-                )
-            elif is_gone:
-                send_notification(
-                    self.db_path, 'host_gone', ip,
-                    mac=result.get('mac'), hostname=result.get('hostname'),
-                    vendor=None, label=label, is_safe=is_safe, tags=tags
-                )
-            elif ip_mac_change:
-                send_notification(
-                    self.db_path, 'ip_mac_change', ip,
-                    mac=result.get('mac'), hostname=result.get('hostname'),
-                    vendor=None, label=label, is_safe=is_safe, tags=tags,
-                    extra={'old_mac': existing.get('mac'), 'new_mac': result.get('mac')}
-                )
-
-        logger.info(f"Scan completed: {up_count} up, {down_count} down, {len(targets)} targets")
+            queued += len(enqueue_notification(
+                self.db_path, event_type, ip,
+                mac=result.get('mac'), hostname=result.get('hostname'),
+                vendor=None, label=label, is_safe=is_safe, tags=tags, extra=extra,
+                settings=settings
+            ))
+        if queued:
+            self.dispatcher.wake()
 
     def _adguard_loop(self):
         """AdGuard ingestion loop."""
@@ -243,8 +256,7 @@ class ScanScheduler:
             except Exception as e:
                 logger.error(f"Error in AdGuard ingestion: {e}")
 
-            # Get interval
-            interval = int(get_ui_setting(self.db_path, 'adguard_ingest_interval_seconds', '30'))
+            interval = get_settings(self.db_path).adguard_ingest_interval_seconds
             if not self.stop_event.wait(interval):
                 continue
             else:
@@ -253,19 +265,19 @@ class ScanScheduler:
     def _ingest_adguard(self):
         """Ingest DNS events from AdGuard."""
 
-        adguard_enabled = get_ui_setting(self.db_path, 'adguard_enabled', 'false').lower() == 'true'
-        if not adguard_enabled:
+        settings = get_settings(self.db_path)
+        if not settings.adguard_enabled:
             return
 
-        mode = get_ui_setting(self.db_path, 'adguard_mode', 'api')
-        max_fetch = int(get_ui_setting(self.db_path, 'adguard_max_fetch', '500'))
+        mode = settings.adguard_mode
+        max_fetch = settings.adguard_max_fetch
 
         events = []
 
         if mode == 'api':
-            base_url = get_ui_setting(self.db_path, 'adguard_base_url', '')
-            username = get_ui_setting(self.db_path, 'adguard_username', '') or None
-            password = get_ui_setting(self.db_path, 'adguard_password', '') or None
+            base_url = settings.adguard_base_url
+            username = settings.adguard_username or None
+            password = settings.adguard_password or None
 
             if not base_url:
                 return
@@ -279,7 +291,7 @@ class ScanScheduler:
                 set_adguard_state(self.db_path, last_seen_ts=latest_ts)
 
         elif mode == 'file':
-            file_path = get_ui_setting(self.db_path, 'adguard_querylog_path', '')
+            file_path = settings.adguard_querylog_path
             if not file_path:
                 return
 
@@ -333,6 +345,233 @@ class ScanScheduler:
                 break
 
 
+class ProfileScanner:
+    """Scan loop of one scan profile, on its own thread.
+
+    Holds the profile's scan path and per-host probe state; host state,
+    notifications and the in-flight limiter are shared through the scheduler.
+    """
+
+    def __init__(self, scheduler: ScanScheduler, profile: ScanProfile):
+        self.scheduler = scheduler
+        self.name = profile.name
+        self.db_path = scheduler.db_path
+        # The profile's settings in place of the [pyngding] ones
+        self.config = replace(
+            scheduler.config,
+            scan_targets=profile.scan_targets,
+            scan_interval_seconds=profile.scan_interval_seconds,
+            ping_timeout_seconds=profile.ping_timeout_seconds,
+            max_workers=profile.max_workers,
+            max_in_flight=profile.max_in_flight
+        )
+        self.thread: threading.Thread | None = None
+
+        # Probes the profile keeps in flight: the window of the async path
+        # and of the ICMP/ARP engines, else its ping threads
+        if self.config.async_scan or self.config.ping_engine in ('icmp', 'arp'):
+            self.budget = self.config.max_in_flight
+        else:
+            self.budget = self.config.max_workers
+
+        # Scan path (event loop, worker processes), used by the scan thread only
+        self.sweeper = Sweeper(self.config)
+
+        # Per-host probe state (adaptive_scan mode), created on first scan
+        self.planner: AdaptivePlanner | None = None
+
+        # Write path of the current (or last) scan run
+        self.pipeline: ScanPipeline | None = None
+
+        # Fixed-rate cycle timing, updated by the scan thread
+        self.cycle_stats = {
+            'cycles': 0,
+            'overruns': 0,
+            'skipped': 0,
+            'last_start_lag_seconds': 0.0,
+            'last_duration_seconds': 0.0,
+            'max_duration_seconds': 0.0
+        }
+
+    def start(self) -> None:
+        """Start the scan thread."""
+        self.thread = threading.Thread(target=self._run_loop, name=f'pyngding-scan-{self.name}', daemon=True)
+        self.thread.start()
+
+    def join(self, timeout: float | None = None) -> None:
+        """Wait for the scan thread to end (after the scheduler's stop_event is set)."""
+        if self.thread:
+            self.thread.join(timeout=timeout)
+
+    def _run_loop(self):
+        """Scan loop of the profile.
+
+        Cycles start at a fixed rate, every scan_interval_seconds on the
+        monotonic clock, however long each one takes. A cycle that runs past
+        its successor's slot is an overrun, handled per overrun_policy:
+        skip waits for the next slot after it (the missed ones are counted
+        as skipped), immediate starts the latest missed slot right away and
+        keeps the grid, stretch starts right away and moves the grid to it.
+        """
+        interval = self.config.scan_interval_seconds
+        slot = time.monotonic()
+        try:
+            while self.scheduler.running and not self.scheduler.stop_event.is_set():
+                # Wait for the slot (or stop if event is set)
+                delay = slot - time.monotonic()
+                if delay > 0 and self.scheduler.stop_event.wait(delay):
+                    break
+
+                started = time.monotonic()
+                lag = started - slot
+                try:
+                    self._run_scan(start_lag_ms=round(lag * 1000, 1), cycle_started=started)
+                except Exception as e:
+                    logger.error(f"Error in scan loop: {e}")
+                finished = time.monotonic()
+                slot = self._next_slot(slot, finished, interval)
+                self._record_cycle(lag, finished - started, interval)
+        finally:
+            self.sweeper.close()
+
+    def _next_slot(self, slot: float, finished: float, interval: float) -> float:
+        """Get the start of the cycle after the one scheduled at slot."""
+        missed = int((finished - slot) // interval)  # Slots that passed during the cycle
+        if missed < 1:
+            return slot + interval
+        policy = self.config.overrun_policy
+        if policy == 'stretch':
+            self.cycle_stats['skipped'] += missed - 1
+            return finished
+        if policy == 'immediate':
+            self.cycle_stats['skipped'] += missed - 1
+            return slot + missed * interval
+        self.cycle_stats['skipped'] += missed
+        return slot + (missed + 1) * interval
+
+    def _record_cycle(self, lag: float, duration: float, interval: float) -> None:
+        """Update cycle timing counters, warning about an overrun."""
+        stats = self.cycle_stats
+        stats['cycles'] += 1
+        stats['last_start_lag_seconds'] = round(lag, 3)
+        stats['last_duration_seconds'] = round(duration, 3)
+        stats['max_duration_seconds'] = round(max(stats['max_duration_seconds'], duration), 3)
+        if duration > interval:
+            stats['overruns'] += 1
+            logger.warning(f"Scan cycle of profile {self.name} took {duration:.1f}s, longer than scan_interval_seconds ({interval}s); "
+                           f"overrun_policy = {self.config.overrun_policy}")
+
+    def get_cycle_stats(self) -> dict:
+        """Get scan cycle timing counters."""
+        return {'interval_seconds': self.config.scan_interval_seconds,
+                'overrun_policy': self.config.overrun_policy, **self.cycle_stats}
+
+    def _run_scan(self, start_lag_ms: float | None = None, cycle_started: float | None = None):
+        """Run a single scan.
+
+        start_lag_ms (how late the cycle started against its slot) and
+        cycle_started (its time.monotonic() start) are recorded with the run.
+        """
+        started_ts = int(time.time())
+
+        # Parse targets (memoised while config.scan_targets is unchanged)
+        targets = all_targets = load_targets(self.config.scan_targets, self.config.target_cap)
+        if not targets:
+            return
+
+        # Adaptive mode: probe live hosts every cycle with RTT-derived
+        # deadlines, back off on addresses that have not been up recently
+        planner = self._get_planner() if self.config.adaptive_scan else None
+        timeouts = None
+        ping_count = self.config.ping_count
+        if planner is not None:
+            targets, timeouts = planner.plan(targets)
+            ping_count = 1  # Retries happen in a second pass, on first loss only
+            if not targets:
+                return
+
+        # Probe in a fresh random order each cycle, at no more than max_pps
+        if self.config.randomize_targets:
+            targets = ShuffledTargets(targets)
+        deadline = None
+        if self.config.max_pps:
+            # Probes that cannot be sent within one interval are dropped
+            deadline = time.monotonic() + self.config.scan_interval_seconds
+        pacer = Pacer(self.config.max_pps, deadline=deadline)
+
+        # One settings snapshot for the whole cycle
+        settings = get_settings(self.db_path)
+        reverse_dns = settings.reverse_dns
+
+        # Take the profile's budget (or what is left of it) from the in-flight
+        # limit shared with the other profiles
+        slots = self.scheduler.limiter.acquire(self.budget, self.scheduler.stop_event)
+        if not slots:
+            return
+
+        # Results are enriched, written and notified while the sweep runs
+        try:
+            pipeline = self.pipeline = ScanPipeline(
+                self.db_path,
+                self.scheduler.host_cache,
+                started_ts,
+                len(targets),
+                all_targets,
+                self.scheduler._get_target_set_id(all_targets),
+                changes_only=self.config.observation_mode == 'changes',
+                vendor_lookup=get_vendor_lookup(self.db_path, settings),
+                notify=lambda diff: self.scheduler._notify_changes(diff, settings),
+                start_lag_ms=start_lag_ms,
+                cycle_started=cycle_started,
+                profile=self.name
+            )
+        except Exception:
+            self.scheduler.limiter.release(slots)
+            raise
+
+        retries: list[str] = []
+        retry_set: set[str] = set()
+
+        def handle(result: dict) -> None:
+            if planner is not None:
+                is_up = result['status'] == 'up'
+                if planner.needs_retry(result['ip'], is_up) and result['ip'] not in retry_set:
+                    retries.append(result['ip'])
+                    return
+                planner.record(result['ip'], is_up, result.get('rtt_ms'))
+            pipeline.submit(result)
+
+        # Run scan, collecting results in completion order
+        try:
+            self.sweeper.sweep(targets, reverse_dns, handle, ping_count, pacer, timeouts, concurrency=slots)
+            if retries:
+                # Hosts that were up and just missed get one more chance
+                # with the full timeout before they are reported down
+                retry_set.update(retries)
+                self.sweeper.sweep(retries, reverse_dns, handle, self.config.ping_count, pacer, concurrency=slots)
+        finally:
+            self.scheduler.limiter.release(slots)
+            # Write the rest of whatever was collected and finish the run
+            summary = pipeline.close()
+
+        logger.info(f"Scan of profile {self.name} completed: {summary['up_count']} up, {summary['down_count']} down, {len(targets)} targets")
+
+    def _get_planner(self) -> AdaptivePlanner:
+        """Get the adaptive planner, seeding it from scan history on first use."""
+        if self.planner is None:
+            self.planner = AdaptivePlanner(
+                base_timeout=self.config.ping_timeout_seconds,
+                min_timeout=self.config.adaptive_min_timeout_seconds,
+                recent_seconds=self.config.adaptive_recent_seconds,
+                stale_every=self.config.adaptive_stale_every,
+                unseen_every=self.config.adaptive_unseen_every
+            )
+            up_hosts = {h['ip']: h['last_rtt_ms'] for h in get_all_hosts(self.db_path, status='up')}
+            last_up = get_last_up_times(self.db_path, changes_only=self.config.observation_mode == 'changes')
+            self.planner.seed(last_up, up_hosts)
+        return self.planner
+
+
 def get_scan_stats(db_path: str) -> dict:
     """Get basic dashboard statistics."""
     from pyngding.core.db import get_db
@@ -366,10 +605,7 @@ def get_scan_stats(db_path: str) -> dict:
         if last_run:
             stats['last_scan_ts'] = last_run[0]
 
-        # Get missing threshold (default 10 minutes)
-        missing_threshold_minutes = int(
-            get_ui_setting(db_path, 'missing_threshold_minutes', '10')
-        )
+        missing_threshold_minutes = get_settings(db_path).missing_threshold_minutes
         missing_threshold_ts = int(time.time()) - (missing_threshold_minutes * 60)
 
         # Count missing hosts (previously seen but not seen recently)
@@ -0,0 +1,182 @@
+"""Multi-process sharded scanning.
+
+A pool of worker processes each scan an interleaved shard of the targets
+with their own probe engine, so probing, reply parsing and result building
+scale with cores instead of sharing one GIL. Workers are started once and
+reused across cycles, which keeps their PTR cache and sockets warm. Results
+are streamed back over a pipe in small batches of compact tuples and
+merged by the parent in completion order.
+"""
+import multiprocessing
+import time
+from collections.abc import Iterator, Sequence
+from multiprocessing.connection import Connection, wait
+
+from pyngding.core.logger import get_logger
+from pyngding.scanning.pacing import Pacer, get_probe_stats, record_probe_stats
+from pyngding.scanning.targets import ShuffledTargets, StridedTargets, TargetSet
+
+logger = get_logger('sharded')
+
+# Field order of the compact result records sent over the pipe and in agent batches
+RECORD_FIELDS = ('ip', 'status', 'rtt_ms', 'mac', 'hostname', 'probe')
+
+_BATCH_SIZE = 256  # records per pipe message
+_BATCH_DELAY = 0.05  # seconds before a partial batch is sent anyway
+
+
+def to_record(result: dict) -> tuple:
+    """Pack a result dict into a compact record (up is a bool)."""
+    return (result['ip'], result['status'] == 'up', result['rtt_ms'], result['mac'],
+            result['hostname'], result['probe'])
+
+
+def from_record(record: Sequence) -> dict:
+    """Unpack a compact record into a result dict."""
+    ip, is_up, rtt_ms, mac, hostname, probe = record
+    return {
+        'ip': ip,
+        'status': 'up' if is_up else 'down',
+        'rtt_ms': rtt_ms,
+        'mac': mac,
+        'hostname': hostname,
+        'probe': probe
+    }
+
+
+def shard_targets(targets: Sequence[str], index: int, shards: int) -> Sequence[str]:
+    """Get the targets of one shard, in the form sent to its worker.
+
+    A TargetSet, shuffled or not, pickles as its intervals, so its shard is
+    sent as that plus index and stride. Any other sequence (e.g. the
+    adaptive planner's list) is sent as just the shard's own addresses, so
+    what is pickled does not grow with the number of shards.
+    """
+    shard = StridedTargets(targets, index, shards)
+    base = targets.targets if isinstance(targets, ShuffledTargets) else targets
+    return shard if isinstance(base, TargetSet) else list(shard)
+
+
+def _worker_main(conn: Connection) -> None:
+    """Worker process: run scan jobs from the pipe until told to stop.
+
+    Jobs are ('scan', scan_id, targets, rate_pps, deadline, kwargs). Replies
+    are ('results', scan_id, [record, ...]), then ('done', scan_id,
+    probe_stats) or ('error', scan_id, message).
+    """
+    from pyngding.scanning.scanner import iter_scan_targets
+
+    while True:
+        try:
+            job = conn.recv()
+        except (EOFError, OSError):
+            return
+        if job[0] != 'scan':
+            return
+        _, scan_id, targets, rate_pps, deadline, kwargs = job
+
+        before = get_probe_stats()
+        try:
+            batch = []
+            sent_at = time.monotonic()
+            pacer = Pacer(rate_pps, deadline=deadline)
+            for result in iter_scan_targets(targets, pacer=pacer, **kwargs):
+                batch.append(to_record(result))
+                if len(batch) >= _BATCH_SIZE or time.monotonic() - sent_at >= _BATCH_DELAY:
+                    conn.send(('results', scan_id, batch))
+                    batch = []
+                    sent_at = time.monotonic()
+            if batch:
+                conn.send(('results', scan_id, batch))
+            after = get_probe_stats()
+            conn.send(('done', scan_id, {k: after[k] - before[k] for k in after}))
+        except (BrokenPipeError, EOFError):
+            return
+        except Exception as e:
+            try:
+                conn.send(('error', scan_id, str(e)))
+            except OSError:
+                return
+
+
+class ShardedScanner:
+    """Pool of scan worker processes, each probing one shard of a sweep."""
+
+    def __init__(self, processes: int):
+        self.processes = max(1, processes)
+        # spawn, not fork: the parent runs web server and scheduler threads
+        self._ctx = multiprocessing.get_context('spawn')
+        self._workers: list[tuple[multiprocessing.process.BaseProcess, Connection]] = []
+        self._scan_id = 0
+
+    def _ensure_workers(self) -> None:
+        """(Re)start workers that are not running."""
+        for i in range(self.processes):
+            if i < len(self._workers) and self._workers[i][0].is_alive():
+                continue
+            parent_conn, child_conn = self._ctx.Pipe()
+            process = self._ctx.Process(target=_worker_main, args=(child_conn,),
+                                        name=f'pyngding-scan-{i}', daemon=True)
+            process.start()
+            child_conn.close()
+            if i < len(self._workers):
+                self._workers[i][1].close()
+                self._workers[i] = (process, parent_conn)
+            else:
+                self._workers.append((process, parent_conn))
+
+    def scan(self, targets: Sequence[str], pacer: Pacer | None = None, **kwargs) -> Iterator[dict]:
+        """Scan targets across the worker pool, yielding results as they arrive.
+
+        kwargs are passed to iter_scan_targets() in each worker. The pacer's
+        rate is split evenly across workers and its deadline is shared
+        (time.monotonic() is system-wide).
+        """
+        self._ensure_workers()
+        self._scan_id += 1
+        scan_id = self._scan_id
+        shards = len(self._workers)
+        rate_pps = -(-pacer.rate // shards) if pacer is not None and pacer.rate else 0
+        deadline = pacer.deadline if pacer is not None else None
+
+        active = {}
+        for index, (process, conn) in enumerate(self._workers):
+            shard = shard_targets(targets, index, shards)
+            if not len(shard):
+                continue
+            conn.send(('scan', scan_id, shard, rate_pps, deadline, kwargs))
+            active[conn] = process
+
+        while active:
+            for conn in wait(list(active)):
+                try:
+                    kind, msg_scan_id, payload = conn.recv()
+                except (EOFError, OSError):
+                    logger.error(f"Scan worker {active[conn].name} exited unexpectedly")
+                    del active[conn]
+                    continue
+                if msg_scan_id != scan_id:
+                    continue  # Leftover from an abandoned scan
+                if kind == 'results':
+                    for record in payload:
+                        yield from_record(record)
+                elif kind == 'done':
+                    record_probe_stats(**payload)
+                    del active[conn]
+                else:
+                    logger.error(f"Scan worker {active[conn].name} failed: {payload}")
+                    del active[conn]
+
+    def close(self) -> None:
+        """Stop all worker processes."""
+        for process, conn in self._workers:
+            try:
+                conn.send(('stop',))
+            except OSError:
+                pass
+        for process, conn in self._workers:
+            process.join(timeout=2.0)
+            if process.is_alive():
+                process.terminate()
+            conn.close()
+        self._workers = []
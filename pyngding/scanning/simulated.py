@@ -0,0 +1,136 @@
+"""Simulated probe engine for benchmarks and load tests.
+
+Generates probe results from a seeded model instead of sending packets, so
+the scheduler, the database write path and the web views can be exercised
+at 16k-65k hosts on a machine with no network. Every draw is a hash of
+(seed, address, cycle, ...), so the same seed gives the same network cycle
+for cycle, in any process and in any probe order, without keeping per-host
+state.
+
+Model, per address:
+- present with probability up_ratio; a `churn` fraction of addresses
+  re-draws presence each cycle (hosts joining and leaving)
+- RTT log-normal with median rtt_ms and shape rtt_sigma
+- each echo request lost with probability loss_rate
+- a locally administered MAC, re-drawn by a `mac_churn` fraction of
+  addresses each cycle (MAC randomisation, NIC swaps)
+"""
+import ipaddress
+import math
+from collections.abc import Iterable, Iterator
+
+from pyngding.scanning.pacing import Pacer
+
+_MASK64 = (1 << 64) - 1
+
+# Independent random streams
+_STREAM_PRESENCE = 1
+_STREAM_PHASE = 2
+_STREAM_RTT = 3
+_STREAM_LOSS = 4
+_STREAM_MAC = 5
+_STREAM_MAC_PHASE = 6
+
+
+def _mix(x: int) -> int:
+    """splitmix64 finaliser."""
+    x = (x + 0x9E3779B97F4A7C15) & _MASK64
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & _MASK64
+    return x ^ (x >> 31)
+
+
+def _hash(*keys: int) -> int:
+    h = 0
+    for key in keys:
+        h = _mix(h ^ (key & _MASK64))
+    return h
+
+
+def _uniform(*keys: int) -> float:
+    """Deterministic uniform draw in [0, 1) for the given keys."""
+    return (_hash(*keys) >> 11) * (1.0 / (1 << 53))
+
+
+class SimulatedNetwork:
+    """Seeded model of a network, probed in place of a real engine.
+
+    `cycle` selects the state of the network; the sweeper advances it once
+    per sweep. Instances are small and picklable, so sharded workers
+    receive a copy with each scan job.
+    """
+
+    def __init__(self, seed: int = 0, up_ratio: float = 0.3, rtt_ms: float = 2.0,
+                 rtt_sigma: float = 0.5, loss_rate: float = 0.01, mac_churn: float = 0.0,
+                 churn: float = 0.001):
+        self.seed = seed
+        self.up_ratio = up_ratio
+        self.rtt_ms = rtt_ms
+        self.rtt_sigma = rtt_sigma
+        self.loss_rate = loss_rate
+        self.mac_churn = mac_churn
+        self.churn = churn
+        self.cycle = 0
+
+    def advance(self) -> None:
+        """Move the network on by one cycle."""
+        self.cycle += 1
+
+    @staticmethod
+    def _epoch(rate: float, *keys: int, cycle: int) -> int:
+        """Epoch of a value re-drawn by a `rate` fraction of addresses per cycle.
+
+        Each address re-draws every 1/rate cycles, at its own phase, so an
+        even `rate` slice of all addresses changes in every cycle.
+        """
+        if rate <= 0:
+            return 0
+        period = max(1, round(1 / rate))
+        phase = int(_uniform(*keys) * period)
+        return (cycle + phase) // period
+
+    def host(self, ip: str) -> tuple[bool, str | None]:
+        """Get (present, mac) of ip in the current cycle."""
+        value = int(ipaddress.IPv4Address(ip))
+        epoch = self._epoch(self.churn, self.seed, value, _STREAM_PHASE, cycle=self.cycle)
+        if _uniform(self.seed, value, _STREAM_PRESENCE, epoch) >= self.up_ratio:
+            return False, None
+        mac_epoch = self._epoch(self.mac_churn, self.seed, value, _STREAM_MAC_PHASE, cycle=self.cycle)
+        mac_bits = _hash(self.seed, value, _STREAM_MAC, mac_epoch)
+        octets = [0x02] + [(mac_bits >> shift) & 0xFF for shift in (32, 24, 16, 8, 0)]
+        return True, ':'.join(f'{octet:02x}' for octet in octets)
+
+    def ping(self, ip: str, timeout: float = 1.0, count: int = 1) -> tuple[bool, float | None, str | None]:
+        """Probe ip with `count` echo requests. Returns (is_up, rtt_ms, mac)."""
+        present, mac = self.host(ip)
+        if not present:
+            return False, None, None
+        value = int(ipaddress.IPv4Address(ip))
+        for attempt in range(max(1, count)):
+            if _uniform(self.seed, value, _STREAM_LOSS, self.cycle, attempt) < self.loss_rate:
+                continue
+            # Box-Muller standard normal from two uniform draws
+            u1 = 1.0 - _uniform(self.seed, value, _STREAM_RTT, self.cycle, attempt, 0)
+            u2 = _uniform(self.seed, value, _STREAM_RTT, self.cycle, attempt, 1)
+            z = math.sqrt(-2.0 * math.log(u1)) * math.cos(2.0 * math.pi * u2)
+            rtt_ms = self.rtt_ms * math.exp(self.rtt_sigma * z)
+            if rtt_ms <= timeout * 1000.0:
+                return True, round(rtt_ms, 3), mac
+        return False, None, None
+
+    def probe(self, targets: Iterable[str], timeout: float = 1.0, count: int = 1,
+              timeouts: dict[str, float] | None = None,
+              pacer: Pacer | None = None) -> Iterator[tuple[str, bool, float | None, str | None]]:
+        """Probe targets and yield (ip, is_up, rtt_ms, mac) in target order.
+
+        Results are produced as fast as they are consumed; a pacer with a
+        rate limits them like real probes and drops those past its deadline.
+        """
+        if pacer is None:
+            pacer = Pacer()
+        for ip in targets:
+            if not pacer.acquire(count):
+                continue
+            ip_timeout = timeouts.get(ip, timeout) if timeouts else timeout
+            is_up, rtt_ms, mac = self.ping(ip, ip_timeout, count)
+            yield ip, is_up, rtt_ms, mac
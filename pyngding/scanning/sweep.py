@@ -0,0 +1,128 @@
+"""Run one sweep with the configured scan path.
+
+Shared by the scan scheduler and remote agents, so both probe the same way.
+"""
+import asyncio
+from collections.abc import Callable, Sequence
+
+from pyngding.core.config import Config
+from pyngding.scanning.pacing import Pacer
+from pyngding.scanning.scanner import iter_scan_targets, scan_targets_async
+from pyngding.scanning.sharded import ShardedScanner
+from pyngding.scanning.simulated import SimulatedNetwork
+from pyngding.scanning.tcp import parse_ports
+
+
+class Sweeper:
+    """Dispatch sweeps to the threaded, asyncio or sharded scan path.
+
+    Keeps the resources that are reused across cycles: the event loop of
+    the asyncio path (async_scan) and the worker processes of the sharded
+    path (scan_processes > 1). Not thread-safe; call close() when done.
+    """
+
+    def __init__(self, config: Config):
+        self.config = config
+        self.loop: asyncio.AbstractEventLoop | None = None
+        self.sharded: ShardedScanner | None = None
+
+        # Network model of the simulated engine, advanced once per sweep
+        self.simulation: SimulatedNetwork | None = None
+        if config.ping_engine == 'simulated':
+            self.simulation = SimulatedNetwork(
+                seed=config.sim_seed,
+                up_ratio=config.sim_up_ratio,
+                rtt_ms=config.sim_rtt_ms,
+                rtt_sigma=config.sim_rtt_sigma,
+                loss_rate=config.sim_loss_rate,
+                mac_churn=config.sim_mac_churn,
+                churn=config.sim_churn
+            )
+
+    def sweep(self, targets: Sequence[str], reverse_dns: bool, on_result: Callable[[dict], None],
+              ping_count: int, pacer: Pacer, timeouts: dict[str, float] | None = None,
+              concurrency: int | None = None) -> None:
+        """Probe targets, calling on_result for each result in completion order.
+
+        concurrency caps the probes in flight, e.g. at what an InFlightLimiter
+        granted: the async path's window, the ICMP engine's and TCP
+        fallback's windows, and ping threads (never more than max_workers).
+        With scan_processes it is split across the worker processes.
+        """
+        config = self.config
+        max_workers = min(concurrency, config.max_workers) if concurrency else config.max_workers
+        max_in_flight = concurrency or config.max_in_flight
+        tcp_ports = parse_ports(config.tcp_fallback_ports) if config.tcp_fallback else ()
+        if self.simulation is not None:
+            self.simulation.advance()
+        if config.scan_processes > 1:
+            # Each worker process scans a shard with the synchronous path
+            if self.sharded is None:
+                self.sharded = ShardedScanner(config.scan_processes)
+            if concurrency:
+                max_workers = max(1, max_workers // config.scan_processes)
+                max_in_flight = max(1, max_in_flight // config.scan_processes)
+            for result in self.sharded.scan(
+                targets,
+                pacer=pacer,
+                ping_timeout=config.ping_timeout_seconds,
+                ping_count=ping_count,
+                max_workers=max_workers,
+                max_in_flight=max_in_flight,
+                reverse_dns=reverse_dns,
+                engine=config.ping_engine,
+                arp_rate_pps=max(1, config.arp_rate_pps // config.scan_processes),
+                arp_timeout=config.arp_timeout_seconds,
+                timeouts=timeouts,
+                tcp_ports=tcp_ports,
+                tcp_timeout=config.tcp_fallback_timeout_seconds,
+                simulation=self.simulation
+            ):
+                on_result(result)
+        elif config.async_scan:
+            # One persistent loop for the lifetime of the sweeper
+            if self.loop is None:
+                self.loop = asyncio.new_event_loop()
+            self.loop.run_until_complete(scan_targets_async(
+                targets=targets,
+                ping_timeout=config.ping_timeout_seconds,
+                ping_count=ping_count,
+                max_in_flight=max_in_flight,
+                reverse_dns=reverse_dns,
+                engine=config.ping_engine,
+                on_result=on_result,
+                arp_rate_pps=config.arp_rate_pps,
+                arp_timeout=config.arp_timeout_seconds,
+                timeouts=timeouts,
+                pacer=pacer,
+                tcp_ports=tcp_ports,
+                tcp_timeout=config.tcp_fallback_timeout_seconds,
+                simulation=self.simulation
+            ))
+        else:
+            for result in iter_scan_targets(
+                targets=targets,
+                ping_timeout=config.ping_timeout_seconds,
+                ping_count=ping_count,
+                max_workers=max_workers,
+                max_in_flight=max_in_flight,
+                reverse_dns=reverse_dns,
+                engine=config.ping_engine,
+                arp_rate_pps=config.arp_rate_pps,
+                arp_timeout=config.arp_timeout_seconds,
+                timeouts=timeouts,
+                pacer=pacer,
+                tcp_ports=tcp_ports,
+                tcp_timeout=config.tcp_fallback_timeout_seconds,
+                simulation=self.simulation
+            ):
+                on_result(result)
+
+    def close(self) -> None:
+        """Close the event loop and stop the worker processes."""
+        if self.loop is not None:
+            self.loop.close()
+            self.loop = None
+        if self.sharded is not None:
+            self.sharded.close()
+            self.sharded = None
@@ -0,0 +1,325 @@
+"""Scan target sets stored as sorted IPv4 integer intervals."""
+import ipaddress
+import math
+import random
+import zlib
+from bisect import bisect_right
+from collections.abc import Iterable, Iterator, Sequence
+from functools import lru_cache
+
+from pyngding.core.logger import get_logger
+
+logger = get_logger('targets')
+
+# Stored bitmap encodings (first byte of pack_bitmap() output)
+_BITMAP_RAW = 0
+_BITMAP_ZLIB = 1
+
+
+def _parse_part(part: str, hosts_only: bool = True) -> tuple[int, int] | None:
+    """Parse one target expression into an inclusive (start, end) interval.
+
+    With hosts_only, a CIDR block leaves out its network and broadcast
+    addresses (except /31 and /32); exclusions pass False to cover the
+    whole block.
+
+    Returns None (and logs) for anything that is not a valid IPv4 target.
+    """
+    try:
+        # CIDR notation
+        if '/' in part:
+            network = ipaddress.ip_network(part, strict=False)
+            if network.version != 4:
+                raise ValueError("only IPv4 networks are supported")
+            start = int(network.network_address)
+            end = int(network.broadcast_address)
+            if hosts_only and network.prefixlen < 31:
+                start, end = start + 1, end - 1
+            return start, end
+
+        # Range notation: a.b.c.d-w.x.y.z
+        if '-' in part:
+            start_str, end_str = part.split('-', 1)
+            start_ip = ipaddress.ip_address(start_str.strip())
+            end_ip = ipaddress.ip_address(end_str.strip())
+            if start_ip.version != 4 or end_ip.version != 4:
+                raise ValueError("only IPv4 ranges are supported")
+            if int(end_ip) < int(start_ip):
+                raise ValueError("range end is before range start")
+            return int(start_ip), int(end_ip)
+
+        # Single IP
+        ip = ipaddress.ip_address(part)
+        if ip.version != 4:
+            raise ValueError("only IPv4 addresses are supported")
+        return int(ip), int(ip)
+    except ValueError as e:
+        logger.warning(f"Ignoring scan target '{part}': {e}")
+        return None
+
+
+def merge_intervals(intervals: Iterable[tuple[int, int]]) -> list[tuple[int, int]]:
+    """Sort and merge overlapping or adjacent inclusive intervals."""
+    merged: list[tuple[int, int]] = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1] + 1:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def subtract_intervals(include: list[tuple[int, int]],
+                       exclude: list[tuple[int, int]]) -> list[tuple[int, int]]:
+    """Remove merged `exclude` intervals from merged `include` intervals."""
+    result = []
+    i = 0
+    for start, end in include:
+        # Skip exclusions entirely below this interval
+        while i < len(exclude) and exclude[i][1] < start:
+            i += 1
+        j = i
+        while j < len(exclude) and exclude[j][0] <= end:
+            ex_start, ex_end = exclude[j]
+            if ex_start > start:
+                result.append((start, ex_start - 1))
+            start = max(start, ex_end + 1)
+            if start > end:
+                break
+            j += 1
+        if start <= end:
+            result.append((start, end))
+    return result
+
+
+class TargetSet:
+    """Immutable set of IPv4 scan targets in numeric order.
+
+    Addresses are stored as merged inclusive integer intervals, so a /16
+    costs a single tuple rather than 65k strings. Iteration yields address
+    strings lazily; len(), `in`, indexing and index() are O(log intervals).
+    """
+
+    def __init__(self, intervals: Iterable[tuple[int, int]] = ()):
+        self.intervals = merge_intervals(intervals)
+        # offsets[i] is the position of intervals[i][0] in the full sequence
+        self._offsets = []
+        total = 0
+        for start, end in self.intervals:
+            self._offsets.append(total)
+            total += end - start + 1
+        self._len = total
+
+    @classmethod
+    def parse(cls, targets_str: str) -> 'TargetSet':
+        """Parse a comma-separated target string.
+
+        Supports:
+        - CIDR notation: 192.168.1.0/24
+        - Ranges: 192.168.1.1-192.168.1.50
+        - Single IPs: 192.168.1.10
+        - Exclusions of any of the above, prefixed with '!': !192.168.1.1
+        """
+        include = []
+        exclude = []
+        for part in (p.strip() for p in targets_str.split(',')):
+            if not part:
+                continue
+            negate = part.startswith('!')
+            interval = _parse_part(part[1:].strip(), hosts_only=False) if negate else _parse_part(part)
+            if interval is not None:
+                (exclude if negate else include).append(interval)
+        return cls(subtract_intervals(merge_intervals(include), merge_intervals(exclude)))
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __iter__(self) -> Iterator[str]:
+        for start, end in self.intervals:
+            for value in range(start, end + 1):
+                yield str(ipaddress.IPv4Address(value))
+
+    def __contains__(self, ip: object) -> bool:
+        try:
+            value = int(ipaddress.IPv4Address(ip))
+        except ValueError:
+            return False
+        i = bisect_right(self.intervals, (value, float('inf'))) - 1
+        return i >= 0 and self.intervals[i][0] <= value <= self.intervals[i][1]
+
+    def __getitem__(self, position: int) -> str:
+        if position < 0:
+            position += self._len
+        if not 0 <= position < self._len:
+            raise IndexError("target index out of range")
+        i = bisect_right(self._offsets, position) - 1
+        return str(ipaddress.IPv4Address(self.intervals[i][0] + position - self._offsets[i]))
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, TargetSet) and self.intervals == other.intervals
+
+    def __hash__(self) -> int:
+        return hash(tuple(self.intervals))
+
+    def __repr__(self) -> str:
+        return f"TargetSet({len(self)} addresses in {len(self.intervals)} intervals)"
+
+    def index(self, ip: str) -> int:
+        """Get the position of ip in iteration order. Raises ValueError if absent."""
+        value = int(ipaddress.IPv4Address(ip))
+        i = bisect_right(self.intervals, (value, float('inf'))) - 1
+        if i < 0 or value > self.intervals[i][1]:
+            raise ValueError(f"{ip} is not in the target set")
+        return self._offsets[i] + value - self.intervals[i][0]
+
+    @property
+    def spec(self) -> str:
+        """Compact string form of the intervals ("start-end,..." as integers)."""
+        return ','.join(f'{start}-{end}' for start, end in self.intervals)
+
+    @classmethod
+    def from_spec(cls, spec: str) -> 'TargetSet':
+        """Rebuild a TargetSet from its spec string."""
+        intervals = []
+        for part in spec.split(','):
+            if part:
+                start, end = part.split('-', 1)
+                intervals.append((int(start), int(end)))
+        return cls(intervals)
+
+    def bitmap(self, ips: Iterable[str]) -> bytes:
+        """Bitmap with bit index(ip) set for each ip (LSB first); others are ignored."""
+        bits = bytearray((self._len + 7) // 8)
+        for ip in ips:
+            try:
+                position = self.index(ip)
+            except ValueError:
+                continue
+            bits[position >> 3] |= 1 << (position & 7)
+        return bytes(bits)
+
+    def in_bitmap(self, bitmap: bytes, ip: str) -> bool:
+        """True if ip's bit is set in a bitmap from bitmap()."""
+        try:
+            position = self.index(ip)
+        except ValueError:
+            return False
+        return position >> 3 < len(bitmap) and bool(bitmap[position >> 3] >> (position & 7) & 1)
+
+    def members(self, bitmap: bytes) -> Iterator[str]:
+        """Yield the addresses whose bit is set in a bitmap from bitmap(), in order."""
+        for byte_index, byte in enumerate(bitmap):
+            if not byte:
+                continue
+            for bit in range(8):
+                position = (byte_index << 3) | bit
+                if byte >> bit & 1 and position < self._len:
+                    yield self[position]
+
+    def truncate(self, cap: int) -> 'TargetSet':
+        """Get the first `cap` addresses as a new TargetSet."""
+        if cap >= self._len:
+            return self
+        intervals = []
+        remaining = max(0, cap)
+        for start, end in self.intervals:
+            if remaining <= 0:
+                break
+            end = min(end, start + remaining - 1)
+            intervals.append((start, end))
+            remaining -= end - start + 1
+        return TargetSet(intervals)
+
+
+class ShuffledTargets(Sequence):
+    """Lazy pseudo-random permutation of a target sequence.
+
+    Position i maps to targets[(a * i + b) mod n] with a coprime to n, so
+    every target appears exactly once without materialising a shuffled
+    copy. Consecutive probes land `a` addresses apart, spreading a sweep
+    across the scope instead of walking it subnet by subnet.
+    """
+
+    def __init__(self, targets: Sequence[str], rng: random.Random | None = None):
+        self.targets = targets
+        self._n = len(targets)
+        rng = rng or random.Random()
+        self._a, self._b = 1, 0
+        if self._n > 2:
+            a = rng.randrange(1, self._n)
+            while math.gcd(a, self._n) != 1:
+                a = rng.randrange(1, self._n)
+            self._a, self._b = a, rng.randrange(self._n)
+
+    def __len__(self) -> int:
+        return self._n
+
+    def __getitem__(self, position: int) -> str:
+        if position < 0:
+            position += self._n
+        if not 0 <= position < self._n:
+            raise IndexError("target index out of range")
+        return self.targets[(self._a * position + self._b) % self._n]
+
+
+class StridedTargets(Sequence):
+    """Every `step`-th target starting at `start`: a lazy targets[start::step].
+
+    Used to split one sweep into interleaved shards that each cover the
+    whole scope, so no shard ends up with all the live hosts.
+    """
+
+    def __init__(self, targets: Sequence[str], start: int, step: int):
+        self.targets = targets
+        self.start = start
+        self.step = max(1, step)
+        self._n = max(0, (len(targets) - start + self.step - 1) // self.step)
+
+    def __len__(self) -> int:
+        return self._n
+
+    def __getitem__(self, position: int) -> str:
+        if position < 0:
+            position += self._n
+        if not 0 <= position < self._n:
+            raise IndexError("target index out of range")
+        return self.targets[self.start + position * self.step]
+
+
+@lru_cache(maxsize=16)
+def load_targets(targets_str: str, target_cap: int = 4096) -> TargetSet:
+    """Parse and cap a target string, memoised per (targets_str, target_cap).
+
+    The scheduler calls this every cycle; as long as the configured targets
+    do not change the same TargetSet is returned without re-parsing.
+    """
+    targets = TargetSet.parse(targets_str)
+    if len(targets) > target_cap:
+        logger.warning(f"Scan targets capped at {target_cap} of {len(targets)} addresses (target_cap)")
+    return targets.truncate(target_cap)
+
+
+def pack_bitmap(bitmap: bytes) -> bytes:
+    """Encode a bitmap for storage, zlib-compressed when that is smaller."""
+    compressed = zlib.compress(bitmap, 6)
+    if len(compressed) < len(bitmap):
+        return bytes((_BITMAP_ZLIB,)) + compressed
+    return bytes((_BITMAP_RAW,)) + bitmap
+
+
+def unpack_bitmap(data: bytes) -> bytes:
+    """Decode a bitmap from pack_bitmap()."""
+    if data[:1] == bytes((_BITMAP_ZLIB,)):
+        return zlib.decompress(data[1:])
+    return bytes(data[1:])
+
+
+def packed_bit(data: bytes, position: int) -> bool:
+    """Test bit `position` of a bitmap from pack_bitmap() without decoding all of it."""
+    byte = position >> 3
+    if data[:1] == bytes((_BITMAP_ZLIB,)):
+        chunk = zlib.decompressobj().decompress(data[1:], byte + 1)
+    else:
+        chunk = data[1:byte + 2]
+    return byte < len(chunk) and bool(chunk[byte] >> (position & 7) & 1)
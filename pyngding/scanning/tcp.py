@@ -0,0 +1,268 @@
+"""TCP connect fallback probe for hosts that filter ICMP.
+
+A host that drops echo requests usually still answers a TCP SYN, either
+with SYN-ACK (port open) or RST (port closed); both prove it is up. Probes
+are non-blocking connect() calls multiplexed on one selector, so thousands
+of half-open attempts can be in flight from a single thread. Sockets are
+closed with SO_LINGER 0, which aborts established connections with a RST
+instead of leaving them in TIME_WAIT.
+"""
+import asyncio
+import errno
+import heapq
+import resource
+import selectors
+import socket
+import struct
+import time
+from collections import deque
+from collections.abc import Iterable, Iterator
+
+from pyngding.core.logger import get_logger
+from pyngding.scanning.pacing import Pacer
+
+logger = get_logger('tcp')
+
+DEFAULT_PORTS = (22, 80, 443, 445, 62078)
+
+_LINGER_ABORT = struct.pack('ii', 1, 0)
+_FD_HEADROOM = 128  # descriptors left for the DB, web server, etc.
+_FD_EXHAUSTED = (errno.EMFILE, errno.ENFILE)
+
+
+def parse_ports(ports_str: str) -> tuple[int, ...]:
+    """Parse a comma-separated port list, ignoring invalid entries."""
+    ports = []
+    for part in ports_str.split(','):
+        part = part.strip()
+        if part.isdigit() and 0 < int(part) < 65536 and int(part) not in ports:
+            ports.append(int(part))
+    return tuple(ports)
+
+
+def _open_connect(ip: str, port: int) -> tuple[socket.socket | None, int]:
+    """Start a non-blocking connect. Returns (socket or None, errno)."""
+    try:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    except OSError as e:
+        # Out of descriptors (EMFILE, ENFILE) or buffers
+        return None, e.errno
+    sock.setblocking(False)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, _LINGER_ABORT)
+    err = sock.connect_ex((ip, port))
+    if err == errno.EINPROGRESS:
+        return sock, err
+    sock.close()
+    return None, err
+
+
+def _is_up(err: int) -> bool:
+    """SYN-ACK (connected) or RST (refused) both mean the host answered."""
+    return err in (0, errno.ECONNREFUSED)
+
+
+class TcpConnectProbe:
+    """Probe many IPv4 targets with non-blocking TCP connects on one selector.
+
+    Each target gets one connect per port; the first SYN-ACK or RST marks it
+    up and cancels its other attempts. Results are yielded in completion
+    order as (ip, is_up, rtt_ms, port) tuples; port is None when down.
+    """
+
+    def __init__(self, ports: Iterable[int] = DEFAULT_PORTS, max_in_flight: int = 4096):
+        self.ports = tuple(ports) or DEFAULT_PORTS
+        soft_limit, _ = resource.getrlimit(resource.RLIMIT_NOFILE)
+        if soft_limit != resource.RLIM_INFINITY:
+            max_in_flight = min(max_in_flight, max(len(self.ports), soft_limit - _FD_HEADROOM))
+        self.max_in_flight = max(len(self.ports), max_in_flight)
+
+    def probe(self, targets: Iterable[str], timeout: float = 0.5,
+              pacer: Pacer | None = None) -> Iterator[tuple[str, bool, float | None, int | None]]:
+        """Probe targets and yield (ip, is_up, rtt_ms, port) in completion order.
+
+        With a pacer, connects are rate limited; targets left when its
+        deadline passes are reported down without being probed.
+
+        The window is only capped against the fd limit per probe, so
+        concurrent sweeps can still run out of descriptors. A target that
+        does is retried once one of this probe's sockets has closed, or,
+        if the probe holds none, reported down and counted as dropped.
+        """
+        if pacer is None:
+            pacer = Pacer()
+        target_iter = iter(targets)
+        exhausted = False
+        n_ports = len(self.ports)
+        # Targets that ran out of descriptors, retried once in_flight drops
+        # below blocked_at
+        deferred: deque[str] = deque()
+        blocked_at: int | None = None
+
+        selector = selectors.DefaultSelector()
+        # ip -> (deadline, started_at, open sockets)
+        hosts: dict[str, tuple[float, float, list[socket.socket]]] = {}
+        deadlines: list[tuple[float, str]] = []
+        in_flight = 0
+
+        def finish(ip: str) -> None:
+            nonlocal in_flight
+            _, _, socks = hosts.pop(ip)
+            for sock in socks:
+                selector.unregister(sock)
+                sock.close()
+            in_flight -= len(socks)
+
+        try:
+            while True:
+                # Start connects for as many targets as the window allows
+                pace_wait = 0.0
+                if blocked_at is not None and in_flight < blocked_at:
+                    blocked_at = None
+                while ((deferred or not exhausted) and blocked_at is None
+                       and in_flight + n_ports <= self.max_in_flight):
+                    pace_wait = pacer.wait_time(n_ports)
+                    if pace_wait > 0:
+                        break
+                    if deferred:
+                        ip = deferred.popleft()
+                    else:
+                        ip = next(target_iter, None)
+                        if ip is None:
+                            exhausted = True
+                            break
+                    if ip in hosts:
+                        continue
+                    if pacer.expired():
+                        pacer.drop(n_ports)
+                        yield ip, False, None, None
+                        continue
+
+                    started_at = time.perf_counter()
+                    pacer.consume(n_ports)
+                    socks = []
+                    answered_port = None
+                    out_of_fds = False
+                    for port in self.ports:
+                        sock, err = _open_connect(ip, port)
+                        if sock is not None:
+                            selector.register(sock, selectors.EVENT_WRITE, (ip, port))
+                            socks.append(sock)
+                        elif _is_up(err):
+                            answered_port = port
+                            break
+                        elif err in _FD_EXHAUSTED:
+                            out_of_fds = True
+                            break
+                    if out_of_fds:
+                        for sock in socks:
+                            selector.unregister(sock)
+                            sock.close()
+                        if hosts:
+                            deferred.append(ip)
+                            blocked_at = in_flight
+                            break
+                        logger.warning(f"Out of file descriptors, {ip} not probed over TCP")
+                        pacer.drop(n_ports)
+                        yield ip, False, None, None
+                        continue
+                    if answered_port is not None or not socks:
+                        for sock in socks:
+                            selector.unregister(sock)
+                            sock.close()
+                        if answered_port is not None:
+                            rtt_ms = round((time.perf_counter() - started_at) * 1000.0, 3)
+                            yield ip, True, rtt_ms, answered_port
+                        else:
+                            yield ip, False, None, None
+                        continue
+
+                    deadline = started_at + timeout
+                    hosts[ip] = (deadline, started_at, socks)
+                    heapq.heappush(deadlines, (deadline, ip))
+                    in_flight += len(socks)
+
+                if not hosts:
+                    if exhausted and not deferred:
+                        return
+                    if pace_wait > 0:
+                        time.sleep(pace_wait)
+                    continue
+
+                wait = max(0.0, deadlines[0][0] - time.perf_counter())
+                if pace_wait > 0:
+                    wait = min(wait, pace_wait)
+                for key, _ in selector.select(wait):
+                    ip, port = key.data
+                    entry = hosts.get(ip)
+                    if entry is None:
+                        continue  # Already answered on another port
+                    sock = key.fileobj
+                    err = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+                    if _is_up(err):
+                        rtt_ms = round((time.perf_counter() - entry[1]) * 1000.0, 3)
+                        finish(ip)
+                        yield ip, True, rtt_ms, port
+                        continue
+                    # Unreachable / timed out on this port
+                    selector.unregister(sock)
+                    sock.close()
+                    entry[2].remove(sock)
+                    in_flight -= 1
+                    if not entry[2]:
+                        finish(ip)
+                        yield ip, False, None, None
+
+                # Expire targets whose deadline has passed
+                now = time.perf_counter()
+                while deadlines and deadlines[0][0] <= now:
+                    _, ip = heapq.heappop(deadlines)
+                    if ip in hosts:
+                        finish(ip)
+                        yield ip, False, None, None
+        finally:
+            for ip in list(hosts):
+                finish(ip)
+            selector.close()
+
+
+async def tcp_ping(ip: str, ports: Iterable[int] = DEFAULT_PORTS,
+                   timeout: float = 0.5) -> tuple[bool, float | None, int | None]:
+    """Probe one host with concurrent TCP connects on the running event loop.
+
+    Returns (is_up, rtt_ms, port) for the first port that answered.
+    """
+    loop = asyncio.get_running_loop()
+    started_at = time.perf_counter()
+    socks = []
+
+    async def attempt(port: int) -> int:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setblocking(False)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, _LINGER_ABORT)
+        socks.append(sock)
+        try:
+            await loop.sock_connect(sock, (ip, port))
+        except ConnectionRefusedError:
+            pass
+        return port
+
+    tasks = [asyncio.ensure_future(attempt(port)) for port in ports]
+    try:
+        deadline = loop.time() + timeout
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, timeout=max(0.0, deadline - loop.time()),
+                                               return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                break
+            for task in done:
+                if task.exception() is None:
+                    rtt_ms = round((time.perf_counter() - started_at) * 1000.0, 3)
+                    return True, rtt_ms, task.result()
+        return False, None, None
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for sock in socks:
+            sock.close()
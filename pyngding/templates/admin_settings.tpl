@@ -115,6 +115,9 @@
                 <input type="checkbox" name="notify_on_dns_burst" id="notify_on_dns_burst" value="true" {{'checked' if settings.get('notify_on_dns_burst') == 'true' else ''}}>
                 Notify on DNS Burst
             </label>
+            <label for="notify_digest_max_hosts">Hosts listed in a digest:</label>
+            <input type="number" name="notify_digest_max_hosts" id="notify_digest_max_hosts" min="1"
+                   value="{{settings.get('notify_digest_max_hosts', '20')}}">
         </article>
         
         <article>
@@ -131,6 +134,9 @@
             <label for="webhook_secret">Webhook Secret (optional):</label>
             <input type="text" name="webhook_secret" id="webhook_secret" 
                    value="{{settings.get('webhook_secret', '')}}">
+            <label for="webhook_digest_seconds">Digest window (seconds, 0 = send every event):</label>
+            <input type="number" name="webhook_digest_seconds" id="webhook_digest_seconds" min="0"
+                   value="{{settings.get('webhook_digest_seconds', '60')}}">
             <form method="POST" action="/admin/notify/test" style="display: inline;">
                 <input type="hidden" name="channel" value="webhook">
                 <button type="submit" class="secondary">Test Webhook</button>
@@ -148,6 +154,9 @@
             <label for="ha_webhook_url">HA Webhook URL:</label>
             <input type="url" name="ha_webhook_url" id="ha_webhook_url" 
                    value="{{settings.get('ha_webhook_url', '')}}" placeholder="https://homeassistant.local:8123/api/webhook/...">
+            <label for="ha_webhook_digest_seconds">Digest window (seconds, 0 = send every event):</label>
+            <input type="number" name="ha_webhook_digest_seconds" id="ha_webhook_digest_seconds" min="0"
+                   value="{{settings.get('ha_webhook_digest_seconds', '60')}}">
             <form method="POST" action="/admin/notify/test" style="display: inline;">
                 <input type="hidden" name="channel" value="ha_webhook">
                 <button type="submit" class="secondary">Test HA Webhook</button>
@@ -168,6 +177,9 @@
             <label for="ntfy_topic">Topic (required if enabled):</label>
             <input type="text" name="ntfy_topic" id="ntfy_topic" 
                    value="{{settings.get('ntfy_topic', '')}}">
+            <label for="ntfy_digest_seconds">Digest window (seconds, 0 = send every event):</label>
+            <input type="number" name="ntfy_digest_seconds" id="ntfy_digest_seconds" min="0"
+                   value="{{settings.get('ntfy_digest_seconds', '60')}}">
             <form method="POST" action="/admin/notify/test" style="display: inline;">
                 <input type="hidden" name="channel" value="ntfy">
                 <button type="submit" class="secondary">Test ntfy</button>
@@ -133,11 +133,10 @@ class AuthMiddleware:
         if not self.config.auth_enabled:
             return False
 
-        from pyngding.core.db import get_ui_setting
+        from pyngding.web.settings import get_settings
         
         # Check if API is enabled
-        api_enabled = get_ui_setting(self.db_path, 'api_enabled', 'true').lower() == 'true'
-        if not api_enabled:
+        if not get_settings(self.db_path).api_enabled:
             return False
 
         api_key = request.headers.get('X-API-Key')
@@ -176,14 +175,10 @@ class AuthMiddleware:
         Returns:
             Tuple of (allowed, retry_after_seconds)
         """
-        from pyngding.web.settings import get_cached_setting
+        from pyngding.web.settings import get_settings
         
         # Get configured rate limit
-        rate_str = get_cached_setting(self.db_path, 'api_rate_limit_rps', '5')
-        try:
-            rate = float(rate_str)
-        except (ValueError, TypeError):
-            rate = 5.0
+        rate = float(get_settings(self.db_path).api_rate_limit_rps)
         
         return _api_rate_limiter.allow_request(client_id, rate)
     
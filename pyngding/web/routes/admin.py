@@ -11,17 +11,17 @@ from pyngding.core.db import (
     get_db,
     get_host,
     get_hosts_with_profiles,
-    set_ui_setting,
+    set_ui_settings,
     toggle_api_key,
     upsert_device_profile,
 )
-from pyngding.core.db import get_ui_setting as db_get_ui_setting
+from pyngding.data.host_cache import get_host_cache
 from pyngding.web.api_keys import generate_api_key, hash_api_key
 from pyngding.web.middleware import AuthMiddleware
 from pyngding.web.settings import (
     DEFAULTS,
     get_all_settings,
-    invalidate_settings_cache,
+    get_settings,
     sanitize_setting,
     validate_setting,
 )
@@ -29,9 +29,6 @@ from pyngding.web.settings import (
 
 def register_routes(app, auth: AuthMiddleware, db_path: str, render_template):
     """Register admin routes on the app."""
-    
-    def get_ui_setting_helper(key: str, default: str) -> str:
-        return db_get_ui_setting(db_path, key, default)
 
     # Settings
     @app.route('/admin/settings')
@@ -44,7 +41,7 @@ def register_routes(app, auth: AuthMiddleware, db_path: str, render_template):
     @auth.require_admin
     def admin_settings_update():
         errors = []
-        updated = []
+        values = {}
 
         for key in DEFAULTS.keys():
             if key in request.forms:
@@ -61,12 +58,11 @@ def register_routes(app, auth: AuthMiddleware, db_path: str, render_template):
                     errors.append(f"{key}: {error_msg}")
                     continue
 
-                # Sanitize and save
-                sanitized = sanitize_setting(key, value)
-                set_ui_setting(db_path, key, sanitized)
-                # Invalidate cache for this setting
-                invalidate_settings_cache(db_path, key)
-                updated.append(key)
+                values[key] = sanitize_setting(key, value)
+
+        # Save valid values together; the new settings version applies them everywhere
+        set_ui_settings(db_path, values)
+        updated = list(values)
 
         if errors:
             settings = get_all_settings(db_path)
@@ -107,6 +103,7 @@ def register_routes(app, auth: AuthMiddleware, db_path: str, render_template):
             notes=notes,
             now_ts=int(time.time())
         )
+        get_host_cache(db_path).invalidate_profile(mac=host.get('mac'), ip=host['ip'])
 
         response.status = 303
         response.headers['Location'] = '/admin/hosts'
@@ -177,7 +174,7 @@ def register_routes(app, auth: AuthMiddleware, db_path: str, render_template):
     @app.route('/admin/adguard')
     @auth.require_admin
     def admin_adguard():
-        adguard_enabled = get_ui_setting_helper('adguard_enabled', DEFAULTS['adguard_enabled']).lower() == 'true'
+        adguard_enabled = get_settings(db_path).adguard_enabled
         state = get_adguard_state(db_path)
 
         # Get event counts
@@ -200,7 +197,7 @@ def register_routes(app, auth: AuthMiddleware, db_path: str, render_template):
     def admin_ipv6():
         from pyngding.scanning.ipv6 import get_recent_ipv6_neighbors
 
-        ipv6_enabled = get_ui_setting_helper('ipv6_passive_enabled', DEFAULTS['ipv6_passive_enabled']).lower() == 'true'
+        ipv6_enabled = get_settings(db_path).ipv6_passive_enabled
 
         # Get recent neighbors (last 24 hours)
         neighbors_24h = get_recent_ipv6_neighbors(db_path, hours=24)
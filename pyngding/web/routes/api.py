@@ -1,13 +1,17 @@
 """API routes for external integrations (Home Assistant, etc.)."""
+import ipaddress
+import time
+
 from bottle import abort, request, response
 
-from pyngding.core.db import get_db, get_hosts_with_profiles
-from pyngding.core.db import get_ui_setting as db_get_ui_setting
-from pyngding.scanning.scheduler import get_scan_stats
+from pyngding.core.db import get_db, get_hosts_with_profiles, get_scan_timings
+from pyngding.data.presence import diff_runs, get_snapshot, get_uptime, was_up
+from pyngding.scanning.agent import MAX_BATCH_BYTES, decode_batch
+from pyngding.scanning.scheduler import ScanScheduler, get_scan_stats
 from pyngding.web.middleware import AuthMiddleware
 
 
-def register_routes(app, auth: AuthMiddleware, db_path: str):
+def register_routes(app, auth: AuthMiddleware, db_path: str, scheduler: ScanScheduler):
     """Register API routes on the app."""
 
     @app.route('/api/health')
@@ -70,6 +74,86 @@ def register_routes(app, auth: AuthMiddleware, db_path: str):
         # This is a placeholder for future enhancement
         return {'alerts': []}
 
+    @app.route('/api/ingest', method='POST')
+    @auth.require_api_key
+    def api_ingest():
+        # Result batch pushed by a remote agent (pyngding agent)
+        if request.content_length > MAX_BATCH_BYTES:
+            response.status = 413
+            return {'error': 'Batch too large'}
+        try:
+            batch = decode_batch(request.body.read())
+        except ValueError as e:
+            response.status = 400
+            return {'error': f'Invalid batch: {e}'}
+
+        result = scheduler.ingest_batch(batch)
+        return {'status': 'ok', 'run_id': result['run_id'], 'duplicate': result['duplicate']}
+
+    @app.route('/api/presence/snapshot')
+    @auth.require_api_key
+    def api_presence_snapshot():
+        # Hosts up at ts (default now), or whether ?ip= was
+        try:
+            ts = int(request.query.get('ts') or time.time())
+        except ValueError:
+            response.status = 400
+            return {'error': 'Invalid ts'}
+        ip = request.query.get('ip', '').strip()
+        if ip:
+            try:
+                ipaddress.IPv4Address(ip)
+            except ValueError:
+                response.status = 400
+                return {'error': 'Invalid ip'}
+            return {'ip': ip, 'ts': ts, 'up': was_up(db_path, ip, ts)}
+        snapshot = get_snapshot(db_path, ts)
+        if snapshot is None:
+            response.status = 404
+            return {'error': 'No scan run at or before ts'}
+        return snapshot
+
+    @app.route('/api/presence/uptime/<ip>')
+    @auth.require_api_key
+    def api_presence_uptime(ip):
+        # Uptime over [start_ts, end_ts), default the last 30 days
+        try:
+            ipaddress.IPv4Address(ip)
+            end_ts = int(request.query.get('end_ts') or time.time())
+            start_ts = int(request.query.get('start_ts') or end_ts - 30 * 86400)
+        except ValueError:
+            response.status = 400
+            return {'error': 'Invalid ip, start_ts or end_ts'}
+        return {'start_ts': start_ts, 'end_ts': end_ts, **get_uptime(db_path, ip, start_ts, end_ts)}
+
+    @app.route('/api/presence/diff')
+    @auth.require_api_key
+    def api_presence_diff():
+        # Hosts that joined and left between two scan runs
+        try:
+            from_run_id = int(request.query.get('from', ''))
+            to_run_id = int(request.query.get('to', ''))
+        except ValueError:
+            response.status = 400
+            return {'error': 'from and to must be scan run IDs'}
+        diff = diff_runs(db_path, from_run_id, to_run_id)
+        if diff is None:
+            response.status = 404
+            return {'error': 'Scan run not found or has no presence bitmap'}
+        return diff
+
+    @app.route('/api/scan/cycles')
+    @auth.require_api_key
+    def api_scan_cycles():
+        # Cycle timing of recent local runs (of ?profile=), newest first, and each profile's counters
+        try:
+            limit = max(1, min(int(request.query.get('limit', '100')), 1000))
+        except ValueError:
+            response.status = 400
+            return {'error': 'Invalid limit'}
+        profile = request.query.get('profile', '').strip() or None
+        return {'profiles': scheduler.get_cycle_stats(), 'runs': get_scan_timings(db_path, limit, profile)}
+
     @app.route('/api/<path:path>')
     def api_404(path):
         if not auth.config.auth_enabled:
@@ -2,22 +2,20 @@
 import json
 
 from pyngding.core.db import get_all_hosts, get_hosts_with_profiles, get_recent_scan_runs
-from pyngding.core.db import get_ui_setting as db_get_ui_setting
 from pyngding.scanning.scheduler import get_scan_stats
 from pyngding.web.middleware import AuthMiddleware
+from pyngding.web.settings import get_settings
 
 
 def register_routes(app, auth: AuthMiddleware, db_path: str, render_template):
     """Register dashboard routes on the app."""
-    
-    def get_ui_setting_helper(key: str, default: str) -> str:
-        return db_get_ui_setting(db_path, key, default)
 
     @app.route('/')
     @auth.require_auth
     def dashboard():
+        settings = get_settings(db_path)
         stats = get_scan_stats(db_path)
-        chart_window = int(get_ui_setting_helper('chart_window_runs', '200'))
+        chart_window = settings.chart_window_runs
         runs = get_recent_scan_runs(db_path, limit=chart_window)
 
         # Get new/unsafe hosts for quick actions
@@ -25,7 +23,7 @@ def register_routes(app, auth: AuthMiddleware, db_path: str, render_template):
         new_hosts = [h for h in all_hosts if h.get('profile_is_safe') != 1 and h['last_status'] == 'up']
 
         # Get IPv6 neighbor count (last hour)
-        ipv6_enabled = get_ui_setting_helper('ipv6_passive_enabled', 'true').lower() == 'true'
+        ipv6_enabled = settings.ipv6_passive_enabled
         ipv6_count = 0
         if ipv6_enabled:
             from pyngding.scanning.ipv6 import get_recent_ipv6_neighbors
@@ -46,10 +44,11 @@ def register_routes(app, auth: AuthMiddleware, db_path: str, render_template):
     @app.route('/partials/summary')
     @auth.require_auth
     def partials_summary():
+        settings = get_settings(db_path)
         stats = get_scan_stats(db_path)
 
         # Get IPv6 neighbor count (last hour)
-        ipv6_enabled = get_ui_setting_helper('ipv6_passive_enabled', 'true').lower() == 'true'
+        ipv6_enabled = settings.ipv6_passive_enabled
         ipv6_count = 0
         if ipv6_enabled:
             from pyngding.scanning.ipv6 import get_recent_ipv6_neighbors
@@ -2,16 +2,12 @@
 from bottle import request
 
 from pyngding.core.db import get_all_hosts, get_host_dns_summary
-from pyngding.core.db import get_ui_setting as db_get_ui_setting
 from pyngding.web.middleware import AuthMiddleware
-from pyngding.web.settings import DEFAULTS
+from pyngding.web.settings import get_settings
 
 
 def register_routes(app, auth: AuthMiddleware, db_path: str, render_template):
     """Register hosts routes on the app."""
-    
-    def get_ui_setting_helper(key: str, default: str) -> str:
-        return db_get_ui_setting(db_path, key, default)
 
     def filter_hosts(hosts: list[dict], search: str) -> list[dict]:
         """Filter hosts by search term."""
@@ -52,8 +48,7 @@ def register_routes(app, auth: AuthMiddleware, db_path: str, render_template):
     @app.route('/partials/dns-host/<ip>')
     @auth.require_auth
     def partials_dns_host(ip):
-        adguard_enabled = get_ui_setting_helper('adguard_enabled', DEFAULTS['adguard_enabled']).lower() == 'true'
-        if not adguard_enabled:
+        if not get_settings(db_path).adguard_enabled:
             return render_template('partials/dns-host.tpl', enabled=False, ip=ip)
 
         summary = get_host_dns_summary(db_path, ip, limit=20)
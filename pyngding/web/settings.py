@@ -1,12 +1,14 @@
-"""UI settings defaults and validation with TTL caching."""
+"""UI settings defaults, validation and versioned snapshots."""
 import threading
-import time
+from types import MappingProxyType
 from typing import Any
 
-# Settings cache with TTL
-_settings_cache: dict[str, tuple[str, float]] = {}  # key -> (value, expiry_ts)
-_cache_lock = threading.Lock()
-CACHE_TTL = 30  # seconds before cached settings expire
+# Latest settings snapshot per database
+_snapshots: dict[str, 'Settings'] = {}
+_snapshots_lock = threading.Lock()
+
+# Key suffixes of integer settings
+_INT_SUFFIXES = ('_seconds', '_minutes', '_days', '_rps', '_runs', '_fetch', '_priority', '_hosts')
 
 # Default values for UI settings
 DEFAULTS: dict[str, Any] = {
@@ -34,13 +36,16 @@ DEFAULTS: dict[str, Any] = {
     'notify_on_ip_mac_change': 'true',
     'notify_on_duplicate_ip': 'true',
     'notify_on_dns_burst': 'false',
+    'notify_digest_max_hosts': '20',
     'webhook_enabled': 'false',
     'webhook_url': '',
     'webhook_secret': '',
     'webhook_timeout_seconds': '3',
+    'webhook_digest_seconds': '60',
     'ha_webhook_enabled': 'false',
     'ha_webhook_url': '',
     'ha_webhook_timeout_seconds': '3',
+    'ha_webhook_digest_seconds': '60',
     'ntfy_enabled': 'false',
     'ntfy_base_url': 'https://ntfy.sh',
     'ntfy_topic': '',
@@ -50,6 +55,7 @@ DEFAULTS: dict[str, Any] = {
     'ntfy_bearer_token': '',
     'ntfy_priority': '3',
     'ntfy_tags': '',
+    'ntfy_digest_seconds': '60',
     'ipv6_passive_enabled': 'true',
     'oui_lookup_enabled': 'false',
     'oui_file_path': '',
@@ -59,15 +65,13 @@ DEFAULTS: dict[str, Any] = {
 def validate_setting(key: str, value: str) -> tuple[bool, str | None]:
     """Validate a setting value. Returns (is_valid, error_message)."""
     # Boolean settings
-    if key.endswith('_enabled') or key.startswith('notify_on_'):
+    if _is_bool(key):
         if value.lower() not in ('true', 'false', '1', '0', 'yes', 'no', 'on', 'off'):
             return False, f"Invalid boolean value for {key}"
         return True, None
 
     # Integer settings
-    if key.endswith('_seconds') or key.endswith('_minutes') or key.endswith('_days') or \
-       key.endswith('_rps') or key.endswith('_runs') or key.endswith('_fetch') or \
-       key.endswith('_priority') or key.endswith('_timeout_seconds'):
+    if _is_int(key):
         try:
             int_val = int(value)
             if int_val < 0:
@@ -99,7 +103,7 @@ def sanitize_setting(key: str, value: str) -> str:
     value = value.strip()
 
     # Normalize boolean values
-    if key.endswith('_enabled') or key.startswith('notify_on_'):
+    if _is_bool(key):
         if value.lower() in ('true', '1', 'yes', 'on'):
             return 'true'
         elif value.lower() in ('false', '0', 'no', 'off'):
@@ -108,84 +112,92 @@ def sanitize_setting(key: str, value: str) -> str:
     return value
 
 
-def get_cached_setting(db_path: str, key: str, default: str | None = None) -> str | None:
-    """Get a UI setting with TTL caching.
-    
-    Settings are cached for CACHE_TTL seconds to reduce database reads.
-    Thread-safe for concurrent access.
-    
-    Args:
-        db_path: Path to the database
-        key: Setting key
-        default: Default value if not found
-    
-    Returns:
-        The setting value or default.
+class Settings:
+    """Immutable, typed snapshot of all UI settings at one settings version.
+
+    Values are DEFAULTS overlaid with the ui_settings table, converted by
+    key: booleans for *_enabled, notify_on_* and reverse_dns, integers for
+    the numeric suffixes validate_setting() checks, strings otherwise (an
+    unparsable stored integer falls back to its default). Read them as
+    attributes (settings.api_enabled) or with get() for computed keys.
     """
-    from pyngding.core.db import get_ui_setting
-    
-    now = time.time()
-    cache_key = f"{db_path}:{key}"
-    
-    # Check cache first (with lock for thread safety)
-    with _cache_lock:
-        if cache_key in _settings_cache:
-            value, expiry = _settings_cache[cache_key]
-            if now < expiry:
-                return value
-            # Expired - remove from cache
-            del _settings_cache[cache_key]
-    
-    # Fetch from database
-    value = get_ui_setting(db_path, key, default)
-    
-    # Cache the result
-    with _cache_lock:
-        _settings_cache[cache_key] = (value, now + CACHE_TTL)
-    
+
+    __slots__ = ('version', '_values')
+
+    def __init__(self, version: int, stored: dict[str, str]):
+        values = {}
+        for key, value in {**DEFAULTS, **stored}.items():
+            values[key] = _convert(key, value)
+        object.__setattr__(self, 'version', version)
+        object.__setattr__(self, '_values', MappingProxyType(values))
+
+    def __getattr__(self, key: str) -> Any:
+        if key.startswith('_'):
+            raise AttributeError(key)
+        try:
+            return self._values[key]
+        except KeyError:
+            raise AttributeError(key) from None
+
+    def __setattr__(self, key: str, value: Any) -> None:
+        raise AttributeError('Settings snapshots are immutable')
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Get a setting by key, or default if it is not set."""
+        return self._values.get(key, default)
+
+    def as_strings(self) -> dict[str, str]:
+        """Get the settings in their stored string form (the admin form)."""
+        return {key: _format(value) for key, value in self._values.items()}
+
+
+def _is_bool(key: str) -> bool:
+    return key.endswith('_enabled') or key.startswith('notify_on_') or key == 'reverse_dns'
+
+
+def _is_int(key: str) -> bool:
+    return key.endswith(_INT_SUFFIXES)
+
+
+def _convert(key: str, value: str) -> Any:
+    if _is_bool(key):
+        return str(value).lower() in ('true', '1', 'yes', 'on')
+    if _is_int(key):
+        try:
+            return int(value)
+        except (ValueError, TypeError):
+            return int(DEFAULTS.get(key) or 0)
     return value
 
 
-def invalidate_settings_cache(db_path: str | None = None, key: str | None = None) -> int:
-    """Invalidate settings cache.
-    
-    Args:
-        db_path: If provided, only invalidate settings for this db_path
-        key: If provided, only invalidate this specific key
-    
-    Returns:
-        Number of cache entries invalidated.
-    """
-    with _cache_lock:
-        if db_path is None and key is None:
-            # Clear all
-            count = len(_settings_cache)
-            _settings_cache.clear()
-            return count
-        
-        # Selective invalidation
-        to_delete = []
-        for cache_key in _settings_cache:
-            if db_path and not cache_key.startswith(f"{db_path}:"):
-                continue
-            if key and not cache_key.endswith(f":{key}"):
-                continue
-            to_delete.append(cache_key)
-        
-        for k in to_delete:
-            del _settings_cache[k]
-        
-        return len(to_delete)
+def _format(value: Any) -> str:
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    return str(value)
 
 
-def get_all_settings(db_path: str) -> dict[str, str]:
-    """Get all UI settings with defaults.
-    
-    Uses cached settings where available.
+def get_settings(db_path: str) -> Settings:
+    """Get the current settings snapshot of db_path.
+
+    Costs one version query; the settings themselves are reloaded (in one
+    query) only after a settings write bumped the version, so changes take
+    effect on the next call. Thread-safe; snapshots are shared.
     """
-    settings = {}
-    for key, default in DEFAULTS.items():
-        settings[key] = get_cached_setting(db_path, key, default)
+    from pyngding.core.db import get_settings_version, get_ui_settings
+
+    snapshot = _snapshots.get(db_path)
+    if snapshot is not None and snapshot.version == get_settings_version(db_path):
+        return snapshot
 
-    return settings
+    version, stored = get_ui_settings(db_path)
+    snapshot = Settings(version, stored)
+    with _snapshots_lock:
+        current = _snapshots.get(db_path)
+        if current is None or current.version <= version:
+            _snapshots[db_path] = snapshot
+    return snapshot
 
+
+def get_all_settings(db_path: str) -> dict[str, str]:
+    """Get all UI settings with defaults, as strings."""
+    return get_settings(db_path).as_strings()
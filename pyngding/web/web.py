@@ -7,10 +7,12 @@ from bottle import Bottle, abort, request, response, static_file, template
 
 from pyngding.core.config import Config
 from pyngding.core.db import get_db
-from pyngding.core.db import get_ui_setting as db_get_ui_setting
+from pyngding.scanning.pacing import get_probe_stats
+from pyngding.scanning.rdns import get_ptr_resolver
 from pyngding.scanning.scheduler import ScanScheduler, get_scan_stats
 from pyngding.web.middleware import AuthMiddleware
 from pyngding.web.routes import admin, api, dashboard, hosts
+from pyngding.web.settings import get_settings
 
 
 def create_app(config: Config, db_path: str, scheduler: ScanScheduler) -> Bottle:
@@ -109,6 +111,27 @@ def create_app(config: Config, db_path: str, scheduler: ScanScheduler) -> Bottle
                     'adguard_running': getattr(scheduler, 'adguard_running', None),
                     'ipv6_running': getattr(scheduler, 'ipv6_running', None),
                 }
+                host_cache = getattr(scheduler, 'host_cache', None)
+                if host_cache is not None:
+                    health_data['scheduler']['host_cache'] = host_cache.get_stats()
+                dispatcher = getattr(scheduler, 'dispatcher', None)
+                if dispatcher is not None:
+                    health_data['scheduler']['notifications'] = dispatcher.get_stats()
+                maintenance = getattr(scheduler, 'maintenance', None)
+                if maintenance is not None:
+                    health_data['scheduler']['maintenance'] = maintenance.get_stats()
+                writer = getattr(scheduler, 'writer', None)
+                if writer is not None:
+                    health_data['scheduler']['db_writer'] = writer.get_stats()
+                limiter = getattr(scheduler, 'limiter', None)
+                if limiter is not None:
+                    health_data['scheduler']['in_flight'] = limiter.get_stats()
+                profiles = {}
+                for profile in getattr(scheduler, 'profiles', []):
+                    profiles[profile.name] = {'cycles': profile.get_cycle_stats()}
+                    if profile.pipeline is not None:
+                        profiles[profile.name]['pipeline'] = profile.pipeline.get_stats()
+                health_data['scheduler']['profiles'] = profiles
         except Exception:
             pass  # Scheduler info is optional
 
@@ -129,8 +152,7 @@ def create_app(config: Config, db_path: str, scheduler: ScanScheduler) -> Bottle
             abort(404, 'Not found')
         auth.check_auth()
 
-        metrics_enabled = db_get_ui_setting(db_path, 'metrics_enabled', 'true').lower() == 'true'
-        if not metrics_enabled:
+        if not get_settings(db_path).metrics_enabled:
             abort(404, 'Metrics disabled')
 
         stats = get_scan_stats(db_path)
@@ -141,6 +163,31 @@ def create_app(config: Config, db_path: str, scheduler: ScanScheduler) -> Bottle
             total_observations = conn.execute("SELECT COUNT(*) FROM observations").fetchone()[0] or 0
             total_dns_events = conn.execute("SELECT COUNT(*) FROM dns_events").fetchone()[0] or 0
 
+        rdns = get_ptr_resolver().get_stats()
+        probes = get_probe_stats()
+        notify = scheduler.dispatcher.get_stats()
+        outbox_lines = '\n'.join(
+            f'pyngding_notify_outbox_pending{{channel="{channel}"}} {count}'
+            for channel, count in sorted(notify['pending'].items())
+        ) or 'pyngding_notify_outbox_pending 0'
+        cycles = scheduler.get_cycle_stats()
+        cycle_lines = {
+            key: '\n'.join(f'pyngding_{metric}{{profile="{name}"}} {stats[key]}'
+                           for name, stats in sorted(cycles.items())) or f'pyngding_{metric} 0'
+            for key, metric in (('cycles', 'scan_cycles_total'),
+                                ('last_start_lag_seconds', 'scan_cycle_start_lag_seconds'),
+                                ('last_duration_seconds', 'scan_cycle_duration_seconds'),
+                                ('overruns', 'scan_overruns_total'),
+                                ('skipped', 'scan_cycles_skipped_total'))
+        }
+        maintenance = scheduler.maintenance.get_stats()
+        writer = scheduler.writer.get_stats()
+        stage_lines = '\n'.join(
+            f'pyngding_pipeline_queue_depth{{profile="{profile.name}",stage="{name}"}} {stage["depth"]}'
+            for profile in scheduler.profiles if profile.pipeline is not None
+            for name, stage in profile.pipeline.get_stats()['stages'].items()
+        ) or 'pyngding_pipeline_queue_depth 0'
+
         # Prometheus text format
         response.content_type = 'text/plain; version=0.0.4'
 
@@ -175,6 +222,133 @@ pyngding_dns_events_total {total_dns_events}
 # HELP pyngding_last_scan_timestamp Timestamp of last scan
 # TYPE pyngding_last_scan_timestamp gauge
 pyngding_last_scan_timestamp {stats.get('last_scan_ts', 0)}
+
+# HELP pyngding_scan_cycles_total Scan cycles run
+# TYPE pyngding_scan_cycles_total counter
+{cycle_lines['cycles']}
+
+# HELP pyngding_scan_cycle_start_lag_seconds How late the last scan cycle started against its fixed-rate slot
+# TYPE pyngding_scan_cycle_start_lag_seconds gauge
+{cycle_lines['last_start_lag_seconds']}
+
+# HELP pyngding_scan_cycle_duration_seconds Duration of the last scan cycle
+# TYPE pyngding_scan_cycle_duration_seconds gauge
+{cycle_lines['last_duration_seconds']}
+
+# HELP pyngding_scan_overruns_total Scan cycles that took longer than scan_interval_seconds
+# TYPE pyngding_scan_overruns_total counter
+{cycle_lines['overruns']}
+
+# HELP pyngding_scan_cycles_skipped_total Scan cycle slots skipped because of overruns
+# TYPE pyngding_scan_cycles_skipped_total counter
+{cycle_lines['skipped']}
+
+# HELP pyngding_retention_rows_deleted_total Rows deleted by retention
+# TYPE pyngding_retention_rows_deleted_total counter
+pyngding_retention_rows_deleted_total {maintenance['rows_deleted_total']}
+
+# HELP pyngding_retention_last_duration_seconds Duration of the last complete retention pass
+# TYPE pyngding_retention_last_duration_seconds gauge
+pyngding_retention_last_duration_seconds {maintenance['last_retention_seconds']:.3f}
+
+# HELP pyngding_wal_pages Pages in the WAL at the last checkpoint
+# TYPE pyngding_wal_pages gauge
+pyngding_wal_pages {maintenance['wal_pages']}
+
+# HELP pyngding_db_writer_queue_depth Write jobs waiting for the database writer
+# TYPE pyngding_db_writer_queue_depth gauge
+pyngding_db_writer_queue_depth {writer['queue_depth']}
+
+# HELP pyngding_db_write_jobs_total Write jobs run by the database writer
+# TYPE pyngding_db_write_jobs_total counter
+pyngding_db_write_jobs_total {writer['jobs']}
+
+# HELP pyngding_db_write_errors_total Write jobs that failed or were rolled back
+# TYPE pyngding_db_write_errors_total counter
+pyngding_db_write_errors_total {writer['errors']}
+
+# HELP pyngding_db_commits_total Transactions committed by the database writer
+# TYPE pyngding_db_commits_total counter
+pyngding_db_commits_total {writer['commits']}
+
+# HELP pyngding_db_write_latency_seconds Time from queueing a write job to its commit
+# TYPE pyngding_db_write_latency_seconds summary
+pyngding_db_write_latency_seconds_sum {writer['latency_seconds_sum']:.6f}
+pyngding_db_write_latency_seconds_count {writer['jobs']}
+
+# HELP pyngding_probes_sent_total Ping probes sent
+# TYPE pyngding_probes_sent_total counter
+pyngding_probes_sent_total {probes['sent']}
+
+# HELP pyngding_probe_replies_total Targets that answered a ping probe
+# TYPE pyngding_probe_replies_total counter
+pyngding_probe_replies_total {probes['received']}
+
+# HELP pyngding_probes_dropped_total Ping probes dropped by the rate limiter
+# TYPE pyngding_probes_dropped_total counter
+pyngding_probes_dropped_total {probes['dropped']}
+
+# HELP pyngding_rdns_cache_hits_total Reverse DNS lookups answered from cache
+# TYPE pyngding_rdns_cache_hits_total counter
+pyngding_rdns_cache_hits_total {rdns['cache_hits']}
+
+# HELP pyngding_rdns_cache_misses_total Reverse DNS lookups not in cache
+# TYPE pyngding_rdns_cache_misses_total counter
+pyngding_rdns_cache_misses_total {rdns['cache_misses']}
+
+# HELP pyngding_rdns_cache_hit_ratio Reverse DNS cache hit ratio
+# TYPE pyngding_rdns_cache_hit_ratio gauge
+pyngding_rdns_cache_hit_ratio {rdns['cache_hit_rate']:.4f}
+
+# HELP pyngding_rdns_cache_entries Reverse DNS cache entries (positive and negative)
+# TYPE pyngding_rdns_cache_entries gauge
+pyngding_rdns_cache_entries {rdns['cache_entries']}
+
+# HELP pyngding_rdns_queries_total PTR queries sent
+# TYPE pyngding_rdns_queries_total counter
+pyngding_rdns_queries_total {rdns['queries_sent']}
+
+# HELP pyngding_rdns_timeouts_total PTR lookups that timed out
+# TYPE pyngding_rdns_timeouts_total counter
+pyngding_rdns_timeouts_total {rdns['timeouts']}
+
+# HELP pyngding_rdns_latency_seconds PTR query latency
+# TYPE pyngding_rdns_latency_seconds summary
+pyngding_rdns_latency_seconds_sum {rdns['latency_seconds_sum']:.6f}
+pyngding_rdns_latency_seconds_count {rdns['latency_count']}
+
+# HELP pyngding_pipeline_queue_depth Result chunks waiting for a scan pipeline stage
+# TYPE pyngding_pipeline_queue_depth gauge
+{stage_lines}
+
+# HELP pyngding_notify_outbox_pending Notifications waiting for delivery
+# TYPE pyngding_notify_outbox_pending gauge
+{outbox_lines}
+
+# HELP pyngding_notify_outbox_oldest_age_seconds Age of the oldest notification waiting for delivery
+# TYPE pyngding_notify_outbox_oldest_age_seconds gauge
+pyngding_notify_outbox_oldest_age_seconds {notify['oldest_pending_age_seconds']:.3f}
+
+# HELP pyngding_notifications_delivered_total Notifications delivered
+# TYPE pyngding_notifications_delivered_total counter
+pyngding_notifications_delivered_total {notify['delivered']}
+
+# HELP pyngding_notify_digests_total Digests sent (several notifications in one message)
+# TYPE pyngding_notify_digests_total counter
+pyngding_notify_digests_total {notify['digests']}
+
+# HELP pyngding_notify_failed_attempts_total Failed notification delivery attempts
+# TYPE pyngding_notify_failed_attempts_total counter
+pyngding_notify_failed_attempts_total {notify['failed_attempts']}
+
+# HELP pyngding_notifications_dropped_total Notifications given up on after max_attempts
+# TYPE pyngding_notifications_dropped_total counter
+pyngding_notifications_dropped_total {notify['dropped']}
+
+# HELP pyngding_notify_delivery_latency_seconds Time from enqueue to delivery
+# TYPE pyngding_notify_delivery_latency_seconds summary
+pyngding_notify_delivery_latency_seconds_sum {notify['latency_seconds_sum']:.6f}
+pyngding_notify_delivery_latency_seconds_count {notify['latency_count']}
 """
 
         return metrics_text
@@ -183,7 +357,7 @@ pyngding_last_scan_timestamp {stats.get('last_scan_ts', 0)}
     dashboard.register_routes(app, auth, db_path, render_template)
     hosts.register_routes(app, auth, db_path, render_template)
     admin.register_routes(app, auth, db_path, render_template)
-    api.register_routes(app, auth, db_path)
+    api.register_routes(app, auth, db_path, scheduler)
 
     return app
 